@@ -0,0 +1,223 @@
+# /accounts.py
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import config
+from logger import get_logger
+from positions import PositionBook, positions
+from tastytrade_client import client
+
+logger = get_logger(__name__)
+
+class AccountManager:
+    """
+    Balances and positions of every configured account.
+
+    All accounts share the client's authenticated session. Fetches fan out over
+    a pool of at most config.ACCOUNTS_MAX_CONCURRENCY threads under one shared
+    deadline, and balances go through the client's cache per account, so a
+    dashboard with dozens of accounts answers in about the time of the slowest
+    fetch rather than the sum of all of them.
+    """
+
+    def __init__(self, client, account_numbers, max_workers, primary=None, primary_book=None,
+                 track_positions=True):
+        """
+        Args:
+            client: Tastytrade client shared by all accounts
+            account_numbers: Accounts to track
+            max_workers: Accounts fetched at the same time
+            primary: The account orders go to (defaults to the first account)
+            primary_book: Existing PositionBook of the primary account, if any
+            track_positions: Whether positions are fetched at all (balances only otherwise)
+        """
+        self.client = client
+        self.account_numbers = list(dict.fromkeys(account_numbers))
+        self.primary = primary or (self.account_numbers[0] if self.account_numbers else None)
+        self.track_positions = track_positions
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='account-fetch')
+        self._books = {
+            account: primary_book if account == self.primary and primary_book is not None
+            else PositionBook(client, account)
+            for account in self.account_numbers
+        }
+        # Books this manager keeps up to date; the primary book has its own poller listener
+        self._own_books = {account: book for account, book in self._books.items() if book is not primary_book}
+
+    def has_account(self, account_number):
+        return account_number in self._books
+
+    def fan_out(self, fn, account_numbers, timeout=None):
+        """
+        Call fn(account_number) for several accounts in parallel.
+
+        Args:
+            fn: Callable taking an account number
+            account_numbers: Accounts to call it for
+            timeout: Seconds to wait for all calls (defaults to config.FETCH_TIMEOUT)
+
+        Returns:
+            dict: Result per account; calls that raised or timed out map to None
+        """
+        if timeout is None:
+            timeout = config.FETCH_TIMEOUT
+
+        futures = {account: self.executor.submit(fn, account) for account in account_numbers}
+
+        deadline = time.monotonic() + timeout
+        results = {}
+        for account, future in futures.items():
+            try:
+                results[account] = future.result(timeout=max(0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                logger.error(f"Fetch for account {account} timed out after {timeout}s")
+                results[account] = None
+            except Exception as e:
+                logger.error(f"Fetch for account {account} failed: {str(e)}")
+                results[account] = None
+        return results
+
+    def get_balances(self, account_numbers=None):
+        """Get the balances of several accounts (all by default), served from the cache when fresh."""
+        return self.fan_out(self.client.get_cached_account_balance,
+                            self.account_numbers if account_numbers is None else account_numbers)
+
+    def load_positions(self, account_numbers=None, only_due=True):
+        """
+        Fetch the position books of several accounts (all by default) in parallel.
+
+        Args:
+            account_numbers: Accounts to load
+            only_due: Only load books that were never loaded, had a reload requested or are too old
+        """
+        books = {account: self._books[account]
+                 for account in (self.account_numbers if account_numbers is None else account_numbers)}
+        self.fan_out(lambda account: books[account].reload_if_due() if only_due else books[account].load(),
+                     list(books))
+
+    def request_reload(self, account_number=None):
+        """Fetch one account's positions (or all of them) again on the next snapshot."""
+        for account, book in self._books.items():
+            if account_number is None or account == account_number:
+                book.request_reload()
+
+    def record_snapshot(self, snapshot):
+        """Poller listener: reload the secondary accounts' books when due and mark them to the quotes."""
+        try:
+            if not self._own_books:
+                return
+            self.load_positions(list(self._own_books))
+            quotes = snapshot.get('quotes') or {}
+            for book in self._own_books.values():
+                held = book.get_symbols()
+                for symbol in held:
+                    quote = quotes.get(symbol)
+                    if quote and not quote.get('stale'):
+                        book.mark(symbol, quote.get('last_price') or 0, quote.get('timestamp'))
+        except Exception as e:
+            logger.error(f"Failed to update account positions: {str(e)}")
+
+    def get_symbols(self):
+        """Get the symbols held in the secondary accounts (polled so they can be marked)."""
+        symbols = []
+        for book in self._own_books.values():
+            symbols += book.get_symbols()
+        return list(dict.fromkeys(symbols))
+
+    def _ensure_loaded(self, account_numbers, poller_running):
+        """Load books that were never loaded when no poller is keeping them up to date."""
+        if poller_running or not self.track_positions:
+            return
+        pending = [account for account in account_numbers if self._books[account].get()['loaded_at'] is None]
+        if pending:
+            self.load_positions(pending)
+
+    def get_summary(self, poller_running=False):
+        """
+        Get every account's balance and P&L, the totals, and the positions merged by symbol.
+
+        Args:
+            poller_running: Whether the poller keeps the position books loaded
+
+        Returns:
+            dict: {'accounts': [...], 'totals': {...}, 'positions': [...], 'missing': [...]}
+        """
+        self._ensure_loaded(self.account_numbers, poller_running)
+        balances = self.get_balances()
+
+        rows = []
+        missing = []
+        totals = dict.fromkeys(('cash_balance', 'total_equity', 'buying_power',
+                                'market_value', 'unrealized_pnl', 'day_pnl'), 0.0)
+        merged = {}
+        for account in self.account_numbers:
+            balance = balances.get(account)
+            book = self._books[account].get()
+            if balance is None:
+                missing.append(account)
+            else:
+                for field in ('cash_balance', 'total_equity', 'buying_power'):
+                    totals[field] += balance.get(field) or 0.0
+            for field in ('market_value', 'unrealized_pnl', 'day_pnl'):
+                totals[field] += book['totals'][field]
+            rows.append({
+                'account_number': account,
+                'primary': account == self.primary,
+                'balance': balance,
+                'positions': len(book['positions']),
+                **book['totals'],
+                'loaded_at': book['loaded_at']
+            })
+            for position in book['positions']:
+                entry = merged.setdefault(position['symbol'], {
+                    'symbol': position['symbol'],
+                    'quantity': 0.0,
+                    'mark': position['mark'],
+                    'market_value': 0.0,
+                    'cost': 0.0,
+                    'unrealized_pnl': 0.0,
+                    'day_pnl': 0.0,
+                    'accounts': []
+                })
+                entry['quantity'] += position['quantity']
+                entry['market_value'] += position['market_value']
+                entry['cost'] += position['market_value'] - position['unrealized_pnl']
+                entry['unrealized_pnl'] += position['unrealized_pnl']
+                entry['day_pnl'] += position['day_pnl']
+                entry['accounts'].append(account)
+
+        cost = totals['market_value'] - totals['unrealized_pnl']
+        totals['unrealized_pnl_percent'] = totals['unrealized_pnl'] / abs(cost) * 100 if cost else 0.0
+        for entry in merged.values():
+            cost = entry.pop('cost')
+            entry['unrealized_pnl_percent'] = entry['unrealized_pnl'] / abs(cost) * 100 if cost else 0.0
+
+        return {
+            'accounts': rows,
+            'totals': totals,
+            'positions': sorted(merged.values(), key=lambda p: p['symbol']),
+            'missing': missing
+        }
+
+    def get_account(self, account_number, poller_running=False):
+        """
+        Get one account's balance and positions.
+
+        Returns:
+            dict: {'account_number', 'primary', 'balance', 'positions', 'totals', 'loaded_at'},
+            or None if the account is not configured
+        """
+        if not self.has_account(account_number):
+            return None
+        self._ensure_loaded([account_number], poller_running)
+        return {
+            'account_number': account_number,
+            'primary': account_number == self.primary,
+            'balance': self.client.get_cached_account_balance(account_number),
+            **self._books[account_number].get()
+        }
+
+# Create a singleton instance
+accounts = AccountManager(client, config.ACCOUNT_NUMBERS, config.ACCOUNTS_MAX_CONCURRENCY,
+                          primary=config.ACCOUNT_NUMBER, primary_book=positions,
+                          track_positions=config.POSITIONS_ENABLED)
@@ -0,0 +1,413 @@
+# /alerts.py
+"""
+Price alerts evaluated against every polled quote.
+
+A rule watches one measure of one symbol's quote and fires when it crosses a
+threshold:
+
+    {"symbol": "MSTU", "metric": "price", "direction": "above", "threshold": 12.5}
+
+metric is 'price' (last price), 'change_pct' (percent change on the day) or
+'spread_pct' (bid/ask spread as a percent of the mid price). An 'above' rule
+fires when the value moves from below the threshold to at or above it, a
+'below' rule when it moves from above to at or below it; either then rests
+for config.ALERTS_COOLDOWN seconds.
+
+Thresholds are kept in sorted bands per symbol, metric and direction, so a
+tick bisects for the rules between the previous and the new value instead of
+checking every rule.
+"""
+import bisect
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import requests
+
+import config
+from logger import get_logger
+from metrics import metrics
+from order_engine import SYMBOL_PATTERN
+from shared_state import state
+
+logger = get_logger(__name__)
+
+METRICS = ('price', 'change_pct', 'spread_pct')
+DIRECTIONS = ('above', 'below')
+MAX_NOTE_LENGTH = 200
+
+def validate_rule(spec):
+    """
+    Validate an alert rule and normalize it.
+
+    Args:
+        spec: Rule dict with symbol, metric (default 'price'), direction, threshold and an optional note
+
+    Returns:
+        tuple: (rule, errors) - the normalized rule (None if invalid) and a list of messages
+    """
+    if not isinstance(spec, dict):
+        return None, ['Rule must be an object']
+
+    errors = []
+    symbol = str(spec.get('symbol') or '').strip().upper()
+    if not SYMBOL_PATTERN.match(symbol):
+        errors.append(f'Invalid symbol {symbol!r}')
+
+    metric = spec.get('metric', 'price')
+    if metric not in METRICS:
+        errors.append(f"Invalid metric {metric!r}. Use one of: {', '.join(METRICS)}")
+
+    direction = spec.get('direction')
+    if direction not in DIRECTIONS:
+        errors.append(f"Invalid direction {direction!r}. Use 'above' or 'below'.")
+
+    try:
+        threshold = float(spec.get('threshold'))
+    except (TypeError, ValueError):
+        threshold = None
+    if threshold is None or threshold != threshold or threshold in (float('inf'), float('-inf')):
+        errors.append('Invalid threshold. Please enter a number.')
+
+    if errors:
+        return None, errors
+    return {
+        'symbol': symbol,
+        'metric': metric,
+        'direction': direction,
+        'threshold': threshold,
+        'note': str(spec.get('note') or '')[:MAX_NOTE_LENGTH]
+    }, []
+
+def quote_metrics(quote):
+    """
+    Get the values rules can watch from a quote.
+
+    Returns:
+        dict: metric -> value, leaving out what the quote does not provide
+    """
+    values = {}
+    try:
+        price = float(quote.get('last_price') or 0)
+        if price <= 0:
+            return values  # Empty quote
+        values['price'] = price
+        if quote.get('percent_change') is not None:
+            values['change_pct'] = float(quote['percent_change'])
+        bid = float(quote.get('bid_price') or 0)
+        ask = float(quote.get('ask_price') or 0)
+        if 0 < bid <= ask:
+            values['spread_pct'] = (ask - bid) / ((ask + bid) / 2) * 100
+    except (TypeError, ValueError):
+        pass
+    return values
+
+class ThresholdBand:
+    """Rule ids of one symbol, metric and direction, sorted by threshold."""
+
+    __slots__ = ('direction', 'thresholds', 'rule_ids')
+
+    def __init__(self, direction):
+        self.direction = direction
+        self.thresholds = []
+        self.rule_ids = []
+
+    def add(self, threshold, rule_id):
+        index = bisect.bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(index, threshold)
+        self.rule_ids.insert(index, rule_id)
+
+    def crossed(self, previous, value):
+        """Get the ids of the rules crossed by a move from previous to value."""
+        if self.direction == 'above':
+            if value <= previous:
+                return []
+            # previous < threshold <= value
+            low = bisect.bisect_right(self.thresholds, previous)
+            high = bisect.bisect_right(self.thresholds, value)
+        else:
+            if value >= previous:
+                return []
+            # value <= threshold < previous
+            low = bisect.bisect_left(self.thresholds, value)
+            high = bisect.bisect_left(self.thresholds, previous)
+        return self.rule_ids[low:high]
+
+class WebhookSink:
+    """
+    Deliver alerts as JSON POSTs from a background thread.
+
+    Sending never blocks the poller: alerts wait in a bounded queue (dropped
+    and counted when it is full) and failed deliveries are retried with
+    backoff.
+    """
+
+    def __init__(self, url, timeout, retries, queue_size):
+        self.url = url
+        self.timeout = timeout
+        self.retries = retries
+        self._queue = queue.Queue(queue_size)
+        self._session = requests.Session()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def send(self, event):
+        """Queue an alert for delivery."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            metrics.inc('alert_webhook_deliveries_total', result='dropped')
+            logger.warning("Alert webhook queue full, dropping alert %s", event['id'])
+
+    def _ensure_started(self):
+        # Started on first use so that each gunicorn worker gets its own thread
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='alert-webhook', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self.deliver(self._queue.get())
+
+    def deliver(self, event):
+        """
+        POST one alert, retrying failures.
+
+        Returns:
+            bool: Whether the webhook accepted it
+        """
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(0.5 * 2 ** (attempt - 1))
+            try:
+                response = self._session.post(self.url, json=event, timeout=self.timeout)
+                if response.status_code < 300:
+                    metrics.inc('alert_webhook_deliveries_total', result='sent')
+                    return True
+                error = f"HTTP {response.status_code}"
+                # Other client errors will not succeed on a retry
+                if 400 <= response.status_code < 500 and response.status_code != 429:
+                    break
+            except requests.RequestException as e:
+                error = str(e)
+        metrics.inc('alert_webhook_deliveries_total', result='failed')
+        logger.error(f"Failed to deliver alert {event['id']} to webhook: {error}")
+        return False
+
+class AlertEngine:
+    """
+    Alert rules indexed by threshold, evaluated against each poller snapshot.
+
+    The rules live in the shared state so every worker evaluates the same set;
+    each worker rebuilds its index when the shared version changes. Every
+    worker pushes the alerts it sees to its own stream clients, but only the
+    first worker to fire a rule within the cooldown records it and sends the
+    webhook.
+    """
+
+    def __init__(self, state, cooldown, history_size, max_rules, sink=None):
+        """
+        Args:
+            state: Shared state backend holding the rules and fired alerts
+            cooldown: Seconds before a rule can fire again
+            history_size: Fired alerts kept
+            max_rules: Most rules accepted
+            sink: WebhookSink receiving every recorded alert, if any
+        """
+        self.state = state
+        self.cooldown = cooldown
+        self.history_size = history_size
+        self.max_rules = max_rules
+        self.sink = sink
+        self._lock = threading.Lock()
+        self._rules = {}  # rule id -> rule
+        self._bands = {}  # (symbol, metric, direction) -> ThresholdBand
+        self._version = None  # Shared rules version the index was built from
+        self._previous = {}  # (symbol, metric) -> last value seen
+        self._last_fired = {}  # rule id -> time.monotonic() this worker last fired it
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """Register a callable that receives every alert this worker fires."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def sync(self):
+        """Rebuild the threshold index if the shared rules changed."""
+        version = self.state.get('alerts:version') or 0
+        if version == self._version:
+            return
+        rules = self.state.get('alerts:rules') or {}
+        bands = {}
+        # Adding in threshold order appends to each band, so the rebuild is one sort
+        for rule_id, rule in sorted(rules.items(), key=lambda item: item[1]['threshold']):
+            key = (rule['symbol'], rule['metric'], rule['direction'])
+            band = bands.get(key)
+            if band is None:
+                band = bands[key] = ThresholdBand(rule['direction'])
+            band.add(rule['threshold'], rule_id)
+        with self._lock:
+            self._rules, self._bands, self._version = rules, bands, version
+        logger.info("Loaded %d alert rules", len(rules))
+
+    def add_rules(self, specs):
+        """
+        Validate and add rules.
+
+        Returns:
+            list: Per spec, {'index', 'success', 'rule'} or {'index', 'success', 'errors'}
+        """
+        results = []
+        with self.state.lock('alerts:rules'):
+            rules = self.state.get('alerts:rules') or {}
+            symbols = {rule['symbol'] for rule in rules.values()}
+            for index, spec in enumerate(specs):
+                rule, errors = validate_rule(spec)
+                if not errors and len(rules) >= self.max_rules:
+                    errors = [f'Too many rules. At most {self.max_rules} are allowed.']
+                # Every symbol with a rule is polled
+                if not errors and rule['symbol'] not in symbols and len(symbols) >= config.MAX_QUOTE_SYMBOLS:
+                    errors = [f'Too many symbols. Rules can watch at most {config.MAX_QUOTE_SYMBOLS}.']
+                if errors:
+                    results.append({'index': index, 'success': False, 'errors': errors})
+                    continue
+                rule['id'] = uuid.uuid4().hex[:12]
+                rule['created_at'] = datetime.now().isoformat()
+                rules[rule['id']] = rule
+                symbols.add(rule['symbol'])
+                results.append({'index': index, 'success': True, 'rule': rule})
+            if any(result['success'] for result in results):
+                self.state.set('alerts:rules', rules)
+                self.state.incr('alerts:version')
+        self.sync()
+        return results
+
+    def remove_rule(self, rule_id):
+        """
+        Delete a rule.
+
+        Returns:
+            bool: Whether the rule existed
+        """
+        with self.state.lock('alerts:rules'):
+            rules = self.state.get('alerts:rules') or {}
+            if rules.pop(rule_id, None) is None:
+                return False
+            self.state.set('alerts:rules', rules)
+            self.state.incr('alerts:version')
+        self.sync()
+        return True
+
+    def get_rules(self):
+        """Get every rule, oldest first."""
+        self.sync()
+        return sorted(self._rules.values(), key=lambda rule: rule['created_at'])
+
+    def get_events(self, limit=None):
+        """Get the recorded alerts, newest first."""
+        events = self.state.items('alerts:events')[::-1]
+        return events[:limit] if limit else events
+
+    def get_symbols(self):
+        """Get the symbols that have rules (polled so they can be evaluated)."""
+        return list(dict.fromkeys(symbol for symbol, _, _ in self._bands))
+
+    def evaluate(self, quotes):
+        """
+        Check quotes against the rules and fire the ones crossed since the previous quotes.
+
+        Args:
+            quotes: dict mapping symbol to quote dict
+
+        Returns:
+            list: Alerts fired
+        """
+        started = time.perf_counter()
+        with self._lock:
+            bands, rules = self._bands, self._rules
+        crossed = []
+        for symbol, quote in quotes.items():
+            if not quote or quote.get('stale'):
+                continue
+            for metric, value in quote_metrics(quote).items():
+                key = (symbol, metric)
+                previous = self._previous.get(key)
+                self._previous[key] = value
+                if previous is None or previous == value:
+                    continue
+                for direction in DIRECTIONS:
+                    band = bands.get((symbol, metric, direction))
+                    if band is not None:
+                        crossed += [(rule_id, previous, value, quote) for rule_id in band.crossed(previous, value)]
+        metrics.observe('alert_evaluation_ms', (time.perf_counter() - started) * 1000)
+
+        fired = []
+        now = time.monotonic()
+        for rule_id, previous, value, quote in crossed:
+            rule = rules.get(rule_id)
+            last = self._last_fired.get(rule_id)
+            if rule is None or (last is not None and now - last < self.cooldown):
+                continue
+            self._last_fired[rule_id] = now
+            event = {
+                'id': uuid.uuid4().hex,
+                'rule_id': rule_id,
+                'symbol': rule['symbol'],
+                'metric': rule['metric'],
+                'direction': rule['direction'],
+                'threshold': rule['threshold'],
+                'value': value,
+                'previous': previous,
+                'note': rule['note'],
+                'quote_timestamp': quote.get('timestamp'),
+                'triggered_at': datetime.now().isoformat()
+            }
+            self._fire(event)
+            fired.append(event)
+        return fired
+
+    def _fire(self, event):
+        """Record and deliver an alert (once across workers) and notify this worker's listeners."""
+        key = f"alerts:fired:{event['rule_id']}"
+        with self.state.lock('alerts:fired'):
+            first = self.state.get(key) is None
+            if first:
+                self.state.set(key, event['id'], ttl=max(self.cooldown, 1))
+        if first:
+            logger.info("Alert %s: %s %s crossed %s %s (%s)", event['rule_id'], event['symbol'],
+                        event['metric'], event['direction'], event['threshold'], event['value'])
+            metrics.inc('alerts_fired_total', metric=event['metric'])
+            self.state.append('alerts:events', event, self.history_size)
+            if self.sink is not None:
+                self.sink.send(event)
+
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"Alert listener failed: {str(e)}")
+
+    def record_snapshot(self, snapshot):
+        """Poller listener: evaluate the snapshot's quotes."""
+        try:
+            self.sync()
+            self.evaluate(snapshot.get('quotes') or {})
+        except Exception as e:
+            logger.error(f"Failed to evaluate alerts: {str(e)}")
+
+# Create a singleton instance
+alerts = AlertEngine(
+    state, config.ALERTS_COOLDOWN, config.ALERTS_HISTORY_SIZE, config.ALERTS_MAX_RULES,
+    sink=WebhookSink(config.ALERT_WEBHOOK_URL, config.ALERT_WEBHOOK_TIMEOUT, config.ALERT_WEBHOOK_RETRIES,
+                     config.ALERT_WEBHOOK_QUEUE_SIZE) if config.ALERT_WEBHOOK_URL else None
+)
+metrics.describe('alerts_fired_total', 'Alerts recorded by rule metric')
+metrics.describe('alert_evaluation_ms', 'Time spent checking a snapshot against the alert rules in milliseconds')
+metrics.describe('alert_webhook_deliveries_total', 'Alert webhook deliveries by result (sent, failed, dropped)')
@@ -0,0 +1,270 @@
+# /analytics.py
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+import config
+from history_store import EASTERN, history
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Regular session open in US/Eastern; change since open is measured from the first price after it
+MARKET_OPEN = (9, 30)
+# Realized volatility is annualized over 252 sessions of 6.5 hours
+TRADING_SECONDS_PER_YEAR = 252 * 6.5 * 3600
+
+# Spread buckets (basis points of the midpoint) grow by 5% each, like the latency histograms
+SPREAD_BUCKET_GROWTH = 1.05
+SPREAD_BUCKET_MIN_BPS = 0.1
+_LOG_SPREAD_GROWTH = math.log(SPREAD_BUCKET_GROWTH)
+
+SPREAD_QUANTILES = (0.5, 0.9, 0.99)
+
+def _spread_bucket(spread_bps):
+    """Get the histogram bucket index for a spread in basis points."""
+    if spread_bps <= SPREAD_BUCKET_MIN_BPS:
+        return 0
+    return int(math.log(spread_bps / SPREAD_BUCKET_MIN_BPS) / _LOG_SPREAD_GROWTH) + 1
+
+def _spread_upper_bound(index):
+    """Get the upper bound (bps) of a spread bucket."""
+    return SPREAD_BUCKET_MIN_BPS * SPREAD_BUCKET_GROWTH ** index
+
+def _session_bounds(timestamp):
+    """Get the epoch seconds of a timestamp's Eastern day start, next day start and regular session open."""
+    moment = datetime.fromtimestamp(timestamp, EASTERN)
+    day = datetime(moment.year, moment.month, moment.day)
+    return (EASTERN.localize(day).timestamp(),
+            EASTERN.localize(day + timedelta(days=1)).timestamp(),
+            EASTERN.localize(day.replace(hour=MARKET_OPEN[0], minute=MARKET_OPEN[1])).timestamp())
+
+class RollingStats:
+    """
+    Rolling intraday statistics of one symbol over a time window.
+
+    Every tick updates running sums, and ticks older than the window are
+    subtracted back out as they expire, so adding a tick and reading the
+    statistics both take constant time however many ticks the window holds.
+    Quotes carry no traded volume, so the VWAP weights each price by the
+    seconds it stood before the next tick (a time-weighted average).
+    """
+
+    def __init__(self, window):
+        """
+        Args:
+            window: Window length in seconds
+        """
+        self.window = window
+        # (timestamp, weighted price, weight, squared log return, spread bps, spread bucket)
+        self._ticks = deque()
+        self._weighted_sum = 0.0
+        self._weight = 0.0
+        self._squared_returns = 0.0
+        self._spread_sum = 0.0
+        self._spread_count = 0
+        self._spread_buckets = {}
+        self._last_timestamp = None
+        self._last_price = None
+        self.open_price = None
+        self._session = None  # (session open, regular hours) the open price belongs to
+        self._day = (0.0, 0.0, 0.0)  # Cached _session_bounds of the current day
+
+    def add(self, timestamp, bid, ask, last):
+        """
+        Add one tick.
+
+        Args:
+            timestamp: Epoch seconds; ticks must arrive in time order
+            bid, ask, last: Quote prices; the midpoint is used when last is 0
+        """
+        price = last or (bid + ask) / 2
+        if not price or (self._last_timestamp is not None and timestamp < self._last_timestamp):
+            return
+
+        weight = weighted = squared_return = 0.0
+        if self._last_price:
+            # The previous price stood until this tick
+            weight = min(timestamp - self._last_timestamp, self.window)
+            weighted = self._last_price * weight
+            squared_return = math.log(price / self._last_price) ** 2
+        spread = bucket = None
+        if bid > 0 and ask >= bid:
+            spread = (ask - bid) / ((ask + bid) / 2) * 10000
+            bucket = _spread_bucket(spread)
+
+        self._ticks.append((timestamp, weighted, weight, squared_return, spread, bucket))
+        self._weighted_sum += weighted
+        self._weight += weight
+        self._squared_returns += squared_return
+        if bucket is not None:
+            self._spread_sum += spread
+            self._spread_count += 1
+            self._spread_buckets[bucket] = self._spread_buckets.get(bucket, 0) + 1
+
+        if not self._day[0] <= timestamp < self._day[1]:
+            self._day = _session_bounds(timestamp)
+        session_open = self._day[2]
+        session = (session_open, timestamp >= session_open)
+        if session != self._session:
+            # First tick of the day (pre-market) or of the regular session
+            self._session = session
+            self.open_price = price
+        self._last_timestamp = timestamp
+        self._last_price = price
+        self._expire(timestamp)
+
+    def _expire(self, now):
+        """Subtract the ticks that have left the window."""
+        ticks = self._ticks
+        while ticks and ticks[0][0] <= now - self.window:
+            _, weighted, weight, squared_return, spread, bucket = ticks.popleft()
+            self._weighted_sum -= weighted
+            self._weight -= weight
+            self._squared_returns -= squared_return
+            if bucket is not None:
+                self._spread_sum -= spread
+                self._spread_count -= 1
+                remaining = self._spread_buckets[bucket] - 1
+                if remaining:
+                    self._spread_buckets[bucket] = remaining
+                else:
+                    del self._spread_buckets[bucket]
+        if not ticks:
+            # Start the sums afresh so rounding errors cannot accumulate
+            self._weighted_sum = self._weight = self._squared_returns = self._spread_sum = 0.0
+
+    def _spread_percentile(self, quantile, count):
+        """Get the spread (bps) at a quantile between 0 and 1."""
+        target = quantile * count
+        seen = 0
+        for index in sorted(self._spread_buckets):
+            seen += self._spread_buckets[index]
+            if seen >= target:
+                return _spread_upper_bound(index)
+        return 0.0
+
+    def get_stats(self):
+        """
+        Get the statistics of the ticks in the window.
+
+        Returns:
+            dict: ticks, price, vwap, open, change, change_percent, volatility
+                  (annualized realized volatility in percent) and spread_bps
+                  (mean and percentiles); values are None until known
+        """
+        ticks = self._ticks
+        price = self._last_price
+        spread_count = self._spread_count
+        change = price - self.open_price if price and self.open_price else None
+        volatility = None
+        if self._weight > 0:
+            # The returns in the window span exactly the seconds the VWAP weights add up to
+            variance = max(0.0, self._squared_returns) / self._weight * TRADING_SECONDS_PER_YEAR
+            volatility = round(math.sqrt(variance) * 100, 4)
+        return {
+            'ticks': len(ticks),
+            'window': self.window,
+            'from': ticks[0][0] if ticks else None,
+            'to': self._last_timestamp,
+            'price': price,
+            'vwap': round(self._weighted_sum / self._weight, 4) if self._weight > 0 else price,
+            'open': self.open_price,
+            'change': round(change, 4) if change is not None else None,
+            'change_percent': round(change / self.open_price * 100, 4) if change is not None else None,
+            'volatility': volatility,
+            'spread_bps': {
+                'mean': round(self._spread_sum / spread_count, 4) if spread_count else None,
+                **{f'p{int(q * 100)}': round(self._spread_percentile(q, spread_count), 4) if spread_count else None
+                   for q in SPREAD_QUANTILES}
+            }
+        }
+
+class IntradayAnalytics:
+    """
+    Live rolling statistics per symbol, plus batch statistics over recorded history.
+
+    The live statistics are fed by the poller with every fresh quote. Batch
+    statistics replay the recorded quotes of a range through the same
+    calculation, so both always agree.
+    """
+
+    def __init__(self, window):
+        """
+        Args:
+            window: Default rolling window in seconds
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self._stats = {}  # symbol -> RollingStats
+        self._last_seen = {}  # symbol -> timestamp of the last quote added
+
+    def record_snapshot(self, snapshot):
+        """Poller listener: add the snapshot's fresh quotes to the live statistics."""
+        now = time.time()
+        try:
+            for symbol, quote in (snapshot.get('quotes') or {}).items():
+                # Skip stale and unchanged quotes, as the history store does
+                if quote.get('stale') or self._last_seen.get(symbol) == quote.get('timestamp'):
+                    continue
+                self._last_seen[symbol] = quote.get('timestamp')
+                with self._lock:
+                    stats = self._stats.get(symbol)
+                    if stats is None:
+                        stats = self._stats[symbol] = self._seed(symbol, now)
+                    stats.add(now, quote.get('bid_price') or 0, quote.get('ask_price') or 0,
+                              quote.get('last_price') or 0)
+        except Exception as e:
+            logger.error(f"Failed to update analytics: {str(e)}")
+
+    def _seed(self, symbol, now):
+        """Start a symbol's live statistics from the recorded history of the last window."""
+        stats = RollingStats(self.window)
+        if not config.HISTORY_ENABLED:
+            return stats
+        try:
+            # Replay from the session open when it is earlier, so change since open is right after a restart
+            start = min(now - self.window, _session_bounds(now)[2])
+            self._replay(stats, symbol, start, now)
+        except Exception as e:
+            logger.warning(f"Could not seed analytics for {symbol} from history: {str(e)}")
+        return stats
+
+    @staticmethod
+    def _replay(stats, symbol, start, end):
+        """Feed the recorded quotes of a range into a RollingStats."""
+        add = stats.add
+        for tick in history.query('quotes', symbol, start, end):
+            add(*tick)
+
+    def get(self, symbol):
+        """
+        Get a symbol's live rolling statistics.
+
+        Returns:
+            dict or None: See RollingStats.get_stats; None if no quotes were seen yet
+        """
+        with self._lock:
+            stats = self._stats.get(symbol)
+            return stats.get_stats() if stats else None
+
+    def compute(self, symbol, start, end, window=None):
+        """
+        Compute statistics over recorded quotes.
+
+        Args:
+            symbol: Symbol to compute
+            start, end: Range in epoch seconds (start <= timestamp < end)
+            window: Rolling window in seconds ending at the last tick (defaults to the whole range)
+
+        Returns:
+            dict: See RollingStats.get_stats
+        """
+        stats = RollingStats(window or end - start)
+        self._replay(stats, symbol, start, end)
+        return stats.get_stats()
+
+# Create a singleton instance
+analytics = IntradayAnalytics(config.ANALYTICS_WINDOW)
@@ -3,11 +3,21 @@ import os
 import threading
 import signal
 import sys
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 
 import config
 from logger import get_logger
+from accounts import accounts
+from alerts import alerts
+from analytics import analytics
 from dashboard import dashboard
+from history_store import history
+from metrics import metrics
+from orders import order_queue
+from poller import poller
+from positions import positions
+from quote_streamer import streamer
+from stream import broadcaster
 from tastytrade_client import client
 
 # Initialize logger
@@ -17,21 +27,59 @@ logger = get_logger(__name__)
 client_init_lock = threading.Lock()
 client_initialized = False
 
-def signal_handler(sig, frame):
-    """Handle shutdown signals gracefully."""
-    logger.info(f"Received signal {sig}, shutting down...")
-    # Perform any cleanup needed
-    if hasattr(client, 'authenticated') and client.authenticated:
+def shutdown():
+    """Stop the background work and end the session."""
+    poller.stop()
+    streamer.stop()
+    # A persisted session is shared with the other workers, so leave it open
+    if hasattr(client, 'authenticated') and client.authenticated and not config.SESSION_PERSIST:
         try:
-            client.tasty.logout()
+            client.logout()
             logger.info("Successfully logged out of Tastytrade API")
         except Exception as e:
             logger.error(f"Error during logout: {str(e)}")
+
+def signal_handler(sig, frame):
+    """Handle shutdown signals gracefully."""
+    logger.info(f"Received signal {sig}, shutting down...")
+    shutdown()
     sys.exit(0)
 
-# Register signal handlers
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
+def install_signal_handlers():
+    """Shut down on SIGINT and SIGTERM when serving WSGI."""
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+# Register signal handlers under the WSGI entry point only: when asgi.py imports
+# this module, uvicorn owns the signals and shuts down through the ASGI lifespan
+if 'asgi' not in sys.modules:
+    install_signal_handlers()
+
+def initialize_client():
+    """Authenticate the Tastytrade client once per process."""
+    global client_initialized
+    if not client_initialized:
+        with client_init_lock:
+            if not client_initialized:
+                logger.info("Initializing Tastytrade client")
+                try:
+                    # Try to authenticate but don't raise exceptions
+                    success = client.authenticate()
+                    if not success:
+                        logger.warning("Authentication failed, but continuing in limited mode")
+                except Exception as e:
+                    logger.error(f"Authentication error: {str(e)} - continuing in limited mode")
+                
+                # Always mark as initialized to prevent repeated attempts
+                client_initialized = True
+
+def recover_orders():
+    """Authenticate, then requeue or fail the orders stopped workers left open."""
+    initialize_client()
+    try:
+        order_queue.recover()
+    except Exception as e:
+        logger.error(f"Order recovery failed: {str(e)}")
 
 def create_app():
     """Create and configure the Flask application."""
@@ -57,24 +105,54 @@ def create_app():
         logger.error(f"500 error: {str(e)}")
         return jsonify({"error": "Server Error", "message": "An internal server error occurred"}), 500
     
+    # Prometheus metrics aggregated across all workers
+    @app.route('/metrics')
+    def prometheus_metrics():
+        return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+    
+    metrics.start_flusher()
+    
     # Before request handler to ensure client is initialized
     @app.before_request
     def ensure_client():
-        global client_initialized
-        if not client_initialized:
-            with client_init_lock:
-                if not client_initialized:
-                    logger.info("Initializing Tastytrade client")
-                    try:
-                        # Try to authenticate but don't raise exceptions
-                        success = client.authenticate()
-                        if not success:
-                            logger.warning("Authentication failed, but continuing in limited mode")
-                    except Exception as e:
-                        logger.error(f"Authentication error: {str(e)} - continuing in limited mode")
-                    
-                    # Always mark as initialized to prevent repeated attempts
-                    client_initialized = True
+        initialize_client()
+    
+    # Stream quotes into the client's quote book; it waits for authentication on its own
+    if config.STREAMER_ENABLED:
+        streamer.start()
+    
+    # Start the background poller so requests are served from its snapshot.
+    # Gunicorn imports the app in each worker, so every worker runs its own poller.
+    if config.POLLER_ENABLED:
+        if config.POSITIONS_ENABLED:
+            # Mark positions before the snapshot is streamed, and poll quotes for every held symbol
+            poller.add_listener(positions.record_snapshot)
+            poller.add_symbol_source(positions.get_symbols)
+            order_queue.add_listener(lambda order: order['status'] == 'Filled' and positions.request_reload())
+            # The other configured accounts' positions are loaded in parallel and marked the same way
+            poller.add_listener(accounts.record_snapshot)
+            poller.add_symbol_source(accounts.get_symbols)
+        if config.STREAM_ENABLED:
+            poller.add_listener(broadcaster.publish_snapshot)
+        if config.ALERTS_ENABLED:
+            # Evaluate every quote against the rules, and poll every symbol that has one
+            poller.add_listener(alerts.record_snapshot)
+            poller.add_symbol_source(alerts.get_symbols)
+            if config.STREAM_ENABLED:
+                alerts.add_listener(lambda event: broadcaster.publish('alert', event))
+        if config.STREAMER_ENABLED:
+            # Stream every polled symbol, including the ones positions and alert rules add
+            poller.add_listener(streamer.record_snapshot)
+        if config.HISTORY_ENABLED:
+            poller.add_listener(history.record_snapshot)
+        poller.add_listener(analytics.record_snapshot)
+        # Accepted and filled orders change the balances
+        order_queue.add_listener(
+            lambda order: order['status'] in ('Received', 'Filled') and poller.request_balance_refresh())
+        poller.start(initialize=initialize_client)
+    
+    # Orders a stopped worker left queued or submitting are picked up once the client is authenticated
+    threading.Thread(target=recover_orders, name='order-recovery', daemon=True).start()
     
     return app
 
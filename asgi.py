@@ -0,0 +1,207 @@
+# /asgi.py
+"""
+ASGI entry point, an alternative to serving app:app with gunicorn threads.
+
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT --workers 4
+
+Dashboard streams (/api/stream) and quote lookups (/api/quotes) are served on
+the event loop, so an open stream or a slow broker call no longer holds a
+thread. Every other route is handed to the Flask app in a thread pool, which
+behaves exactly as under gunicorn.
+"""
+import asyncio
+import io
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import config
+from app import app as flask_app
+from app import initialize_client, shutdown
+from async_transport import AsyncBrokerTransport
+from dashboard import parse_quote_symbols, quotes_payload
+from logger import get_logger
+from stream import broadcaster
+from tastytrade_client import client
+
+logger = get_logger(__name__)
+
+class WsgiBridge:
+    """
+    Run a WSGI app for ASGI requests in a thread pool.
+
+    Request bodies are read fully before the app is called and response
+    bodies are sent as the app produces them.
+    """
+
+    def __init__(self, wsgi_app, max_workers):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        body = await _read_body(receive)
+        environ = self._environ(scope, body)
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+            return lambda data: None  # The legacy write() callable is not supported
+
+        result = await loop.run_in_executor(self.executor, self.wsgi_app, environ, start_response)
+        chunks = iter(result)
+        try:
+            await send({'type': 'http.response.start', 'status': started['status'],
+                        'headers': started['headers']})
+            while True:
+                chunk = await loop.run_in_executor(self.executor, next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                await loop.run_in_executor(self.executor, result.close)
+
+    @staticmethod
+    def _environ(scope, body):
+        """Build the WSGI environ of an ASGI HTTP request."""
+        server = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                environ[name] = value
+                continue
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+async def _read_body(receive):
+    """Read a complete ASGI request body."""
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return body
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+async def _send_json(send, status, data):
+    """Send a complete JSON response."""
+    body = json.dumps(data).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': status, 'headers': [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode('latin-1'))
+    ]})
+    await send({'type': 'http.response.body', 'body': body})
+
+async def _wait_for_disconnect(receive):
+    """Return once the client has gone away."""
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+async def stream(scope, receive, send):
+    """Server-Sent Events endpoint; the asyncio counterpart of dashboard.stream."""
+    if not (config.STREAM_ENABLED and config.POLLER_ENABLED):
+        return await _send_json(send, 404, {
+            'error': 'Not Found',
+            'message': 'Streaming is disabled. Poll /api/data instead.'
+        })
+
+    logger.info("API request for dashboard stream")
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream; charset=utf-8'),
+        (b'cache-control', b'no-cache'),
+        (b'x-accel-buffering', b'no')  # Stop proxies from buffering events
+    ]})
+
+    async def pump():
+        async for message in broadcaster.astream():
+            await send({'type': 'http.response.body', 'body': message.encode('utf-8'), 'more_body': True})
+
+    # Stop streaming as soon as the browser disconnects rather than at the next write
+    pumping = asyncio.ensure_future(pump())
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    done, pending = await asyncio.wait({pumping, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
+    if pumping in done:
+        pumping.result()
+        await send({'type': 'http.response.body', 'body': b''})
+
+async def quotes(scope, receive, send):
+    """Quotes endpoint; the asyncio counterpart of dashboard.get_quotes."""
+    query = parse_qs(scope['query_string'].decode('latin-1'))
+    symbols, error = parse_quote_symbols(query.get('symbols', [''])[0])
+    if error:
+        return await _send_json(send, 400, error)
+
+    # Check if the client is authenticated
+    if not client.authenticated:
+        return await _send_json(send, 200, quotes_payload(symbols, None))
+
+    await _send_json(send, 200, quotes_payload(symbols, await client.aget_cached_quotes(symbols)))
+
+# Routes served on the event loop; everything else goes to the Flask app
+ROUTES = {
+    ('GET', '/api/stream'): stream,
+    ('GET', '/api/quotes'): quotes
+}
+
+class AsgiApp:
+    """ASGI application serving the I/O-bound routes natively and the rest through Flask."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi = WsgiBridge(wsgi_app, config.ASGI_WSGI_THREADS)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+
+        handler = ROUTES.get((scope['method'], scope['path']))
+        if handler is None:
+            return await self.wsgi(scope, receive, send)
+        # Same per-request hook as the Flask app's before_request
+        await asyncio.get_running_loop().run_in_executor(self.wsgi.executor, initialize_client)
+        await handler(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        """Set up the async transport on startup and stop background work on shutdown."""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                client.aapi = AsyncBrokerTransport(client.api)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # Joining the background threads can take a few seconds; keep the loop free meanwhile
+                await asyncio.to_thread(shutdown)
+                if client.aapi is not None:
+                    await client.aapi.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+app = AsgiApp(flask_app)
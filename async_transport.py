@@ -0,0 +1,205 @@
+# /async_transport.py
+import asyncio
+import time
+
+import httpx
+
+import config
+from logger import get_logger
+from metrics import metrics
+from replay import recorder, replay_store
+from transport import RETRY_STATUSES, USER_AGENT, BrokerApiError, CircuitOpenError, get_endpoint_class
+
+logger = get_logger(__name__)
+
+class RecordingAsyncTransport(httpx.AsyncHTTPTransport):
+    """httpx transport that records every exchange it sends."""
+
+    def __init__(self, recorder, **kwargs):
+        self.recorder = recorder
+        super().__init__(**kwargs)
+
+    async def handle_async_request(self, request):
+        started = time.perf_counter()
+        response = await super().handle_async_request(request)
+        await response.aread()
+        self.recorder.record(request.method, str(request.url), response.status_code, response.headers,
+                             response.text, (time.perf_counter() - started) * 1000)
+        return response
+
+class ReplayAsyncTransport(httpx.AsyncBaseTransport):
+    """httpx transport that answers from a ReplayStore instead of the network."""
+
+    def __init__(self, store):
+        self.store = store
+
+    async def handle_async_request(self, request):
+        status, headers, body, latency = self.store.lookup(request.method, str(request.url))
+        if latency:
+            await asyncio.sleep(latency)
+        return httpx.Response(status, headers=headers, content=body.encode('utf-8'), request=request)
+
+def _create_http_transport(limits):
+    """Create the httpx transport: replaying, recording or plain, like BrokerTransport's adapter."""
+    if replay_store is not None:
+        return ReplayAsyncTransport(replay_store)
+    if recorder is not None:
+        return RecordingAsyncTransport(recorder, limits=limits)
+    return httpx.AsyncHTTPTransport(limits=limits)
+
+class AsyncBrokerTransport:
+    """
+    Asyncio HTTP transport for the Tastytrade REST API, used by the ASGI server.
+
+    It wraps a BrokerTransport and shares its session token, rate limiter and
+    circuit breakers, so sync and async requests from one worker count
+    against the same budgets and the session is still managed in one place.
+    Waiting on the broker or for a rate limit token yields to the event loop
+    instead of holding a thread.
+    """
+
+    def __init__(self, transport):
+        """
+        Args:
+            transport: The BrokerTransport whose session and limits are shared
+        """
+        self.transport = transport
+        self.client = httpx.AsyncClient(
+            headers={'User-Agent': USER_AGENT, 'Accept': 'application/json'},
+            transport=_create_http_transport(httpx.Limits(max_connections=config.HTTP_POOL_SIZE,
+                                                          max_keepalive_connections=config.HTTP_POOL_SIZE))
+        )
+        self.timeouts = {
+            name: httpx.Timeout(read, connect=connect) for name, (connect, read) in transport.timeouts.items()
+        }
+
+    async def _acquire(self, endpoint_class, priority):
+        """Wait for a rate limit token without blocking the event loop."""
+        limiter = self.transport.rate_limiter
+        if limiter is None:
+            return True
+        started = time.monotonic()
+        while True:
+            # The limiter's state is shared with the other workers under a file lock
+            wait = await asyncio.to_thread(limiter.try_acquire, endpoint_class, priority)
+            waited = time.monotonic() - started
+            if not wait:
+                if waited:
+                    metrics.observe('rate_limit_wait_ms', waited * 1000, endpoint_class=endpoint_class)
+                return True
+            if waited + wait > config.RATE_LIMIT_MAX_WAIT:
+                metrics.inc('rate_limit_rejections_total', endpoint_class=endpoint_class)
+                logger.warning(f"Rate limit: no {endpoint_class} capacity within {config.RATE_LIMIT_MAX_WAIT}s")
+                return False
+            await asyncio.sleep(wait)
+
+    async def _send(self, method, path, params, data, endpoint_class):
+        """Send one request, retrying idempotent GETs like BrokerTransport does."""
+        url = f"{self.transport.base_url}{path}"
+        attempts = config.HTTP_RETRIES + 1 if method == 'GET' else 1
+        for attempt in range(attempts):
+            headers = {}
+            token = self.transport.session.headers.get('Authorization')
+            if token:
+                headers['Authorization'] = token
+            try:
+                response = await self.client.request(method, url, params=params, json=data, headers=headers,
+                                                     timeout=self.timeouts[endpoint_class])
+            except httpx.TransportError:
+                if attempt == attempts - 1:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+                    return response, token
+            await asyncio.sleep(config.HTTP_RETRY_BACKOFF * 2 ** attempt)
+
+    async def request(self, method, path, params=None, data=None, priority=None):
+        """
+        Send a request to the broker API.
+
+        Args:
+            method: HTTP method
+            path: API path, e.g. '/accounts/123/balances'
+            params: Query parameters as a dict or a list of (key, value) tuples
+            data: JSON body
+            priority: Rate limit priority ('high', 'normal' or 'low'; defaults by endpoint class)
+
+        Returns:
+            dict or None: Parsed JSON response (None for empty bodies)
+        """
+        endpoint_class = get_endpoint_class(path)
+        breaker = self.transport.circuit_breakers.get(endpoint_class)
+        if breaker and not breaker.allow():
+            metrics.inc('broker_request_errors_total', endpoint_class=endpoint_class,
+                        method=method, error='circuit_open')
+            raise CircuitOpenError(endpoint_class, breaker.get_stats()['retry_in'])
+        if not await self._acquire(endpoint_class, priority):
+            if breaker:
+                breaker.release()
+            metrics.inc('broker_request_errors_total', endpoint_class=endpoint_class,
+                        method=method, error='rate_limited')
+            raise BrokerApiError(429, f"Client-side rate limit for {endpoint_class} requests exceeded")
+        started = time.perf_counter()
+        try:
+            response, token = await self._send(method, path, params, data, endpoint_class)
+
+            # Retry once with a fresh session if the token was rejected; logging in again is
+            # rare and goes through the sync client, so run it off the event loop
+            on_unauthorized = self.transport.on_unauthorized
+            if (response.status_code == 401 and token and path != '/sessions' and on_unauthorized
+                    and await asyncio.to_thread(on_unauthorized, token)):
+                response, _ = await self._send(method, path, params, data, endpoint_class)
+        except httpx.TransportError as e:
+            # Timeouts and connection errors mean the broker is unreachable
+            if breaker:
+                breaker.record_failure(type(e).__name__)
+            metrics.inc('broker_request_errors_total', endpoint_class=endpoint_class,
+                        method=method, error=type(e).__name__)
+            raise
+        except BaseException:
+            # Includes cancellation when the client of the ASGI request goes away
+            if breaker:
+                breaker.release()
+            raise
+        finally:
+            metrics.observe('broker_request_duration_ms', (time.perf_counter() - started) * 1000,
+                            endpoint_class=endpoint_class, method=method)
+
+        if breaker:
+            # 5xx answers count against the broker; anything else shows it is up
+            if response.status_code >= 500:
+                breaker.record_failure(f"HTTP {response.status_code}")
+            else:
+                breaker.record_success()
+
+        if not 200 <= response.status_code < 400:
+            metrics.inc('broker_request_errors_total', endpoint_class=endpoint_class,
+                        method=method, error=f"http_{response.status_code}")
+            if response.status_code == 429 and self.transport.rate_limiter:
+                # Make every worker back off, not just this request
+                await asyncio.to_thread(self.transport.rate_limiter.penalize, endpoint_class,
+                                        self.transport._retry_after(response))
+            raise BrokerApiError(response.status_code, self._error_message(response))
+        if not response.content:
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            return None
+
+    async def get(self, path, params=None, priority=None):
+        """Send a GET request."""
+        return await self.request('GET', path, params=params, priority=priority)
+
+    async def aclose(self):
+        """Close the connection pool."""
+        await self.client.aclose()
+
+    @staticmethod
+    def _error_message(response):
+        """Extract the broker's error message from a failed response."""
+        try:
+            error = response.json().get('error', {})
+            return error.get('message') or error.get('code') or response.reason_phrase
+        except (ValueError, AttributeError):
+            return response.reason_phrase
@@ -0,0 +1,179 @@
+# /benchmarks/loadtest.py
+"""
+Concurrency load test for the dashboard server.
+
+Opens many Server-Sent Events streams (like dashboard tabs left open) while
+other clients poll an endpoint, then reports how many streams the server
+could hold and how poll latency held up. Run it against both serving modes:
+
+    gunicorn app:app --worker-class gthread --threads 16 --bind 127.0.0.1:8080
+    uvicorn asgi:app --port 8080
+
+    python benchmarks/loadtest.py --url http://127.0.0.1:8080 --streams 300 --pollers 20
+
+Use the fake broker (python fake_broker.py) as API_BASE_URL so no real
+account is involved.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+def percentile(values, quantile):
+    """Get the value at a quantile (0-1) of a list, or None if it is empty."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(quantile * len(values)))]
+
+def format_ms(value):
+    """Format seconds as aligned milliseconds."""
+    return f"{value * 1000:8.1f} ms" if value is not None else "       n/a"
+
+async def read_response(reader):
+    """Read one complete (Content-Length or chunked) response; returns the status code."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    else:
+        await reader.readexactly(int(headers.get('content-length', 0)))
+    return status
+
+class LoadTest:
+    """Stream holders and pollers sharing one event loop and one set of results."""
+
+    def __init__(self, url, duration, timeout):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.duration = duration
+        self.timeout = timeout
+        self.stream_connect_times = []  # seconds until the first snapshot event
+        self.stream_failures = 0
+        self.stream_events = 0
+        self.poll_latencies = []
+        self.poll_failures = 0
+        self.poll_status = {}
+
+    async def _request(self, path):
+        """Open a keep-alive connection and send a GET request."""
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        writer.write((f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\nAccept-Encoding: gzip\r\n"
+                      f"Connection: keep-alive\r\n\r\n").encode('latin-1'))
+        await writer.drain()
+        return reader, writer
+
+    async def hold_stream(self, deadline):
+        """Open one SSE stream and count its events until the deadline."""
+        started = time.perf_counter()
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(self._request('/api/stream'), self.timeout)
+            connected = False
+            while True:
+                # The first event must arrive within the timeout; after that, read until the deadline
+                limit = deadline if connected else min(deadline, started + self.timeout)
+                remaining = limit - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    line = await asyncio.wait_for(reader.readline(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if not line:
+                    break
+                if line.startswith(b'event:'):
+                    self.stream_events += 1
+                    if not connected:
+                        connected = True
+                        self.stream_connect_times.append(time.perf_counter() - started)
+            if not connected:
+                self.stream_failures += 1
+        except (asyncio.TimeoutError, OSError, ConnectionError):
+            self.stream_failures += 1
+        finally:
+            if writer is not None:
+                writer.close()
+
+    async def poll(self, path, interval, deadline):
+        """Poll one path over a keep-alive connection until the deadline."""
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(self._request(path), self.timeout)
+                else:
+                    writer.write((f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                                  f"Accept-Encoding: gzip\r\n\r\n").encode('latin-1'))
+                    await writer.drain()
+                status = await asyncio.wait_for(read_response(reader), self.timeout)
+                self.poll_latencies.append(time.perf_counter() - started)
+                self.poll_status[status] = self.poll_status.get(status, 0) + 1
+            except (asyncio.TimeoutError, OSError, ConnectionError, ValueError):
+                self.poll_failures += 1
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+            await asyncio.sleep(max(0.0, interval - (time.perf_counter() - started)))
+        if writer is not None:
+            writer.close()
+
+    async def run(self, streams, pollers, poll_path, poll_interval, ramp):
+        """Start the stream holders (spread over ramp seconds) and the pollers; wait for the deadline."""
+        deadline = time.perf_counter() + self.duration
+        tasks = [asyncio.ensure_future(self.poll(poll_path, poll_interval, deadline)) for _ in range(pollers)]
+        for _ in range(streams):
+            tasks.append(asyncio.ensure_future(self.hold_stream(deadline)))
+            if ramp:
+                await asyncio.sleep(ramp / streams)
+        await asyncio.gather(*tasks)
+
+    def report(self, streams, pollers):
+        """Print a summary of the run."""
+        elapsed = self.duration
+        print(f"Streams:   {len(self.stream_connect_times)}/{streams} connected, "
+              f"{self.stream_failures} failed, {self.stream_events} events received")
+        print(f"  time to first event  p50 {format_ms(percentile(self.stream_connect_times, 0.5))}"
+              f"   p99 {format_ms(percentile(self.stream_connect_times, 0.99))}")
+        print(f"Polls:     {len(self.poll_latencies)} ok ({len(self.poll_latencies) / elapsed:.1f}/s) from "
+              f"{pollers} clients, {self.poll_failures} failed, status {self.poll_status}")
+        if self.poll_latencies:
+            print(f"  latency  p50 {format_ms(percentile(self.poll_latencies, 0.5))}"
+                  f"   p95 {format_ms(percentile(self.poll_latencies, 0.95))}"
+                  f"   p99 {format_ms(percentile(self.poll_latencies, 0.99))}"
+                  f"   mean {format_ms(statistics.mean(self.poll_latencies))}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8080', help='server to test')
+    parser.add_argument('--streams', type=int, default=200, help='SSE streams to hold open')
+    parser.add_argument('--pollers', type=int, default=20, help='clients polling --poll-path')
+    parser.add_argument('--poll-path', default='/api/data', help='path the pollers request')
+    parser.add_argument('--poll-interval', type=float, default=0.1, help='seconds between polls per client')
+    parser.add_argument('--duration', type=float, default=15, help='seconds to run')
+    parser.add_argument('--ramp', type=float, default=2, help='seconds over which streams are opened')
+    parser.add_argument('--timeout', type=float, default=5, help='seconds to wait for a response or first event')
+    args = parser.parse_args()
+
+    test = LoadTest(args.url, args.duration, args.timeout)
+    asyncio.run(test.run(args.streams, args.pollers, args.poll_path, args.poll_interval, args.ramp))
+    test.report(args.streams, args.pollers)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+# /benchmarks/microbench.py
+"""
+Micro-benchmarks for the client and formatting hot paths.
+
+Times TastetradeClient.get_mstu_price and get_account_balance against an
+in-process fake broker (with optional --latency), _track_api_call on the
+chosen shared state backend, and the formatters in utils.py. Fast calls are
+timed in batches so timer overhead does not dominate. With --replay the
+client answers from a recording (see replay.py) instead of the fake broker.
+
+    python benchmarks/microbench.py --save baseline.json
+    python benchmarks/microbench.py --compare baseline.json --tolerance 0.25
+
+With --compare the run exits with status 1 if any benchmark's median got
+slower than the baseline by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from loadtest import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_broker import FakeBrokerServer
+
+# Smallest batch duration (seconds) used to time fast calls
+MIN_BATCH_TIME = 0.001
+
+def measure(fn, duration):
+    """
+    Time fn for about duration seconds.
+
+    Returns:
+        tuple: (total calls, list of seconds per call for each batch)
+    """
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - started >= MIN_BATCH_TIME:
+            break
+        number *= 2
+
+    samples = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline or len(samples) < 5:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number)
+    return number * len(samples), samples
+
+def load_client(broker_url, state_backend, account_number='5WTBENCH', replay_file=None, replay_speed=0):
+    """Import the client configured for the fake broker (or a recording), working from a scratch directory."""
+    os.environ.update({
+        'API_BASE_URL': broker_url,
+        'TASTYTRADE_LOGIN': 'bench',
+        'TASTYTRADE_PASSWORD': 'bench',
+        'ACCOUNT_NUMBER': account_number,
+        'SHARED_STATE_BACKEND': state_backend,
+        'RATE_LIMIT_ENABLED': 'False'  # Measure the client, not the client-side throttle
+    })
+    if replay_file:
+        os.environ.update({'REPLAY_FILE': os.path.abspath(replay_file), 'REPLAY_SPEED': str(replay_speed)})
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    # Session, state, metrics and log files are written relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix='microbench-'))
+
+    import utils
+    from tastytrade_client import client
+    if not client.authenticate():
+        raise SystemExit(f"Could not authenticate against {broker_url}")
+    return client, utils
+
+def build_benchmarks(client, utils):
+    """Get the (name, callable) pairs to time."""
+    quote = client.get_mstu_price()
+    balance = client.get_account_balance()
+    timestamp = quote['timestamp']
+    return [
+        ('client.get_mstu_price', client.get_mstu_price),
+        ('client.get_account_balance', client.get_account_balance),
+        ('client._track_api_call', lambda: client._track_api_call('Benchmark', 'SUCCESS', latency_ms=1.0)),
+        ('utils.format_currency', lambda: utils.format_currency(1234567.891)),
+        ('utils.format_percentage', lambda: utils.format_percentage(-1.23456)),
+        ('utils.format_datetime (cached)', lambda: utils.format_datetime(timestamp)),
+        ('utils.format_datetime (uncached)', lambda: utils.format_datetime.__wrapped__(timestamp)),
+        ('utils.parse_timestamp', lambda: utils.parse_timestamp(timestamp)),
+        ('utils.format_account_data', lambda: utils.format_account_data(balance)),
+        ('utils.format_quote_data', lambda: utils.format_quote_data(quote))
+    ]
+
+def format_us(seconds):
+    """Format seconds as aligned microseconds."""
+    return f"{seconds * 1e6:11.2f} us"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=1.0, help='seconds to time each benchmark')
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds the fake broker adds to each response')
+    parser.add_argument('--state', choices=('memory', 'file', 'redis'), default='file',
+                        help='shared state backend (redis uses REDIS_URL)')
+    parser.add_argument('--replay', help='answer from this recording instead of the fake broker')
+    parser.add_argument('--replay-speed', type=float, default=0,
+                        help='replay clock speed with --replay (0 = recorded responses in order, no delay)')
+    parser.add_argument('--account', default='5WTBENCH', help='account number (the recorded one with --replay)')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='compare against results saved with --save')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown of the median (0.25 = 25%%) with --compare')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    save_path = os.path.abspath(args.save) if args.save else None
+
+    broker = FakeBrokerServer(fill_delay=0, latency=args.latency).start()
+    client, utils = load_client(broker.url, args.state, args.account, args.replay, args.replay_speed)
+
+    results = {}
+    regressions = []
+    print(f"{'benchmark':34} {'calls':>9} {'median':>14} {'p99':>14} {'mean':>14}")
+    for name, fn in build_benchmarks(client, utils):
+        if args.filter not in name:
+            continue
+        calls, samples = measure(fn, args.duration)
+        median = statistics.median(samples)
+        results[name] = {
+            'calls': calls,
+            'median_us': median * 1e6,
+            'p99_us': percentile(samples, 0.99) * 1e6,
+            'mean_us': statistics.mean(samples) * 1e6
+        }
+        line = (f"{name:34} {calls:9d} {format_us(median)} {format_us(percentile(samples, 0.99))} "
+                f"{format_us(statistics.mean(samples))}")
+        if name in baseline:
+            change = median * 1e6 / baseline[name]['median_us'] - 1
+            line += f"  {change:+7.1%}"
+            if change > args.tolerance:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+
+    if save_path:
+        with open(save_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {save_path}")
+    broker.shutdown()
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+# /benchmarks/rps.py
+"""
+Fixed-rate load test for the dashboard data and order endpoints.
+
+Sends GET /api/data and POST /api/buy-mstu requests on a fixed schedule
+(--rps, with --buy-ratio of them orders) and reports the throughput and
+latency percentiles of each. The schedule does not wait for responses, and
+latency is measured from when a request was due, so a server that falls
+behind shows up in the percentiles instead of quietly lowering the rate.
+
+    python fake_broker.py --port 8900 --latency 0.05
+    API_BASE_URL=http://127.0.0.1:8900 TASTYTRADE_LOGIN=demo TASTYTRADE_PASSWORD=demo \\
+        ACCOUNT_NUMBER=5WT00001 gunicorn app:app --worker-class gthread --threads 16 --bind 127.0.0.1:8080
+
+    python benchmarks/rps.py --url http://127.0.0.1:8080 --rps 100 --buy-ratio 0.05
+
+With --max-p99 or --max-error-rate the run exits with status 1 when a limit
+is exceeded, so it can gate a CI job.
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import statistics
+import sys
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+
+from loadtest import format_ms, percentile, read_response
+
+# Request kinds: name -> (method, path)
+ENDPOINTS = {
+    'data': ('GET', '/api/data'),
+    'buy': ('POST', '/api/buy-mstu')
+}
+
+class RateLoadTest:
+    """Open-loop request scheduler sharing a pool of keep-alive connections."""
+
+    def __init__(self, url, timeout, max_in_flight):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.idle = []  # keep-alive connections not in use
+        self.in_flight = 0
+        self.elapsed = 0.0
+        self.results = {
+            name: {'sent': 0, 'latencies': [], 'status': {}, 'failures': 0, 'dropped': 0}
+            for name in ENDPOINTS
+        }
+
+    def _build(self, name):
+        """Build the raw HTTP request for a request kind."""
+        method, path = ENDPOINTS[name]
+        if method == 'GET':
+            return f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\nAccept-Encoding: gzip\r\n\r\n".encode('latin-1')
+        # One market order for a single share; a fresh idempotency key makes every request a new order
+        body = urlencode({'quantity': 1, 'order_type': 'Market', 'idempotency_key': uuid.uuid4().hex})
+        return (f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/x-www-form-urlencoded\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n{body}").encode('latin-1')
+
+    async def _send(self, name, due):
+        """Send one request over an idle (or new) connection and record the outcome."""
+        result = self.results[name]
+        self.in_flight += 1
+        try:
+            for attempt in range(2):
+                reused = bool(self.idle) and not attempt
+                connection = None
+                try:
+                    if reused:
+                        connection = self.idle.pop()
+                    else:
+                        connection = await asyncio.wait_for(
+                            asyncio.open_connection(self.host, self.port), self.timeout)
+                    reader, writer = connection
+                    writer.write(self._build(name))
+                    await writer.drain()
+                    status = await asyncio.wait_for(read_response(reader), self.timeout)
+                except (asyncio.TimeoutError, OSError, ConnectionError, ValueError) as e:
+                    if connection is not None:
+                        connection[1].close()
+                    # The server may have closed an idle keep-alive connection; retry once on a new one
+                    if reused and not isinstance(e, asyncio.TimeoutError):
+                        continue
+                    result['failures'] += 1
+                    return
+                result['latencies'].append(time.perf_counter() - due)
+                result['status'][status] = result['status'].get(status, 0) + 1
+                self.idle.append(connection)
+                return
+        finally:
+            self.in_flight -= 1
+
+    async def run(self, rps, buy_ratio, duration, seed=0):
+        """Send requests at rps for duration seconds, then wait for the outstanding ones."""
+        pick = random.Random(seed)
+        tasks = []
+        started = time.perf_counter()
+        for i in itertools.count():
+            due = started + i / rps
+            if due >= started + duration:
+                break
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            name = 'buy' if pick.random() < buy_ratio else 'data'
+            self.results[name]['sent'] += 1
+            if self.in_flight >= self.max_in_flight:
+                self.results[name]['dropped'] += 1
+                continue
+            tasks.append(asyncio.ensure_future(self._send(name, due)))
+        await asyncio.gather(*tasks)
+        self.elapsed = time.perf_counter() - started
+        for _, writer in self.idle:
+            writer.close()
+
+    def summary(self):
+        """
+        Get the overall p99 latency and error rate.
+
+        Returns:
+            tuple: (p99 seconds or None, fraction of requests that failed, were dropped or got a 5xx)
+        """
+        latencies = [l for result in self.results.values() for l in result['latencies']]
+        sent = sum(result['sent'] for result in self.results.values())
+        errors = sum(result['failures'] + result['dropped'] +
+                     sum(count for status, count in result['status'].items() if status >= 500)
+                     for result in self.results.values())
+        return percentile(latencies, 0.99), (errors / sent if sent else 0.0)
+
+    def report(self):
+        """Print throughput and latency per request kind."""
+        for name, result in self.results.items():
+            if not result['sent']:
+                continue
+            latencies = result['latencies']
+            method, path = ENDPOINTS[name]
+            print(f"{method} {path}: {result['sent']} sent, {len(latencies)} answered "
+                  f"({len(latencies) / self.elapsed:.1f}/s), {result['failures']} failed, "
+                  f"{result['dropped']} dropped, status {result['status']}")
+            if latencies:
+                print(f"  latency  p50 {format_ms(percentile(latencies, 0.5))}"
+                      f"   p90 {format_ms(percentile(latencies, 0.9))}"
+                      f"   p99 {format_ms(percentile(latencies, 0.99))}"
+                      f"   max {format_ms(max(latencies))}"
+                      f"   mean {format_ms(statistics.mean(latencies))}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8080', help='server to test')
+    parser.add_argument('--rps', type=float, default=50, help='requests per second to send')
+    parser.add_argument('--buy-ratio', type=float, default=0.0, help='fraction (0-1) of requests that are orders')
+    parser.add_argument('--duration', type=float, default=15, help='seconds to send requests for')
+    parser.add_argument('--timeout', type=float, default=10, help='seconds to wait for a response')
+    parser.add_argument('--max-in-flight', type=int, default=1000,
+                        help='outstanding requests beyond which new ones are dropped')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the request mix')
+    parser.add_argument('--max-p99', type=float, default=None, help='fail if the p99 latency exceeds this (ms)')
+    parser.add_argument('--max-error-rate', type=float, default=None,
+                        help='fail if this fraction (0-1) of requests fail')
+    args = parser.parse_args()
+
+    test = RateLoadTest(args.url, args.timeout, args.max_in_flight)
+    asyncio.run(test.run(args.rps, args.buy_ratio, args.duration, args.seed))
+    test.report()
+
+    p99, error_rate = test.summary()
+    failed = []
+    if args.max_p99 is not None and (p99 is None or p99 * 1000 > args.max_p99):
+        failed.append(f"p99 {format_ms(p99).strip()} exceeds {args.max_p99} ms")
+    if args.max_error_rate is not None and error_rate > args.max_error_rate:
+        failed.append(f"error rate {error_rate:.2%} exceeds {args.max_error_rate:.2%}")
+    for message in failed:
+        print(f"FAIL: {message}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+# /cache.py
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+class _Flight:
+    """A fetch that is currently in progress for a cache key."""
+
+    def __init__(self, allow_stale=True):
+        self.event = threading.Event()
+        self.value = None
+        self.allow_stale = allow_stale  # Whether a failed fetch may fall back to the stale entry
+        self.callbacks = []  # Called with the value when the fetch finishes (asyncio waiters)
+
+class BoundedDict(OrderedDict):
+    """Dict keeping at most max_len keys; storing beyond that drops the least recently stored key."""
+
+    def __init__(self, max_len, *args, **kwargs):
+        self.max_len = max_len
+        self._lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+            self.move_to_end(key)
+            while len(self) > self.max_len:
+                self.popitem(last=False)
+
+def _resolve(future, value):
+    """Complete an asyncio waiter unless it was cancelled meanwhile."""
+    if not future.done():
+        future.set_result(value)
+
+class TTLCache:
+    """
+    Thread-safe cache with per-key TTLs, single-flight fetches and
+    stale-while-revalidate serving.
+
+    A fresh entry is returned directly. An entry that has expired but is still
+    inside its stale window is returned immediately while a single background
+    refresh is started. A miss blocks, but concurrent callers for the same key
+    wait on one shared fetch instead of each calling the broker.
+
+    Fetch functions signal failure by returning None; failed results are never
+    cached, so the previous value (if any) keeps being served until it falls
+    out of the stale window.
+
+    With a shared state backend, fetched values are also published there and
+    a miss first looks for a value another worker fetched while it is still
+    fresh, so N workers do not each call the broker for the same data.
+
+    Storing an entry drops the entries that are past their stale window and,
+    beyond max_entries, the least recently used ones.
+    """
+
+    def __init__(self, stale_ttl=0, shared=None, max_entries=1024):
+        """
+        Args:
+            stale_ttl: Seconds an expired entry may still be served while it is refreshed
+            shared: Optional shared state backend (see shared_state.py) holding values for every worker
+            max_entries: Most keys kept
+        """
+        self.stale_ttl = stale_ttl
+        self.shared = shared
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, fresh_until, stale_until), least recently used first
+        self._flights = {}  # key -> _Flight
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "fetch_failures": 0,
+            "shared_hits": 0,
+            "evictions": 0
+        }
+
+    def _claim(self, key, allow_stale=True):
+        """
+        Decide how to serve a lookup of key; call with the lock held.
+
+        Returns:
+            tuple: (value, flight, action) where action is 'hit' (return value),
+                   'refresh' (return the stale value and run flight in the background),
+                   'fetch' (run flight and return its result) or 'wait' (wait for
+                   another caller's flight)
+        """
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fresh_until, stale_until = entry
+            self._entries.move_to_end(key)
+            if now < fresh_until:
+                self._stats["hits"] += 1
+                return value, None, 'hit'
+            if allow_stale and now < stale_until:
+                # Serve the stale value and revalidate in the background
+                self._stats["stale_hits"] += 1
+                if key in self._flights:
+                    return value, None, 'hit'
+                flight = self._flights[key] = _Flight()
+                self._stats["refreshes"] += 1
+                return value, flight, 'refresh'
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            self._stats["coalesced"] += 1
+            return None, flight, 'wait'
+        flight = self._flights[key] = _Flight(allow_stale)
+        self._stats["misses"] += 1
+        return None, flight, 'fetch'
+
+    def get_or_fetch(self, key, fetch_fn, ttl, allow_stale=True):
+        """
+        Return the cached value for key, fetching it with fetch_fn if needed.
+
+        Args:
+            key: Cache key
+            fetch_fn: Zero-argument callable returning the value, or None on failure
+            ttl: Seconds a fetched value is considered fresh
+            allow_stale: Serve an expired entry inside its stale window while it is
+                         refreshed; otherwise wait for the fresh value
+
+        Returns:
+            The cached or freshly fetched value, or None if the fetch failed
+            and there is nothing servable in the cache
+        """
+        with self._lock:
+            value, flight, action = self._claim(key, allow_stale)
+
+        if action == 'refresh':
+            threading.Thread(
+                target=self._run_fetch,
+                args=(key, fetch_fn, ttl, flight),
+                name=f"cache-refresh-{key}",
+                daemon=True
+            ).start()
+        if action in ('hit', 'refresh'):
+            return value
+        if action == 'fetch':
+            return self._run_fetch(key, fetch_fn, ttl, flight)
+
+        flight.event.wait()
+        return flight.value
+
+    async def aget_or_fetch(self, key, fetch_coro, ttl):
+        """
+        Asyncio variant of get_or_fetch.
+
+        Args:
+            key: Cache key
+            fetch_coro: Zero-argument coroutine function returning the value, or None on failure
+            ttl: Seconds a fetched value is considered fresh
+
+        Fetches run on the event loop, and waiting for a fetch started by
+        another caller (thread or task) does not block the loop.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            value, flight, action = self._claim(key)
+            if action == 'wait':
+                waiter = loop.create_future()
+                flight.callbacks.append(lambda result: loop.call_soon_threadsafe(_resolve, waiter, result))
+
+        if action == 'refresh':
+            loop.create_task(self._arun_fetch(key, fetch_coro, ttl, flight))
+        if action in ('hit', 'refresh'):
+            return value
+        if action == 'fetch':
+            return await self._arun_fetch(key, fetch_coro, ttl, flight)
+        return await waiter
+
+    def _run_fetch(self, key, fetch_fn, ttl, flight):
+        """Run fetch_fn for key (unless another worker has a fresh value), store the result and release waiters."""
+        value, remaining = self._get_shared(key)
+        if value is not None:
+            return self._finish_fetch(key, value, remaining, flight)
+        try:
+            value = fetch_fn()
+        except Exception as e:
+            logger.error(f"Cache fetch for {key} failed: {str(e)}")
+        self._put_shared(key, value, ttl)
+        return self._finish_fetch(key, value, ttl, flight)
+
+    async def _arun_fetch(self, key, fetch_coro, ttl, flight):
+        """Await fetch_coro for key (unless another worker has a fresh value), store the result and release waiters."""
+        if self.shared is not None:
+            # Shared backends do blocking file or socket I/O
+            value, remaining = await asyncio.to_thread(self._get_shared, key)
+            if value is not None:
+                return self._finish_fetch(key, value, remaining, flight)
+        value = None
+        try:
+            value = await fetch_coro()
+        except Exception as e:
+            logger.error(f"Cache fetch for {key} failed: {str(e)}")
+        if self.shared is not None:
+            await asyncio.to_thread(self._put_shared, key, value, ttl)
+        return self._finish_fetch(key, value, ttl, flight)
+
+    def _get_shared(self, key):
+        """
+        Get a value another worker stored for key while it is still fresh.
+
+        Returns:
+            tuple: (value, seconds it stays fresh), or (None, None)
+        """
+        if self.shared is None:
+            return None, None
+        try:
+            entry = self.shared.get(f"cache:{key}")
+        except Exception as e:
+            logger.warning(f"Shared cache lookup for {key} failed: {str(e)}")
+            return None, None
+        remaining = entry['fresh_until'] - time.time() if entry else 0
+        if remaining <= 0:
+            return None, None
+        with self._lock:
+            self._stats["shared_hits"] += 1
+        return entry['value'], remaining
+
+    def _put_shared(self, key, value, ttl):
+        """Publish a freshly fetched value for the other workers."""
+        if self.shared is None or value is None:
+            return
+        try:
+            self.shared.set(f"cache:{key}", {'value': value, 'fresh_until': time.time() + ttl}, ttl=ttl)
+        except Exception as e:
+            logger.warning(f"Shared cache store for {key} failed: {str(e)}")
+
+    def _finish_fetch(self, key, value, ttl, flight):
+        """Store a fetch result (or fall back to a servable entry) and release waiters."""
+        with self._lock:
+            if value is not None:
+                now = time.monotonic()
+                self._entries[key] = (value, now + ttl, now + ttl + self.stale_ttl)
+                self._entries.move_to_end(key)
+                self._evict(now)
+            else:
+                self._stats["fetch_failures"] += 1
+                # Fall back to whatever is still servable, unless the caller asked for fresh data only
+                entry = self._entries.get(key)
+                if flight.allow_stale and entry is not None and time.monotonic() < entry[2]:
+                    value = entry[0]
+            self._flights.pop(key, None)
+
+        flight.value = value
+        flight.event.set()
+        for callback in flight.callbacks:
+            try:
+                callback(value)
+            except RuntimeError:
+                pass  # The waiter's event loop has closed
+        return value
+
+    def _evict(self, now):
+        """Drop entries past their stale window, then the least recently used beyond max_entries; call with the lock held."""
+        expired = [key for key, entry in self._entries.items() if entry[2] <= now]
+        for key in expired:
+            del self._entries[key]
+        evicted = len(expired)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            evicted += 1
+        self._stats["evictions"] += evicted
+
+    def invalidate(self, key=None):
+        """Drop one key, or every key if none is given (shared values expire on their own)."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+        if self.shared is not None and key is not None:
+            try:
+                self.shared.delete(f"cache:{key}")
+            except Exception as e:
+                logger.warning(f"Shared cache invalidation for {key} failed: {str(e)}")
+
+    def get_stats(self):
+        """Get a copy of the hit/miss counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
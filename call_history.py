@@ -0,0 +1,166 @@
+# /call_history.py
+import os
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import pytz
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+EASTERN = pytz.timezone('US/Eastern')
+
+# Shared state key of the history published by all workers
+HISTORY_KEY = 'api_calls'
+
+class ApiCallHistory:
+    """
+    Fixed-capacity history of recent API calls.
+
+    Recording is an O(1) append to this worker's ring buffer under a lock,
+    with no I/O, and reads are served from memory. With a shared state
+    backend a background thread publishes the worker's new records in one
+    batch every publish_interval seconds into a shared ring of the same
+    capacity, and picks up the other workers' records from it, so the
+    dashboard shows every worker's calls within about one interval.
+
+    Sequence numbers are microsecond timestamps, strictly increasing within
+    a worker, so they order records across workers and clients can ask for
+    only the entries they have not seen yet. Another worker's record can
+    arrive after a newer local one, in which case only full reads include it;
+    version changes with every change of the merged records, so cached full
+    responses can be keyed on it.
+    """
+
+    def __init__(self, capacity, state=None, publish_interval=1.0):
+        """
+        Args:
+            capacity: Maximum number of records kept
+            state: Shared state backend to publish to (None keeps the history per process)
+            publish_interval: Seconds between publishes to the shared state
+        """
+        self._capacity = capacity
+        self._state = state
+        self._publish_interval = publish_interval
+        self._lock = threading.Lock()
+        self._records = deque(maxlen=capacity)  # This worker's records, oldest first
+        self._peers = []  # Other workers' records from the last publish, oldest first
+        self._pending = []  # Records not published yet
+        self._seq = 0
+        self._last_seq = 0  # Newest sequence number seen, local or published
+        self._view = None  # Merged records, newest first; rebuilt after changes
+        self._version = 0  # Incremented whenever the merged records change
+        self._publisher_pid = None
+        self._worker_id = None
+
+    @property
+    def capacity(self):
+        """Maximum number of records kept."""
+        return self._capacity
+
+    def _worker(self):
+        """Identify this process among the workers sharing the state."""
+        pid = os.getpid()
+        if self._worker_id is None or self._worker_id[0] != pid:
+            self._worker_id = (pid, f"{socket.gethostname()}:{pid}")
+        return self._worker_id[1]
+
+    def _start_publisher(self):
+        """Start the publishing thread once per process (a forked worker starts its own)."""
+        pid = os.getpid()
+        if self._publisher_pid == pid:
+            return
+        self._publisher_pid = pid
+        threading.Thread(target=self._publish_loop, name='api-call-publisher', daemon=True).start()
+
+    def record(self, endpoint, status, latency_ms=None):
+        """Append one API call record and return it."""
+        with self._lock:
+            self._seq = max(self._seq + 1, time.time_ns() // 1000)
+            entry = {
+                "seq": self._seq,
+                "endpoint": endpoint,
+                "status": status,
+                "timestamp": datetime.now(EASTERN).strftime("%Y-%m-%d %H:%M:%S %Z"),
+                "monotonic": time.monotonic(),
+                "latency_ms": round(latency_ms, 3) if latency_ms is not None else None
+            }
+            if self._state is not None:
+                entry["worker"] = self._worker()
+            self._records.append(entry)
+            self._last_seq = max(self._last_seq, self._seq)
+            self._view = None
+            self._version += 1
+            if self._state is not None:
+                self._pending.append(entry)
+                self._start_publisher()
+        return entry
+
+    def _publish_loop(self):
+        while True:
+            time.sleep(self._publish_interval)
+            self.publish()
+
+    def publish(self):
+        """Merge this worker's pending records into the shared ring and pick up the other workers' records."""
+        if self._state is None:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, []
+        worker = self._worker()
+        try:
+            if pending:
+                with self._state.lock(HISTORY_KEY):
+                    shared = (self._state.get(HISTORY_KEY) or []) + pending
+                    shared.sort(key=lambda r: r["seq"])
+                    shared = shared[-self._capacity:]
+                    self._state.set(HISTORY_KEY, shared)
+            else:
+                shared = self._state.get(HISTORY_KEY) or []
+        except Exception as e:
+            logger.error(f"Could not publish the API call history: {str(e)}")
+            with self._lock:
+                # Publish them with the next batch; the oldest go first if the backend stays down
+                self._pending = (pending + self._pending)[-self._capacity:]
+            return
+        peers = [r for r in shared if r.get("worker") != worker]
+        with self._lock:
+            if peers != self._peers:
+                self._peers = peers
+                if peers:
+                    self._last_seq = max(self._last_seq, peers[-1]["seq"])
+                self._view = None
+                self._version += 1
+
+    def get(self, since=None):
+        """
+        Get records newest first.
+
+        Args:
+            since: Only return records with a sequence number greater than this
+        """
+        with self._lock:
+            if self._view is None:
+                merged = list(self._records)
+                if self._peers:
+                    merged = sorted(merged + self._peers, key=lambda r: r["seq"])[-self._capacity:]
+                merged.reverse()
+                self._view = merged
+            records = self._view
+        if since is None:
+            return list(records)
+        return [r for r in records if r["seq"] > since]
+
+    @property
+    def version(self):
+        """Number that changes whenever the records returned by get() change."""
+        return self._version
+
+    @property
+    def last_seq(self):
+        """Sequence number of the newest record (0 if none)."""
+        return self._last_seq
@@ -0,0 +1,122 @@
+# /circuit_breaker.py
+import threading
+import time
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one class of broker requests.
+
+    After failure_threshold failures in a row the breaker opens and requests
+    are refused immediately instead of waiting out timeouts. Once
+    reset_timeout seconds have passed it lets a single probe request through
+    (half-open): success closes it again, failure re-opens it.
+    """
+
+    def __init__(self, name, failure_threshold, reset_timeout, on_transition=None):
+        """
+        Args:
+            name: Name reported in logs and transitions (the endpoint class)
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds to stay open before probing
+            on_transition: Optional callable(name, old_state, new_state, reason)
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_transition = on_transition
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._probe_in_flight = False
+        self.rejections = 0
+
+    @property
+    def state(self):
+        """Current state: 'closed', 'open' or 'half_open'."""
+        return self._state
+
+    def allow(self):
+        """Check whether a request may be sent now (and claim the probe when half-open)."""
+        transition = None
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                transition = self._set_state(HALF_OPEN, f"probing after {self.reset_timeout:g}s")
+            if self._state == CLOSED:
+                allowed = True
+            elif self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                allowed = True
+            else:
+                self.rejections += 1
+                allowed = False
+        self._notify(transition)
+        return allowed
+
+    def release(self):
+        """Give back a claimed probe without a result (the request was never sent)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        """Report a request that reached a healthy broker."""
+        transition = None
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self._state != CLOSED:
+                transition = self._set_state(CLOSED, "probe succeeded")
+        self._notify(transition)
+
+    def record_failure(self, reason=''):
+        """Report a request that failed because the broker was unreachable or erroring."""
+        transition = None
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN:
+                self._opened_at = time.monotonic()
+                transition = self._set_state(OPEN, f"probe failed: {reason}")
+            elif self._state == CLOSED and self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                transition = self._set_state(OPEN, f"{self._failures} consecutive failures, last: {reason}")
+        self._notify(transition)
+
+    def get_stats(self):
+        """Get the breaker's state and counters."""
+        with self._lock:
+            retry_in = 0.0
+            if self._state == OPEN:
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'rejections': self.rejections,
+                'retry_in': round(retry_in, 1)
+            }
+
+    def _set_state(self, state, reason):
+        """Change state; call with the lock held. Returns the transition to report."""
+        transition = (self.name, self._state, state, reason)
+        self._state = state
+        return transition
+
+    def _notify(self, transition):
+        """Report a transition outside the lock."""
+        if transition is None:
+            return
+        name, old_state, new_state, reason = transition
+        logger.warning(f"Circuit breaker {name}: {old_state} -> {new_state} ({reason})")
+        if self.on_transition:
+            try:
+                self.on_transition(*transition)
+            except Exception as e:
+                logger.error(f"Circuit breaker listener failed: {str(e)}")
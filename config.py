@@ -12,7 +12,12 @@ TASTYTRADE_PASSWORD = os.environ.get('TASTYTRADE_PASSWORD')
 # Fix API base URL - remove any trailing slashes that could cause double-slash issues
 API_BASE_URL = os.environ.get('API_BASE_URL', 'api.tastytrade.com').rstrip('/')
 
-ACCOUNT_NUMBER = os.environ.get('ACCOUNT_NUMBER')
+# Accounts shown on the dashboard (comma-separated); ACCOUNT_NUMBER is the one orders go to
+# and defaults to the first of ACCOUNT_NUMBERS
+ACCOUNT_NUMBERS = [a.strip() for a in os.environ.get('ACCOUNT_NUMBERS', '').split(',') if a.strip()]
+ACCOUNT_NUMBER = os.environ.get('ACCOUNT_NUMBER') or (ACCOUNT_NUMBERS[0] if ACCOUNT_NUMBERS else None)
+if ACCOUNT_NUMBER and ACCOUNT_NUMBER not in ACCOUNT_NUMBERS:
+    ACCOUNT_NUMBERS.insert(0, ACCOUNT_NUMBER)
 
 # Flask configuration
 FLASK_SECRET_KEY = os.environ.get('FLASK_SECRET_KEY', os.urandom(24).hex())
@@ -23,11 +28,234 @@ PORT = int(os.environ.get('PORT', 8080))  # Change default from 8000 to 8080
 
 # Logging configuration
 LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+# Log file and its format: 'json' (one JSON object per line) or 'text'; the console always gets text
+LOG_FILE = os.environ.get('LOG_FILE', 'logs/tastytrade.log')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()
+# Rotate the log file at this size (bytes) and/or every LOG_ROTATE_INTERVAL seconds; 0 disables either
+LOG_ROTATE_BYTES = int(os.environ.get('LOG_ROTATE_BYTES', 10 * 1024 * 1024))
+LOG_ROTATE_INTERVAL = float(os.environ.get('LOG_ROTATE_INTERVAL', 24 * 3600))
+LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 7))
+# Records waiting for the background log writer; further records are dropped (and counted)
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+# Keep only 1 in N INFO/DEBUG records per message of noisy loggers, as 'logger=N' pairs
+# (off by default: the dashboard logger also writes the order request audit lines)
+LOG_SAMPLE_RATES = {
+    name.strip(): int(rate)
+    for name, rate in (pair.split('=') for pair in os.environ.get(
+        'LOG_SAMPLE_RATES', ''
+    ).split(',') if pair.strip())
+}
+
+# Number of API calls kept in the history shown on the dashboard
+API_CALLS_HISTORY_SIZE = int(os.environ.get('API_CALLS_HISTORY_SIZE', 50))
+# Seconds between publishes of each worker's API calls to the shared state
+API_CALLS_PUBLISH_INTERVAL = float(os.environ.get('API_CALLS_PUBLISH_INTERVAL', 1.0))
+
+# Session configuration
+# Persist the session token so every worker and restart reuses one login
+SESSION_PERSIST = os.environ.get('SESSION_PERSIST', 'True').lower() in ('true', '1', 't')
+# Session lifetime (seconds) assumed when the API does not report an expiration
+SESSION_TTL = float(os.environ.get('SESSION_TTL', 6 * 3600))
+# Refresh the session this many seconds before it expires
+SESSION_REFRESH_MARGIN = float(os.environ.get('SESSION_REFRESH_MARGIN', 600))
+
+# Shared state configuration
+# Backend holding the session token, quote/balance cache and API call history
+# shared by all gunicorn workers: 'memory' (per process), 'file' or 'redis'
+SHARED_STATE_BACKEND = os.environ.get('SHARED_STATE_BACKEND', 'file')
+# Directory used by the file backend; point it at /dev/shm to keep the state in shared memory
+SHARED_STATE_DIR = os.environ.get('SHARED_STATE_DIR', 'sessions/state')
+# Server used by the redis backend (python fake_redis.py provides a local stand-in)
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0')
+REDIS_KEY_PREFIX = os.environ.get('REDIS_KEY_PREFIX', 'pricecheck:')
+
+# Cache configuration (seconds)
+# Quotes and balances are cached separately so quotes can stay fresher
+QUOTE_CACHE_TTL = float(os.environ.get('QUOTE_CACHE_TTL', 5))
+BALANCE_CACHE_TTL = float(os.environ.get('BALANCE_CACHE_TTL', 30))
+# How long an expired entry may still be served while it is refreshed in the background
+CACHE_STALE_TTL = float(os.environ.get('CACHE_STALE_TTL', 60))
+# Most keys kept by the cache, and most symbols whose last known quote and description are kept
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+
+# Concurrent fetch configuration
+# Per-call timeout (seconds) when fetching balances and quotes in parallel
+FETCH_TIMEOUT = float(os.environ.get('FETCH_TIMEOUT', 10))
+FETCH_MAX_WORKERS = int(os.environ.get('FETCH_MAX_WORKERS', 8))
+
+# Quote configuration
+# Maximum symbols per batched instruments/quotes request
+QUOTE_BATCH_SIZE = int(os.environ.get('QUOTE_BATCH_SIZE', 50))
+# Maximum symbols accepted by /api/quotes in a single request
+MAX_QUOTE_SYMBOLS = int(os.environ.get('MAX_QUOTE_SYMBOLS', 200))
+
+# Background poller configuration
+# When enabled, quotes and balances are polled in a background thread and
+# /api/data answers from the in-memory snapshot
+POLLER_ENABLED = os.environ.get('POLLER_ENABLED', 'True').lower() in ('true', '1', 't')
+# Extra symbols to poll alongside MSTU (comma-separated)
+POLLER_SYMBOLS = [s.strip().upper() for s in os.environ.get('POLLER_SYMBOLS', '').split(',') if s.strip()]
+# Quote polling intervals (seconds) per US/Eastern market session; 0 switches polling off
+POLL_INTERVAL_MARKET = float(os.environ.get('POLL_INTERVAL_MARKET', 5))
+POLL_INTERVAL_EXTENDED = float(os.environ.get('POLL_INTERVAL_EXTENDED', 30))
+POLL_INTERVAL_CLOSED = float(os.environ.get('POLL_INTERVAL_CLOSED', 300))
+# Minimum seconds between balance polls
+POLL_INTERVAL_BALANCE = float(os.environ.get('POLL_INTERVAL_BALANCE', 30))
+
+# Position tracking configuration
+# Positions are fetched once, after fills and then every POSITIONS_REFRESH_INTERVAL seconds (0 = never);
+# in between, P&L is marked to market from each polled quote
+POSITIONS_ENABLED = os.environ.get('POSITIONS_ENABLED', 'True').lower() in ('true', '1', 't')
+POSITIONS_REFRESH_INTERVAL = float(os.environ.get('POSITIONS_REFRESH_INTERVAL', 900))
+
+# Multi-account configuration
+# Accounts whose balances and positions are fetched at the same time; all share one session,
+# so keep this within what RATE_LIMITS allows
+ACCOUNTS_MAX_CONCURRENCY = int(os.environ.get('ACCOUNTS_MAX_CONCURRENCY', 10))
+
+# Alert configuration
+# Rules are evaluated against every polled quote (so alerts need the poller) and are shared
+# by all workers through the shared state backend
+ALERTS_ENABLED = os.environ.get('ALERTS_ENABLED', 'True').lower() in ('true', '1', 't')
+ALERTS_MAX_RULES = int(os.environ.get('ALERTS_MAX_RULES', 10000))
+# Seconds before a rule that fired can fire again
+ALERTS_COOLDOWN = float(os.environ.get('ALERTS_COOLDOWN', 60))
+# Fired alerts kept for /api/alerts
+ALERTS_HISTORY_SIZE = int(os.environ.get('ALERTS_HISTORY_SIZE', 200))
+# POST every alert as JSON to this URL (python webhook_receiver.py provides a local receiver)
+ALERT_WEBHOOK_URL = os.environ.get('ALERT_WEBHOOK_URL', '')
+ALERT_WEBHOOK_TIMEOUT = float(os.environ.get('ALERT_WEBHOOK_TIMEOUT', 5))
+ALERT_WEBHOOK_RETRIES = int(os.environ.get('ALERT_WEBHOOK_RETRIES', 2))
+# Alerts waiting for delivery; further alerts are dropped (and counted) until the webhook catches up
+ALERT_WEBHOOK_QUEUE_SIZE = int(os.environ.get('ALERT_WEBHOOK_QUEUE_SIZE', 1000))
+
+# Server-Sent Events configuration
+# When disabled (or when the poller is off) the dashboard falls back to polling /api/data
+STREAM_ENABLED = os.environ.get('STREAM_ENABLED', 'True').lower() in ('true', '1', 't')
+STREAM_HEARTBEAT_INTERVAL = float(os.environ.get('STREAM_HEARTBEAT_INTERVAL', 15))
+# Reconnect delay suggested to the browser (milliseconds)
+STREAM_RETRY_MS = int(os.environ.get('STREAM_RETRY_MS', 3000))
+# Streams are closed after this many seconds and the browser reconnects
+STREAM_MAX_DURATION = float(os.environ.get('STREAM_MAX_DURATION', 300))
+# Pending events per client before it is resynced with a full snapshot
+STREAM_QUEUE_SIZE = int(os.environ.get('STREAM_QUEUE_SIZE', 100))
+
+# Streaming quote (DXLink) configuration
+# When enabled, quotes are streamed into an in-memory book and REST is only a fallback
+STREAMER_ENABLED = os.environ.get('STREAMER_ENABLED', 'False').lower() in ('true', '1', 't')
+# Override the websocket URL returned by /quote-streamer-tokens (e.g. ws://127.0.0.1:8765 for fake_streamer.py)
+STREAMER_URL = os.environ.get('STREAMER_URL')
+# Seconds between keepalive messages
+STREAMER_KEEPALIVE = float(os.environ.get('STREAMER_KEEPALIVE', 30))
+# Upper bound (seconds) for the reconnect backoff
+STREAMER_RECONNECT_MAX = float(os.environ.get('STREAMER_RECONNECT_MAX', 60))
+# Streamer tokens are valid for 24 hours; refresh a little earlier
+STREAMER_TOKEN_TTL = float(os.environ.get('STREAMER_TOKEN_TTL', 20 * 3600))
+
+# HTTP transport configuration
+# Connection pool size per worker process; should cover gunicorn threads plus FETCH_MAX_WORKERS
+# and ACCOUNTS_MAX_CONCURRENCY
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 24))
+# Retries (with exponential backoff) for idempotent GET requests only
+HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', 3))
+HTTP_RETRY_BACKOFF = float(os.environ.get('HTTP_RETRY_BACKOFF', 0.3))
+# Timeouts in seconds: connect, plus a read timeout per endpoint class
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 3.05))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 10))
+HTTP_QUOTE_TIMEOUT = float(os.environ.get('HTTP_QUOTE_TIMEOUT', 5))
+HTTP_ORDER_TIMEOUT = float(os.environ.get('HTTP_ORDER_TIMEOUT', 15))
+HTTP_SESSION_TIMEOUT = float(os.environ.get('HTTP_SESSION_TIMEOUT', 15))
+
+# Circuit breaker configuration
+# After this many consecutive failures of an endpoint class its requests fail
+# immediately for CIRCUIT_RESET_TIMEOUT seconds, then a single probe is let through
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 5))
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get('CIRCUIT_RESET_TIMEOUT', 30))
+
+# Client-side rate limiting configuration
+# Token buckets shared by every worker process: a broker-wide 'global' bucket plus
+# one per endpoint class, as 'name=rate/burst' pairs (requests per second / bucket size)
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'True').lower() in ('true', '1', 't')
+RATE_LIMIT_FILE = os.environ.get('RATE_LIMIT_FILE', 'sessions/rate_limits.bin')
+RATE_LIMITS = {
+    name.strip(): tuple(float(v) for v in limit.split('/'))
+    for name, limit in (pair.split('=') for pair in os.environ.get(
+        'RATE_LIMITS',
+        'global=10/20,session=1/3,orders=5/10,quotes=6/12,account=3/6,default=5/10'
+    ).split(',') if pair.strip())
+}
+# Longest a request waits for a token before failing with a client-side 429
+RATE_LIMIT_MAX_WAIT = float(os.environ.get('RATE_LIMIT_MAX_WAIT', 5))
+
+# Order pipeline configuration
+# Orders are queued and submitted by background workers; records live in ORDERS_DIR
+# so every gunicorn worker can de-duplicate idempotency keys and report status
+ORDERS_DIR = os.environ.get('ORDERS_DIR', 'orders')
+# Submission threads per worker; batches are fanned out across them
+ORDER_WORKERS = int(os.environ.get('ORDER_WORKERS', 4))
+# Orders sent to the broker per second per worker, and retries of orders refused with HTTP 429
+ORDER_SUBMIT_RATE = float(os.environ.get('ORDER_SUBMIT_RATE', 5))
+ORDER_RATE_LIMIT_RETRIES = int(os.environ.get('ORDER_RATE_LIMIT_RETRIES', 3))
+# Maximum orders accepted by one /api/orders/batch request
+MAX_BATCH_ORDERS = int(os.environ.get('MAX_BATCH_ORDERS', 50))
+# Seconds an order (and its idempotency key) is remembered
+ORDER_RETENTION = float(os.environ.get('ORDER_RETENTION', 24 * 3600))
+# Minimum seconds between broker status lookups for one open order
+ORDER_STATUS_REFRESH = float(os.environ.get('ORDER_STATUS_REFRESH', 2))
+# Orders still submitting after this many seconds were abandoned by a stopped worker and are marked Failed
+ORDER_SUBMIT_TIMEOUT = float(os.environ.get('ORDER_SUBMIT_TIMEOUT', 120))
+
+# History configuration
+# Quotes and balances from every poll are appended to daily files in HISTORY_DIR
+HISTORY_ENABLED = os.environ.get('HISTORY_ENABLED', 'True').lower() in ('true', '1', 't')
+HISTORY_DIR = os.environ.get('HISTORY_DIR', 'history')
+HISTORY_RETENTION_DAYS = int(os.environ.get('HISTORY_RETENTION_DAYS', 30))
+# Maximum bars returned by one /api/history request
+HISTORY_MAX_BARS = int(os.environ.get('HISTORY_MAX_BARS', 5000))
+
+# Analytics configuration
+# Rolling window (seconds) of the live VWAP, volatility and spread statistics
+ANALYTICS_WINDOW = float(os.environ.get('ANALYTICS_WINDOW', 30 * 60))
+# Longest range (seconds) /api/analytics computes from history in one request
+ANALYTICS_MAX_RANGE = float(os.environ.get('ANALYTICS_MAX_RANGE', 7 * 86400))
+
+# ASGI server configuration (uvicorn asgi:app)
+# Threads running the Flask routes that are not served natively on the event loop
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 16))
+
+# Response cache configuration
+# /api/data payloads are serialized once per data change and reused for every poll
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 64))
+# Gzip JSON responses of at least RESPONSE_GZIP_MIN_SIZE bytes for clients that accept it
+RESPONSE_GZIP_ENABLED = os.environ.get('RESPONSE_GZIP_ENABLED', 'True').lower() in ('true', '1', 't')
+RESPONSE_GZIP_MIN_SIZE = int(os.environ.get('RESPONSE_GZIP_MIN_SIZE', 1024))
+RESPONSE_GZIP_LEVEL = int(os.environ.get('RESPONSE_GZIP_LEVEL', 6))
+
+# Metrics configuration
+# Each worker writes its metrics here so /metrics can aggregate across gunicorn workers
+METRICS_DIR = os.environ.get('METRICS_DIR', 'metrics')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
 
 # Development/Demo mode setting
 # When set to True, the app will not attempt to connect to the Tastytrade API
 DEV_MODE = os.environ.get('DEV_MODE', 'False').lower() in ('true', '1', 't')
 
+# Record and replay configuration
+# Write every broker request and response (with its latency) to RECORD_FILE: gzip-compressed
+# JSON lines, with session and streamer tokens redacted and no request bodies (they hold the password)
+RECORD_FILE = os.environ.get('RECORD_FILE', '')
+# Answer broker requests from a recording instead of the network
+REPLAY_FILE = os.environ.get('REPLAY_FILE', '')
+# Replay clock: 1 plays the recording in real time, 10 ten times faster; 0 serves each request's
+# recorded responses in order without any delay (for benchmarks at high tick rates)
+REPLAY_SPEED = float(os.environ.get('REPLAY_SPEED', 1))
+# Start over from the beginning when the replay clock reaches the end of the recording
+REPLAY_LOOP = os.environ.get('REPLAY_LOOP', 'True').lower() in ('true', '1', 't')
+if REPLAY_FILE:
+    # Replayed logins accept any credentials
+    TASTYTRADE_LOGIN = TASTYTRADE_LOGIN or 'replay'
+    TASTYTRADE_PASSWORD = TASTYTRADE_PASSWORD or 'replay'
+
 # Validate required configuration
 def validate_config():
     missing_vars = []
@@ -35,12 +263,14 @@ def validate_config():
     if DEV_MODE:
         print("Running in DEV_MODE - API authentication will be bypassed")
     else:
+        if REPLAY_FILE:
+            print(f"Replaying broker responses from {REPLAY_FILE} at speed {REPLAY_SPEED:g}")
         if not TASTYTRADE_LOGIN:
             missing_vars.append('TASTYTRADE_LOGIN')
         if not TASTYTRADE_PASSWORD:
             missing_vars.append('TASTYTRADE_PASSWORD')
         if not ACCOUNT_NUMBER:
-            missing_vars.append('ACCOUNT_NUMBER')
+            missing_vars.append('ACCOUNT_NUMBER or ACCOUNT_NUMBERS')
     
     if missing_vars:
         raise EnvironmentError(f"Missing required environment variables: {', '.join(missing_vars)}")
@@ -1,8 +1,24 @@
 # /dashboard.py
-from flask import Blueprint, render_template, jsonify, request
+import time
+from datetime import datetime
 
+from flask import Blueprint, Response, render_template, jsonify, request
+
+from accounts import accounts
+from alerts import alerts
+from analytics import analytics
+from history_store import EASTERN, SERIES_NAME_PATTERN, history, parse_resolution
+from order_engine import SYMBOL_PATTERN, validate_order
+from orders import TERMINAL_STATUSES, order_queue
+from poller import poller
+from positions import positions
+from quote_streamer import streamer
+from response_cache import response_cache
+from stream import broadcaster
 from tastytrade_client import client
-from utils import format_currency, format_percentage, format_datetime
+import config
+from utils import (format_currency, format_percentage, format_account_data, format_quote_data,
+                   format_positions_data, parse_timestamp)
 from logger import get_logger
 
 logger = get_logger(__name__)
@@ -16,13 +32,20 @@ def index():
     logger.info("Loading dashboard")
     
     # Return the dashboard template
-    return render_template('dashboard.html')
+    return render_template('dashboard.html',
+                           stream_enabled=config.STREAM_ENABLED and config.POLLER_ENABLED,
+                           heartbeat_interval=config.STREAM_HEARTBEAT_INTERVAL,
+                           alerts_enabled=config.ALERTS_ENABLED,
+                           terminal_order_statuses=list(TERMINAL_STATUSES))
 
 @dashboard.route('/api/data')
 def get_data():
     """API endpoint to get the latest data for the dashboard."""
     logger.info("API request for dashboard data")
     
+    # Clients that pass ?since=<seq> only get API calls they have not seen yet
+    since = request.args.get('since', type=int)
+    
     # Check if the client is authenticated
     if not client.authenticated:
         logger.warning("Client not authenticated, returning demo data")
@@ -48,13 +71,27 @@ def get_data():
                 "timestamp": None,
                 "formatted_timestamp": "Demo Mode"
             },
-            "api_calls": client.get_api_calls_history()
+            "api_calls": client.get_api_calls_history(since=since),
+            "api_calls_since": since
         })
     
-    # Get account balance and MSTU price
-    account_balance = client.get_account_balance()
-    mstu_price = client.get_mstu_price()
-    api_calls = client.get_api_calls_history()
+    # Serve from the background poller's snapshot when available; otherwise fetch
+    # account balance and MSTU price in parallel (shared cache, so tabs don't each hit the broker)
+    results = poller.get_snapshot()
+    version = None
+    if results is None:
+        results = client.get_dashboard_data()
+    else:
+        # The payload only changes with a new snapshot, a new API call or a position update
+        version = (results['version'], client.api_calls.version, positions.version)
+    
+    return response_cache.respond(('data', since), version, lambda: _build_data(results, since))
+
+def _build_data(results, since):
+    """Format a poller snapshot (or freshly fetched data) as the /api/data payload."""
+    account_balance = results['account']
+    mstu_price = results['mstu']
+    api_calls = client.get_api_calls_history(since=since)
     
     # Check if we got valid data
     if not account_balance:
@@ -79,30 +116,294 @@ def get_data():
     
     # Format the data for display
     formatted_data = {
-        'account': {
-            'cash_balance': format_currency(account_balance['cash_balance']),
-            'total_equity': format_currency(account_balance['total_equity']),
-            'buying_power': format_currency(account_balance['buying_power']),
-            'raw_cash_balance': account_balance['cash_balance'],
-            'timestamp': account_balance['timestamp'],
-            'formatted_timestamp': format_datetime(account_balance['timestamp']) if account_balance['timestamp'] else 'Unknown'
-        },
-        'mstu': {
-            'symbol': mstu_price['symbol'],
-            'description': mstu_price['description'],
-            'last_price': format_currency(mstu_price['last_price']),
-            'bid_price': format_currency(mstu_price['bid_price']),
-            'ask_price': format_currency(mstu_price['ask_price']),
-            'change': format_currency(mstu_price['change']),
-            'percent_change': format_percentage(mstu_price['percent_change']),
-            'raw_last_price': mstu_price['last_price'],
-            'timestamp': mstu_price['timestamp'],
-            'formatted_timestamp': format_datetime(mstu_price['timestamp']) if mstu_price['timestamp'] else 'Unknown'
-        },
-        'api_calls': api_calls
+        'account': format_account_data(account_balance),
+        'mstu': format_quote_data(mstu_price),
+        'positions': format_positions_data(positions.get()) if config.POSITIONS_ENABLED else None,
+        'api_calls': api_calls,
+        'api_calls_since': since,
+        'cache': client.get_cache_stats(),
+        'transport': client.get_transport_stats(),
+        'circuit_breakers': client.get_circuit_breaker_stats(),
+        'streamer': streamer.get_stats() if config.STREAMER_ENABLED else None
+    }
+    
+    return formatted_data
+
+@dashboard.route('/api/stream')
+def stream():
+    """Server-Sent Events endpoint pushing dashboard changes as they happen."""
+    if not (config.STREAM_ENABLED and config.POLLER_ENABLED):
+        return jsonify({
+            'error': 'Not Found',
+            'message': 'Streaming is disabled. Poll /api/data instead.'
+        }), 404
+    
+    logger.info("API request for dashboard stream")
+    return Response(broadcaster.stream(),
+                    mimetype='text/event-stream',
+                    headers={
+                        'Cache-Control': 'no-cache',
+                        'X-Accel-Buffering': 'no'  # Stop proxies from buffering events
+                    })
+
+@dashboard.route('/api/quotes')
+def get_quotes():
+    """API endpoint to get quotes for a comma-separated list of symbols."""
+    symbols, error = parse_quote_symbols(request.args.get('symbols', ''))
+    if error:
+        return jsonify(error), 400
+    
+    # Check if the client is authenticated
+    if not client.authenticated:
+        return jsonify(quotes_payload(symbols, None))
+    
+    return jsonify(quotes_payload(symbols, client.get_cached_quotes(symbols)))
+
+def parse_quote_symbols(value):
+    """
+    Parse the symbols parameter of /api/quotes (also used by the ASGI server).
+    
+    Returns:
+        tuple: (symbols, error body or None)
+    """
+    symbols = [s.strip().upper() for s in value.split(',') if s.strip()]
+    symbols = list(dict.fromkeys(symbols))
+    logger.info("API request for quotes: %d symbols", len(symbols))
+    
+    if not symbols:
+        return symbols, {
+            'error': 'Bad Request',
+            'message': 'Provide one or more symbols, e.g. /api/quotes?symbols=MSTU,TQQQ'
+        }
+    
+    if len(symbols) > config.MAX_QUOTE_SYMBOLS:
+        return symbols, {
+            'error': 'Bad Request',
+            'message': f'Too many symbols. At most {config.MAX_QUOTE_SYMBOLS} are allowed per request.'
+        }
+    
+    invalid = [s for s in symbols if not SYMBOL_PATTERN.match(s)]
+    if invalid:
+        return symbols, {
+            'error': 'Bad Request',
+            'message': f"Invalid symbols: {', '.join(s[:12] for s in invalid[:10])}"
+        }
+    return symbols, None
+
+def quotes_payload(symbols, quotes):
+    """Build the /api/quotes body; quotes is None when running in demo mode."""
+    if quotes is None:
+        return {
+            'message': 'Running in demo mode. Authentication failed or credentials not provided.',
+            'quotes': {},
+            'missing': symbols
+        }
+    return {
+        'quotes': {symbol: format_quote_data(quote) for symbol, quote in quotes.items()},
+        'missing': [symbol for symbol in symbols if symbol not in quotes]
     }
+
+@dashboard.route('/api/history')
+def get_history():
+    """
+    API endpoint to get recorded quotes as OHLC bars.
+    
+    Query parameters: symbol (default MSTU), from/to (epoch seconds or ISO
+    datetimes; default today in US/Eastern until now) and resolution (bar size
+    such as 30s, 1m, 5m, 1h or 1d; default 1m).
+    """
+    symbol = request.args.get('symbol', 'MSTU').strip().upper()
+    resolution = parse_resolution(request.args.get('resolution', '1m'))
+    now = time.time()
+    start = parse_timestamp(request.args['from']) if 'from' in request.args else None
+    end = parse_timestamp(request.args['to']) if 'to' in request.args else now
+    if start is None and 'from' not in request.args:
+        today = datetime.now(EASTERN).replace(hour=0, minute=0, second=0, microsecond=0)
+        start = today.timestamp()
+    
+    if not SERIES_NAME_PATTERN.match(symbol):
+        return jsonify({'error': 'Bad Request', 'message': f'Invalid symbol {symbol!r}'}), 400
+    if resolution is None:
+        return jsonify({
+            'error': 'Bad Request',
+            'message': 'Invalid resolution. Use a number and a unit, e.g. 30s, 1m, 5m, 1h or 1d.'
+        }), 400
+    if start is None or end is None or start >= end:
+        return jsonify({
+            'error': 'Bad Request',
+            'message': "Invalid range. 'from' and 'to' must be epoch seconds or ISO datetimes with from < to."
+        }), 400
+    if (end - start) / resolution > config.HISTORY_MAX_BARS:
+        return jsonify({
+            'error': 'Bad Request',
+            'message': f'Range too large for this resolution. At most {config.HISTORY_MAX_BARS} bars are allowed.'
+        }), 400
+    
+    bars = history.bars(symbol, start, end, resolution)
+    return jsonify({
+        'symbol': symbol,
+        'from': start,
+        'to': end,
+        'resolution': resolution,
+        'bars': bars
+    })
+
+@dashboard.route('/api/analytics')
+def get_analytics():
+    """
+    API endpoint to get rolling VWAP, realized volatility, spread and change-since-open statistics.
+
+    Query parameters: symbol (default MSTU), window (seconds; default
+    ANALYTICS_WINDOW) and optionally from/to (epoch seconds or ISO datetimes).
+    Without a range the live rolling statistics are returned; with one they
+    are computed from recorded history.
+    """
+    symbol = request.args.get('symbol', 'MSTU').strip().upper()
+    if not SERIES_NAME_PATTERN.match(symbol):
+        return jsonify({'error': 'Bad Request', 'message': f'Invalid symbol {symbol!r}'}), 400
+    try:
+        window = float(request.args['window']) if 'window' in request.args else None
+    except ValueError:
+        window = 0
+    if window is not None and not 0 < window <= config.ANALYTICS_MAX_RANGE:
+        return jsonify({
+            'error': 'Bad Request',
+            'message': f'Invalid window. Use a number of seconds up to {config.ANALYTICS_MAX_RANGE:g}.'
+        }), 400
+
+    if 'from' not in request.args and 'to' not in request.args:
+        stats = analytics.get(symbol) if window in (None, analytics.window) else None
+        if stats is not None:
+            return jsonify({'symbol': symbol, 'source': 'live', **stats})
+        # Not polled (or another window): compute the trailing window from history
+        end = time.time()
+        start = end - (window or analytics.window)
+    else:
+        end = parse_timestamp(request.args['to']) if 'to' in request.args else time.time()
+        start = parse_timestamp(request.args['from']) if 'from' in request.args else None
+        if start is None or end is None or start >= end:
+            return jsonify({
+                'error': 'Bad Request',
+                'message': "Invalid range. 'from' and 'to' must be epoch seconds or ISO datetimes with from < to."
+            }), 400
+        if end - start > config.ANALYTICS_MAX_RANGE:
+            return jsonify({
+                'error': 'Bad Request',
+                'message': f'Range too large. At most {config.ANALYTICS_MAX_RANGE:g} seconds are allowed.'
+            }), 400
+
+    started = time.perf_counter()
+    stats = analytics.compute(symbol, start, end, window)
+    return jsonify({
+        'symbol': symbol,
+        'source': 'history',
+        **stats,
+        'compute_ms': round((time.perf_counter() - started) * 1000, 3)
+    })
+
+@dashboard.route('/api/positions')
+def get_positions():
+    """API endpoint to get open positions with mark-to-market P&L (raw numbers)."""
+    if not config.POSITIONS_ENABLED:
+        return jsonify({
+            'error': 'Not Found',
+            'message': 'Position tracking is disabled.'
+        }), 404
+    
+    # Check if the client is authenticated
+    if not client.authenticated:
+        return jsonify(dict(positions.get(),
+                            message='Running in demo mode. Authentication failed or credentials not provided.'))
+    
+    # The poller loads and marks the book; without it, load it on first use
+    if positions.get()['loaded_at'] is None and not poller.is_running():
+        positions.load()
+    
+    return jsonify(positions.get())
+
+@dashboard.route('/api/accounts')
+def get_accounts():
+    """API endpoint to get every configured account's balance and P&L, with totals (raw numbers)."""
+    # Check if the client is authenticated
+    if not client.authenticated:
+        return jsonify({
+            'accounts': [{'account_number': account} for account in accounts.account_numbers],
+            'message': 'Running in demo mode. Authentication failed or credentials not provided.'
+        })
     
-    return jsonify(formatted_data)
+    started = time.perf_counter()
+    summary = accounts.get_summary(poller_running=poller.is_running())
+    summary['fetch_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    return jsonify(summary)
+
+@dashboard.route('/api/accounts/<account_number>')
+def get_account(account_number):
+    """API endpoint to get one account's balance and positions (raw numbers)."""
+    if not accounts.has_account(account_number):
+        return jsonify({
+            'error': 'Not Found',
+            'message': f'Unknown account {account_number}'
+        }), 404
+    
+    # Check if the client is authenticated
+    if not client.authenticated:
+        return jsonify({
+            'account_number': account_number,
+            'message': 'Running in demo mode. Authentication failed or credentials not provided.'
+        })
+    
+    return jsonify(accounts.get_account(account_number, poller_running=poller.is_running()))
+
+@dashboard.route('/api/alerts', methods=['GET', 'POST'])
+def alert_rules():
+    """
+    API endpoint to list alert rules and recent alerts (GET) or add rules (POST).
+    
+    POST expects one JSON rule like {"symbol": "MSTU", "metric": "price",
+    "direction": "above", "threshold": 12.5} or {"rules": [rule, ...]}. Every
+    rule is validated; invalid rules are reported and skipped.
+    """
+    if not config.ALERTS_ENABLED:
+        return jsonify({
+            'error': 'Not Found',
+            'message': 'Alerts are disabled.'
+        }), 404
+    
+    if request.method == 'GET':
+        limit = request.args.get('limit', default=50, type=int)
+        return jsonify({
+            'rules': alerts.get_rules(),
+            'events': alerts.get_events(limit=max(1, limit)),
+            'webhook': bool(config.ALERT_WEBHOOK_URL)
+        })
+    
+    body = request.get_json(silent=True)
+    specs = body.get('rules', [body]) if isinstance(body, dict) else None
+    if not isinstance(specs, list) or not specs:
+        return jsonify({
+            'error': 'Bad Request',
+            'message': 'Provide a JSON body like {"symbol": "MSTU", "direction": "above", "threshold": 12.5}'
+        }), 400
+    
+    logger.info("API request to add %d alert rules", len(specs))
+    results = alerts.add_rules(specs)
+    added = sum(1 for result in results if result['success'])
+    return jsonify({
+        'success': added > 0,
+        'message': f'{added} of {len(specs)} rules added',
+        'results': results
+    }), 201 if added else 400
+
+@dashboard.route('/api/alerts/<rule_id>', methods=['DELETE'])
+def delete_alert_rule(rule_id):
+    """API endpoint to delete an alert rule."""
+    if not config.ALERTS_ENABLED or not alerts.remove_rule(rule_id):
+        return jsonify({
+            'error': 'Not Found',
+            'message': f'Unknown alert rule {rule_id}'
+        }), 404
+    
+    return jsonify({'success': True})
 
 @dashboard.route('/api/buy-mstu', methods=['POST'])
 def buy_mstu():
@@ -138,14 +439,120 @@ def buy_mstu():
                 'message': 'Invalid price for limit order. Please enter a positive number.'
             })
         
-        # Place the order
-        result = client.buy_mstu(quantity, order_type, price)
+        order, errors = validate_order({
+            'symbol': 'MSTU',
+            'action': 'Buy',
+            'quantity': quantity,
+            'order_type': order_type,
+            'price': price
+        })
+        if errors:
+            return jsonify({
+                'success': False,
+                'message': ' '.join(errors)
+            })
+        
+        # Queue the order; the browser sends one idempotency key per order, so a
+        # retried request returns the original order instead of buying twice
+        idempotency_key = request.form.get('idempotency_key') or request.headers.get('Idempotency-Key')
+        order, created = order_queue.submit(idempotency_key, order)
         
-        # Return the result
-        return jsonify(result)
+        return jsonify({
+            'success': True,
+            'message': 'Order queued' if created else 'Order already submitted',
+            'order': order
+        }), 202 if created else 200
     except Exception as e:
         logger.error(f"Error processing buy MSTU request: {str(e)}")
         return jsonify({
             'success': False,
             'message': f'An error occurred: {str(e)}'
         })
+
+@dashboard.route('/api/orders/batch', methods=['POST'])
+def submit_orders():
+    """
+    API endpoint to queue a batch of orders.
+    
+    Expects JSON {"orders": [order, ...]} where each order is in an
+    order_engine form and may carry its own "idempotency_key". With an
+    Idempotency-Key header instead, order i uses "<key>:<i>". Every order is
+    validated before any is queued; invalid orders are reported and skipped.
+    """
+    # Check if the client is authenticated
+    if not client.authenticated:
+        return jsonify({
+            'success': False,
+            'message': 'Cannot place orders in demo mode. Authentication required.'
+        })
+    
+    body = request.get_json(silent=True)
+    specs = body.get('orders') if isinstance(body, dict) else None
+    if not isinstance(specs, list) or not specs:
+        return jsonify({
+            'error': 'Bad Request',
+            'message': 'Provide a JSON body like {"orders": [{"symbol": "MSTU", "action": "Buy", "quantity": 1}]}'
+        }), 400
+    
+    if len(specs) > config.MAX_BATCH_ORDERS:
+        return jsonify({
+            'error': 'Bad Request',
+            'message': f'Too many orders. At most {config.MAX_BATCH_ORDERS} are allowed per request.'
+        }), 400
+    
+    logger.info("API request to queue %d orders", len(specs))
+    batch_key = request.headers.get('Idempotency-Key')
+    validated = [validate_order(spec) for spec in specs]
+    
+    results = []
+    for index, (spec, (order, errors)) in enumerate(zip(specs, validated)):
+        own_key = spec.get('idempotency_key') if isinstance(spec, dict) else None
+        if own_key is not None and not (isinstance(own_key, str) and own_key.strip()):
+            errors = errors + ['idempotency_key must be a non-empty string']
+        if errors:
+            results.append({'index': index, 'success': False, 'errors': errors})
+            continue
+        idempotency_key = own_key or (f"{batch_key}:{index}" if batch_key else None)
+        record, created = order_queue.submit(idempotency_key, order)
+        results.append({'index': index, 'success': True, 'created': created, 'order': record})
+    
+    queued = sum(1 for result in results if result['success'])
+    return jsonify({
+        'success': queued > 0,
+        'message': f'{queued} of {len(specs)} orders queued',
+        'results': results
+    }), 202 if queued else 400
+
+@dashboard.route('/api/orders')
+def get_orders():
+    """API endpoint to get the status of several orders: /api/orders?ids=<id>,<id>."""
+    order_ids = [i.strip() for i in request.args.get('ids', '').split(',') if i.strip()]
+    if not order_ids:
+        return jsonify({
+            'error': 'Bad Request',
+            'message': 'Provide one or more order ids, e.g. /api/orders?ids=<id>,<id>'
+        }), 400
+    
+    if len(order_ids) > config.MAX_BATCH_ORDERS:
+        return jsonify({
+            'error': 'Bad Request',
+            'message': f'Too many orders. At most {config.MAX_BATCH_ORDERS} are allowed per request.'
+        }), 400
+    
+    orders = order_queue.get_many(order_ids)
+    return jsonify({
+        'orders': {order_id: order for order_id, order in orders.items() if order is not None},
+        'missing': [order_id for order_id, order in orders.items() if order is None]
+    })
+
+@dashboard.route('/api/orders/<order_id>')
+def get_order(order_id):
+    """API endpoint to get the status of a queued order."""
+    order = order_queue.get(order_id)
+    if order is None:
+        return jsonify({
+            'error': 'Not Found',
+            'message': f'Unknown order {order_id}'
+        }), 404
+    
+    return jsonify({'order': order})
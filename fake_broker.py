@@ -0,0 +1,396 @@
+# /fake_broker.py
+"""
+Local stand-in for the Tastytrade REST API.
+
+Implements the endpoints TastetradeClient uses: sessions, balances, positions,
+equity instruments and quotes, quote streamer tokens, and order placement/status.
+Prices follow a random walk; market orders fill after --fill-delay seconds and
+limit orders fill once the market reaches the limit price.
+
+For benchmarks and failure testing every request can be delayed (--latency,
+--jitter), throttled with 429s (--rate-limit, --burst) or failed with 500s
+(--error-rate). GET /_fake/stats reports how many requests were served,
+throttled and failed.
+
+Run a server:   python fake_broker.py --port 8900
+Point the app:  API_BASE_URL=http://127.0.0.1:8900 TASTYTRADE_LOGIN=demo \\
+                TASTYTRADE_PASSWORD=demo ACCOUNT_NUMBER=5WT00001 python app.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DESCRIPTIONS = {
+    'MSTU': 'T-Rex 2X Long MSTR Daily Target ETF',
+    'TQQQ': 'ProShares UltraPro QQQ',
+    'SOXL': 'Direxion Daily Semiconductor Bull 3X Shares'
+}
+
+ORDER_PATH = re.compile(r'^/accounts/([^/]+)/orders(?:/(\d+))?$')
+BALANCES_PATH = re.compile(r'^/accounts/([^/]+)/balances$')
+POSITIONS_PATH = re.compile(r'^/accounts/([^/]+)/positions$')
+
+class FakeBroker:
+    """In-memory broker state shared by all request handler threads."""
+
+    def __init__(self, fill_delay=1.0, starting_cash=100000.0, latency=0.0, jitter=0.0,
+                 error_rate=0.0, rate_limit=0.0, burst=None):
+        """
+        Args:
+            fill_delay: Seconds before orders can fill
+            starting_cash: Cash balance of every new account
+            latency: Seconds added to every response
+            jitter: Up to this many extra seconds added at random
+            error_rate: Fraction (0-1) of requests answered with a 500
+            rate_limit: Requests per second allowed before answering 429 (0 for no limit)
+            burst: Requests allowed at once under the rate limit (defaults to rate_limit)
+        """
+        self.fill_delay = fill_delay
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.burst = max(1.0, burst or rate_limit)
+        self.tokens = self.burst
+        self.refilled = time.monotonic()
+        self.stats = {'requests': 0, 'throttled': 0, 'errors': 0}
+        self.lock = threading.Lock()
+        self.sessions = set()
+        self.cash = {}  # account -> cash balance
+        self.starting_cash = starting_cash
+        self.prices = {}
+        self.orders = {}  # order id -> order
+        self.positions = {}  # account -> symbol -> [signed quantity, total cost]
+        self.next_order_id = 1
+
+    def admit(self):
+        """
+        Apply the configured latency, rate limit and error rate to one request.
+
+        Returns:
+            tuple or None: (status, body, retry_after) to answer instead, or None to handle the request
+        """
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+        with self.lock:
+            self.stats['requests'] += 1
+            if self.rate_limit:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate_limit)
+                self.refilled = now
+                if self.tokens < 1:
+                    self.stats['throttled'] += 1
+                    retry_after = (1 - self.tokens) / self.rate_limit
+                    return 429, _error('rate_limit_exceeded', 'Too many requests'), retry_after
+                self.tokens -= 1
+            if self.error_rate and random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return 500, _error('internal_error', 'Injected failure'), None
+        return None
+
+    def price(self, symbol):
+        """Get the symbol's next random-walk price."""
+        with self.lock:
+            price = self.prices.get(symbol) or random.uniform(5, 100)
+            price = self.prices[symbol] = max(0.01, price * random.uniform(0.999, 1.001))
+        return price
+
+    def quote(self, symbol):
+        """Get a quote in the /quotes/equities item format."""
+        price = self.price(symbol)
+        spread = max(0.01, price * 0.0005)
+        previous_close = self.prices.setdefault(f"{symbol}:close", price)
+        return {
+            'symbol': symbol,
+            'bid': round(price - spread / 2, 2),
+            'ask': round(price + spread / 2, 2),
+            'last': round(price, 2),
+            'prev-close': round(previous_close, 2),
+            'change': round(price - previous_close, 2),
+            'change-percent': round((price / previous_close - 1) * 100, 2)
+        }
+
+    def balances(self, account):
+        """Get balances in the /accounts/{id}/balances format."""
+        with self.lock:
+            cash = self.cash.setdefault(account, self.starting_cash)
+        return {
+            'account-number': account,
+            'cash-balance': round(cash, 2),
+            'equity-buying-power': round(cash, 2),
+            'net-liquidating-value': round(cash, 2)
+        }
+
+    def get_positions(self, account):
+        """Get open positions in the /accounts/{id}/positions item format."""
+        with self.lock:
+            held = [(symbol, quantity, cost) for symbol, (quantity, cost)
+                    in self.positions.get(account, {}).items() if quantity]
+        return [{
+            'account-number': account,
+            'symbol': symbol,
+            'instrument-type': 'Equity',
+            'underlying-symbol': symbol,
+            'quantity': abs(quantity),
+            'quantity-direction': 'Long' if quantity > 0 else 'Short',
+            'multiplier': 1,
+            'average-open-price': round(cost / quantity, 4),
+            'close-price': round(self.prices.get(f"{symbol}:close") or self.price(symbol), 2)
+        } for symbol, quantity, cost in held]
+
+    def _fill_position(self, account, leg, price):
+        """Apply one filled leg to the account's positions; call with the lock held."""
+        quantity = int(leg['quantity']) * (1 if leg['action'].startswith('Buy') else -1)
+        held = self.positions.setdefault(account, {}).setdefault(leg['symbol'], [0, 0.0])
+        if held[0] and (held[0] > 0) != (quantity > 0):
+            # Closing (part of) the position reduces the cost at its average open price
+            closed = min(abs(quantity), abs(held[0])) * (1 if quantity < 0 else -1)
+            held[1] -= held[1] / held[0] * closed
+            held[0] -= closed
+            quantity += closed
+        held[0] += quantity
+        held[1] += quantity * price
+
+    def place_order(self, account, payload):
+        """Validate and store an order; returns (http status, response body)."""
+        legs = payload.get('legs') or []
+        order_type = payload.get('order-type')
+        if not legs or order_type not in ('Market', 'Limit'):
+            return 422, _error('validation_error', 'Order needs legs and a Market or Limit order type')
+        if order_type == 'Limit' and not payload.get('price'):
+            return 422, _error('validation_error', 'Limit orders need a price')
+        for leg in legs:
+            if not leg.get('symbol') or not leg.get('quantity') or int(leg['quantity']) <= 0:
+                return 422, _error('validation_error', 'Every leg needs a symbol and a positive quantity')
+
+        with self.lock:
+            order_id = self.next_order_id
+            self.next_order_id += 1
+            order = {
+                'id': order_id,
+                'account-number': account,
+                'order-type': order_type,
+                'time-in-force': payload.get('time-in-force', 'Day'),
+                'price': payload.get('price'),
+                'price-effect': payload.get('price-effect'),
+                'status': 'Received',
+                'legs': legs,
+                'received-at': datetime.now(timezone.utc).isoformat(),
+                '_received': time.monotonic()
+            }
+            self.orders[order_id] = order
+        return 201, {'data': {'order': _public(order), 'warnings': []}}
+
+    def get_order(self, account, order_id):
+        """Get an order, advancing it through Live/Filled as time passes."""
+        with self.lock:
+            order = self.orders.get(order_id)
+        if order is None or order['account-number'] != account:
+            return None
+        if order['status'] in ('Received', 'Live') and time.monotonic() - order['_received'] >= self.fill_delay:
+            # Net market price of the order: buys pay the ask, sells receive the bid
+            cost = 0.0
+            leg_prices = []
+            for leg in order['legs']:
+                quote = self.quote(leg['symbol'])
+                if leg['action'].startswith('Buy'):
+                    leg_prices.append(quote['ask'])
+                    cost += quote['ask'] * int(leg['quantity'])
+                else:
+                    leg_prices.append(quote['bid'])
+                    cost -= quote['bid'] * int(leg['quantity'])
+            market_cost = cost
+            if order['order-type'] == 'Limit':
+                limit = float(order['price'])
+                # A Debit limit caps what is paid, a Credit limit sets the least that is received
+                limit = limit if order.get('price-effect', 'Debit') == 'Debit' else -limit
+                if cost > limit:
+                    with self.lock:
+                        order['status'] = 'Live'
+                    return _public(order)
+                cost = limit
+            with self.lock:
+                if order['status'] not in ('Received', 'Live'):
+                    return _public(order)  # Filled meanwhile by a concurrent status request
+                # Legs fill at their market prices, scaled to the limit price when one applied
+                scale = cost / market_cost if market_cost else 1.0
+                for leg, price in zip(order['legs'], leg_prices):
+                    self._fill_position(account, leg, price * scale)
+                self.cash[account] = self.cash.get(account, self.starting_cash) - cost
+                order['status'] = 'Filled'
+                order['filled-at'] = datetime.now(timezone.utc).isoformat()
+                order['fill-price'] = round(abs(cost), 2)
+        return _public(order)
+
+def _public(order):
+    """Strip private bookkeeping fields from an order."""
+    return {k: v for k, v in order.items() if not k.startswith('_')}
+
+def _error(code, message):
+    """Build an error body in the API's format."""
+    return {'error': {'code': code, 'message': message}}
+
+class _Handler(BaseHTTPRequestHandler):
+    """Routes requests to the FakeBroker on the server."""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+    # Headers and body are written separately; without this, delayed ACKs add ~40ms per response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _send(self, status, body=None, retry_after=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        if retry_after is not None:
+            self.send_header('Retry-After', f"{retry_after:.3f}")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _dispatch(self, method):
+        broker = self.server.broker
+        url = urlsplit(self.path)
+        path = url.path.rstrip('/')
+        query = parse_qs(url.query)
+        body = self._body() if method == 'POST' else {}
+
+        if method == 'GET' and path == '/_fake/stats':
+            with broker.lock:
+                return self._send(200, dict(broker.stats))
+
+        rejection = broker.admit()
+        if rejection is not None:
+            return self._send(*rejection)
+
+        if path == '/sessions':
+            if method == 'POST':
+                if not body.get('login') or not body.get('password'):
+                    return self._send(401, _error('invalid_credentials', 'Invalid login or password'))
+                token = uuid.uuid4().hex
+                with broker.lock:
+                    broker.sessions.add(token)
+                expiration = datetime.now(timezone.utc) + timedelta(hours=24)
+                return self._send(201, {'data': {
+                    'session-token': token,
+                    'remember-token': uuid.uuid4().hex,
+                    'session-expiration': expiration.isoformat(),
+                    'user': {'username': body['login']}
+                }})
+            if method == 'DELETE':
+                with broker.lock:
+                    broker.sessions.discard(self.headers.get('Authorization'))
+                return self._send(204)
+
+        if self.headers.get('Authorization') not in broker.sessions:
+            return self._send(401, _error('token_invalid', 'Session token is invalid or expired'))
+
+        if method == 'GET' and path in ('/instruments/equities', '/quotes/equities'):
+            symbols = [s.upper() for s in query.get('symbol[]', []) + query.get('symbol', [])]
+            if path == '/instruments/equities':
+                items = [{'symbol': s, 'description': DESCRIPTIONS.get(s, s), 'instrument-type': 'Equity'}
+                         for s in symbols]
+            else:
+                items = [broker.quote(s) for s in symbols]
+            return self._send(200, {'data': {'items': items}})
+
+        if method == 'GET' and path == '/quote-streamer-tokens':
+            return self._send(200, {'data': {'token': uuid.uuid4().hex,
+                                             'dxlink-url': self.server.dxlink_url, 'level': 'demo'}})
+
+        match = BALANCES_PATH.match(path)
+        if method == 'GET' and match:
+            return self._send(200, {'data': broker.balances(match.group(1))})
+
+        match = POSITIONS_PATH.match(path)
+        if method == 'GET' and match:
+            return self._send(200, {'data': {'items': broker.get_positions(match.group(1))}})
+
+        match = ORDER_PATH.match(path)
+        if match:
+            account, order_id = match.group(1), match.group(2)
+            if method == 'POST' and order_id is None:
+                return self._send(*broker.place_order(account, body))
+            if method == 'GET' and order_id is not None:
+                order = broker.get_order(account, int(order_id))
+                if order is None:
+                    return self._send(404, _error('not_found', 'Order not found'))
+                return self._send(200, {'data': order})
+
+        self._send(404, _error('not_found', f'No route for {method} {path}'))
+
+class FakeBrokerServer(ThreadingHTTPServer):
+    """Threaded fake Tastytrade API server."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, fill_delay=1.0, dxlink_url='ws://127.0.0.1:8765',
+                 verbose=False, **broker_options):
+        """
+        Args:
+            broker_options: Latency, error and rate limit options passed to FakeBroker
+        """
+        self.broker = FakeBroker(fill_delay=fill_delay, **broker_options)
+        self.dxlink_url = dxlink_url
+        self.verbose = verbose
+        super().__init__((host, port), _Handler)
+
+    @property
+    def url(self):
+        """Get the base URL clients should use as API_BASE_URL."""
+        host, port = self.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve in a background thread."""
+        threading.Thread(target=self.serve_forever, name='fake-broker', daemon=True).start()
+        return self
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--fill-delay', type=float, default=1.0, help='seconds before orders can fill')
+    parser.add_argument('--dxlink-url', default='ws://127.0.0.1:8765', help='URL handed out with streamer tokens')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many extra seconds at random')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction (0-1) of requests failed with a 500')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='requests per second before answering 429')
+    parser.add_argument('--burst', type=float, default=None, help='requests allowed at once under --rate-limit')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    server = FakeBrokerServer(args.host, args.port, args.fill_delay, args.dxlink_url, args.verbose,
+                              latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                              rate_limit=args.rate_limit, burst=args.burst)
+    print(f"Fake Tastytrade API listening on {server.url}")
+    server.serve_forever()
@@ -0,0 +1,285 @@
+# /fake_redis.py
+"""
+Local stand-in for a Redis server.
+
+Implements the commands RedisState uses (GET, SET with EX/PX/NX, DEL, INCR,
+RPUSH, LTRIM, LRANGE, and WATCH/MULTI/EXEC transactions) plus PING, AUTH,
+SELECT, EXPIRE, TTL and FLUSHALL, keeping everything in memory, so SHARED_STATE_BACKEND=redis can be tried and
+tested without installing Redis.
+
+Run a server:   python fake_redis.py --port 6380
+Point the app:  SHARED_STATE_BACKEND=redis REDIS_URL=redis://127.0.0.1:6380/0 python app.py
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+class FakeRedis:
+    """In-memory keyspace shared by all connection handler threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}  # key -> bytes or list of bytes
+        self.expires = {}  # key -> expiry (time.time())
+        self.versions = {}  # key -> number of changes, for WATCH
+
+    def _alive(self, key):
+        """Check whether a key exists, dropping it if it has expired; call with the lock held."""
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+            self._touch(key)
+        return key in self.data
+
+    def _touch(self, key):
+        """Record a change of key, aborting transactions that WATCH it; call with the lock held."""
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def _handler(self, args):
+        command = args[0].upper().decode('ascii')
+        handler = getattr(self, f"cmd_{command.lower()}", None)
+        if handler is None:
+            raise ValueError(f"ERR unknown command '{command}'")
+        return handler
+
+    def execute(self, args):
+        """Run one command; returns the reply value (exceptions become error replies)."""
+        handler = self._handler(args)
+        with self.lock:
+            return handler(*args[1:])
+
+    def watch(self, keys):
+        """Get the current versions of keys for a later transaction."""
+        with self.lock:
+            for key in keys:
+                self._alive(key)
+            return {key: self.versions.get(key, 0) for key in keys}
+
+    def transaction(self, commands, watched):
+        """Run queued commands atomically; None (no-op) if a watched key changed since WATCH."""
+        with self.lock:
+            for key, version in watched.items():
+                self._alive(key)
+                if self.versions.get(key, 0) != version:
+                    return None
+            replies = []
+            for args in commands:
+                try:
+                    replies.append(self._handler(args)(*args[1:]))
+                except (ValueError, IndexError, TypeError) as e:
+                    replies.append(_Error(_error_message(e)))
+            return replies
+
+    def cmd_ping(self, *args):
+        return _Status('PONG')
+
+    def cmd_auth(self, *args):
+        return _Status('OK')
+
+    def cmd_select(self, db):
+        return _Status('OK')
+
+    def cmd_flushall(self, *args):
+        for key in self.data:
+            self._touch(key)
+        self.data.clear()
+        self.expires.clear()
+        return _Status('OK')
+
+    def cmd_get(self, key):
+        if not self._alive(key):
+            return None
+        value = self.data[key]
+        if isinstance(value, list):
+            raise ValueError('WRONGTYPE Operation against a key holding the wrong kind of value')
+        return value
+
+    def cmd_set(self, key, value, *options):
+        options = [o.upper() for o in options]
+        expires_at = None
+        for name, unit in ((b'EX', 1.0), (b'PX', 0.001)):
+            if name in options:
+                expires_at = time.time() + int(options[options.index(name) + 1]) * unit
+        if b'NX' in options and self._alive(key):
+            return None
+        self.data[key] = value
+        self._touch(key)
+        self.expires.pop(key, None)
+        if expires_at is not None:
+            self.expires[key] = expires_at
+        return _Status('OK')
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                del self.data[key]
+                self.expires.pop(key, None)
+                self._touch(key)
+                removed += 1
+        return removed
+
+    def cmd_incr(self, key):
+        value = int(self.data[key]) + 1 if self._alive(key) else 1
+        self.data[key] = str(value).encode('ascii')
+        self._touch(key)
+        return value
+
+    def cmd_expire(self, key, seconds):
+        if not self._alive(key):
+            return 0
+        self.expires[key] = time.time() + int(seconds)
+        self._touch(key)
+        return 1
+
+    def cmd_ttl(self, key):
+        if not self._alive(key):
+            return -2
+        expires_at = self.expires.get(key)
+        return -1 if expires_at is None else int(expires_at - time.time())
+
+    def cmd_rpush(self, key, *values):
+        items = self.data[key] if self._alive(key) else []
+        items.extend(values)
+        self.data[key] = items
+        self._touch(key)
+        return len(items)
+
+    def cmd_ltrim(self, key, start, stop):
+        if self._alive(key):
+            items = self.data[key]
+            start, stop = _index_range(len(items), int(start), int(stop))
+            self.data[key] = items[start:stop]
+            self._touch(key)
+        return _Status('OK')
+
+    def cmd_lrange(self, key, start, stop):
+        if not self._alive(key):
+            return []
+        items = self.data[key]
+        start, stop = _index_range(len(items), int(start), int(stop))
+        return items[start:stop]
+
+class _Status(str):
+    """A simple-string reply such as +OK."""
+
+class _Error(str):
+    """An error reply inside a transaction's replies."""
+
+def _error_message(e):
+    """Format an exception from a command handler as a Redis error message."""
+    return str(e) if str(e).startswith(('ERR', 'WRONGTYPE')) else f"ERR {e}"
+
+def _index_range(length, start, stop):
+    """Convert Redis inclusive (possibly negative) list indexes to a Python slice range."""
+    if start < 0:
+        start = max(0, length + start)
+    if stop < 0:
+        stop = length + stop
+    return start, max(start, min(length, stop + 1))
+
+def _encode(value):
+    """Encode a reply value in RESP."""
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, _Status):
+        return f"+{value}\r\n".encode('utf-8')
+    if isinstance(value, _Error):
+        return f"-{value}\r\n".encode('utf-8')
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, list):
+        return b'*%d\r\n' % len(value) + b''.join(_encode(item) for item in value)
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+class _RedisHandler(socketserver.StreamRequestHandler):
+    """Reads RESP commands from one connection and answers them in order."""
+
+    def handle(self):
+        self.watched = {}  # key -> version when WATCHed
+        self.queued = None  # Commands queued since MULTI
+        while True:
+            try:
+                args = self._read_command()
+            except (ConnectionError, ValueError):
+                return
+            if args is None:
+                return
+            try:
+                reply = _encode(self._execute(args))
+            except (ValueError, IndexError, TypeError) as e:
+                reply = _encode(_Error(_error_message(e)))
+            self.wfile.write(reply)
+
+    def _execute(self, args):
+        """Run a command, handling the connection's transaction state."""
+        redis = self.server.redis
+        command = args[0].upper()
+        if command == b'MULTI':
+            if self.queued is not None:
+                raise ValueError('ERR MULTI calls can not be nested')
+            self.queued = []
+            return _Status('OK')
+        if command in (b'EXEC', b'DISCARD'):
+            if self.queued is None:
+                raise ValueError(f"ERR {command.decode('ascii')} without MULTI")
+            queued, watched = self.queued, self.watched
+            self.queued, self.watched = None, {}
+            return redis.transaction(queued, watched) if command == b'EXEC' else _Status('OK')
+        if self.queued is not None:
+            redis._handler(args)
+            self.queued.append(args)
+            return _Status('QUEUED')
+        if command == b'WATCH':
+            self.watched.update(redis.watch(args[1:]))
+            return _Status('OK')
+        if command == b'UNWATCH':
+            self.watched = {}
+            return _Status('OK')
+        return redis.execute(args)
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            # Inline command, e.g. from telnet
+            return line.split() or None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    """Threaded fake Redis server."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.redis = FakeRedis()
+        super().__init__((host, port), _RedisHandler)
+
+    @property
+    def url(self):
+        """Get the URL to use as REDIS_URL."""
+        host, port = self.server_address
+        return f"redis://{host}:{port}/0"
+
+    def start(self):
+        """Serve in a background thread."""
+        threading.Thread(target=self.serve_forever, name='fake-redis', daemon=True).start()
+        return self
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6380)
+    args = parser.parse_args()
+
+    server = FakeRedisServer(args.host, args.port)
+    print(f"Fake Redis listening on {server.url}")
+    server.serve_forever()
@@ -0,0 +1,237 @@
+# /fake_streamer.py
+"""
+Local stand-in for the DXLink quote streamer.
+
+Speaks just enough of the websocket and DXLink protocols for QuoteStreamer:
+SETUP/AUTH/CHANNEL_REQUEST/FEED_SETUP/FEED_SUBSCRIPTION handshakes, then
+random-walk Quote/Trade/Summary events for every subscribed symbol.
+
+Run a server:            python fake_streamer.py --port 8765 --rate 20
+Benchmark the streamer:  python fake_streamer.py --bench 10 --rate 1000
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import socketserver
+import struct
+import threading
+import time
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+class _WebSocketHandler(socketserver.BaseRequestHandler):
+    """One websocket connection speaking DXLink."""
+
+    def handle(self):
+        if not self._handshake():
+            return
+        self.send_lock = threading.Lock()
+        self.symbols = set()
+        self.feed_channel = None
+        self.prices = {}
+        self.closed = threading.Event()
+        feeder = threading.Thread(target=self._feed, daemon=True)
+        feeder.start()
+        try:
+            while not self.closed.is_set():
+                opcode, payload = self._recv_frame()
+                if opcode is None or opcode == 0x8:
+                    break
+                if opcode == 0x9:
+                    self._send_frame(0xA, payload)
+                elif opcode == 0x1:
+                    self._on_message(json.loads(payload.decode('utf-8')))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.closed.set()
+
+    def _handshake(self):
+        """Perform the HTTP upgrade handshake."""
+        data = b''
+        while b'\r\n\r\n' not in data:
+            chunk = self.request.recv(4096)
+            if not chunk:
+                return False
+            data += chunk
+        headers = {}
+        for line in data.decode('latin-1').split('\r\n')[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        key = headers.get('sec-websocket-key')
+        if not key:
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        self.request.sendall(
+            'HTTP/1.1 101 Switching Protocols\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            f'Sec-WebSocket-Accept: {accept}\r\n\r\n'.encode()
+        )
+        return True
+
+    def _recv_exact(self, size):
+        """Read exactly size bytes from the socket."""
+        data = b''
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Client closed the connection")
+            data += chunk
+        return data
+
+    def _recv_frame(self):
+        """Read one (unfragmented) client frame."""
+        first, second = self._recv_exact(2)
+        opcode = first & 0x0F
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack('>H', self._recv_exact(2))[0]
+        elif length == 127:
+            length = struct.unpack('>Q', self._recv_exact(8))[0]
+        mask = self._recv_exact(4) if second & 0x80 else None
+        payload = self._recv_exact(length)
+        if mask:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        return opcode, payload
+
+    def _send_frame(self, opcode, payload):
+        """Send one unmasked server frame."""
+        header = bytes([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header += bytes([length])
+        elif length < 65536:
+            header += bytes([126]) + struct.pack('>H', length)
+        else:
+            header += bytes([127]) + struct.pack('>Q', length)
+        with self.send_lock:
+            self.request.sendall(header + payload)
+
+    def _send(self, message):
+        """Send one JSON text message."""
+        self._send_frame(0x1, json.dumps(message).encode('utf-8'))
+
+    def _on_message(self, message):
+        """Answer DXLink control messages."""
+        message_type = message.get('type')
+        channel = message.get('channel', 0)
+        if message_type == 'SETUP':
+            self._send({'type': 'SETUP', 'channel': 0, 'version': '0.1-fake', 'keepaliveTimeout': 60})
+            self._send({'type': 'AUTH_STATE', 'channel': 0, 'state': 'UNAUTHORIZED'})
+        elif message_type == 'AUTH':
+            self._send({'type': 'AUTH_STATE', 'channel': 0, 'state': 'AUTHORIZED', 'userId': 'fake'})
+        elif message_type == 'CHANNEL_REQUEST':
+            self.feed_channel = channel
+            self._send({'type': 'CHANNEL_OPENED', 'channel': channel, 'service': 'FEED',
+                        'parameters': message.get('parameters', {})})
+        elif message_type == 'FEED_SETUP':
+            self._send({'type': 'FEED_CONFIG', 'channel': channel, 'dataFormat': 'COMPACT',
+                        'eventFields': message.get('acceptEventFields', {})})
+        elif message_type == 'FEED_SUBSCRIPTION':
+            if message.get('reset'):
+                self.symbols = set()
+            added = {item['symbol'] for item in message.get('add', [])}
+            for symbol in added - self.symbols:
+                self.prices[symbol] = random.uniform(5, 100)
+                self._send({'type': 'FEED_DATA', 'channel': channel,
+                            'data': ['Summary', ['Summary', symbol, round(self.prices[symbol], 2)]]})
+            self.symbols |= added
+        elif message_type == 'KEEPALIVE':
+            self._send({'type': 'KEEPALIVE', 'channel': 0})
+
+    def _feed(self):
+        """Push random-walk quotes for subscribed symbols at the server's rate."""
+        interval = 1.0 / self.server.rate
+        while not self.closed.wait(interval):
+            if self.feed_channel is None or not self.symbols:
+                continue
+            quotes = []
+            trades = []
+            now_ms = time.time() * 1000
+            for symbol in list(self.symbols):
+                price = self.prices[symbol] = max(0.01, self.prices[symbol] * random.uniform(0.999, 1.001))
+                spread = max(0.01, price * 0.0005)
+                quotes += ['Quote', symbol, round(price - spread / 2, 2), round(price + spread / 2, 2), now_ms]
+                trades += ['Trade', symbol, round(price, 2)]
+            try:
+                self._send({'type': 'FEED_DATA', 'channel': self.feed_channel, 'data': ['Quote', quotes]})
+                self._send({'type': 'FEED_DATA', 'channel': self.feed_channel, 'data': ['Trade', trades]})
+            except OSError:
+                self.closed.set()
+
+class FakeStreamerServer(socketserver.ThreadingTCPServer):
+    """Threaded fake DXLink server; rate is feed messages per second per connection."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, rate=20):
+        self.rate = rate
+        super().__init__((host, port), _WebSocketHandler)
+
+    @property
+    def url(self):
+        """Get the websocket URL clients should connect to."""
+        host, port = self.server_address
+        return f"ws://{host}:{port}"
+
+    def start(self):
+        """Serve in a background thread."""
+        threading.Thread(target=self.serve_forever, name='fake-streamer', daemon=True).start()
+        return self
+
+def run_benchmark(seconds, rate, symbols):
+    """Run QuoteStreamer against a local fake server and report throughput."""
+    from quote_book import QuoteBook
+    from quote_streamer import QuoteStreamer
+
+    server = FakeStreamerServer(rate=rate).start()
+    book = QuoteBook()
+    streamer = QuoteStreamer(book, lambda: ('fake-token', server.url), symbols=symbols)
+    streamer.start()
+
+    deadline = time.monotonic() + 10
+    while not book.is_live() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    start_updates = book.updates
+    latencies = []
+    started = time.monotonic()
+    while time.monotonic() - started < seconds:
+        time.sleep(0.05)
+        if streamer.last_latency_ms is not None:
+            latencies.append(streamer.last_latency_ms)
+    elapsed = time.monotonic() - started
+    updates = book.updates - start_updates
+    sample = book.get(symbols[0])
+
+    streamer.stop()
+    server.shutdown()
+
+    latencies.sort()
+    print(f"symbols:            {len(symbols)}")
+    print(f"book updates:       {updates} in {elapsed:.1f}s ({updates / elapsed:,.0f}/s)")
+    if latencies:
+        print(f"feed latency p50:   {latencies[len(latencies) // 2]:.2f} ms")
+        print(f"feed latency p99:   {latencies[int(len(latencies) * 0.99)]:.2f} ms")
+    print(f"sample quote:       {sample}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rate', type=float, default=20, help='feed messages per second per connection')
+    parser.add_argument('--symbols', default='MSTU,TQQQ,SOXL', help='symbols used by --bench')
+    parser.add_argument('--bench', type=float, metavar='SECONDS', help='benchmark QuoteStreamer instead of serving')
+    args = parser.parse_args()
+
+    if args.bench:
+        run_benchmark(args.bench, args.rate, [s.strip().upper() for s in args.symbols.split(',') if s.strip()])
+    else:
+        server = FakeStreamerServer(args.host, args.port, args.rate)
+        print(f"Fake DXLink streamer listening on {server.url}")
+        server.serve_forever()
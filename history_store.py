@@ -0,0 +1,274 @@
+# /history_store.py
+import bisect
+import glob
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; every process then writes
+    fcntl = None
+
+import config
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+EASTERN = pytz.timezone('US/Eastern')
+
+# Columns of each series kind; every value is a float64, timestamp first (epoch seconds)
+QUOTE_FIELDS = ('timestamp', 'bid', 'ask', 'last')
+BALANCE_FIELDS = ('timestamp', 'cash_balance', 'total_equity', 'buying_power')
+SERIES_FIELDS = {
+    'quotes': QUOTE_FIELDS,
+    'balances': BALANCE_FIELDS
+}
+
+# Bar sizes accepted by bars(), e.g. '30s', '5m', '1h', '1d'
+RESOLUTION_PATTERN = re.compile(r'^(\d+)([smhd])$')
+RESOLUTION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+SERIES_NAME_PATTERN = re.compile(r'^[A-Z0-9./_-]{1,20}$')
+
+def parse_resolution(value):
+    """Parse a bar size such as '5m' into seconds (None if invalid)."""
+    match = RESOLUTION_PATTERN.match(value or '')
+    if not match or int(match.group(1)) <= 0:
+        return None
+    return int(match.group(1)) * RESOLUTION_UNITS[match.group(2)]
+
+class _Segment:
+    """Read-only memory map of one day's records, viewed as float64 columns."""
+
+    def __init__(self, path, width):
+        self.rows = 0
+        self._map = None
+        self._values = None
+        self.columns = []
+        size = os.path.getsize(path)
+        record_size = width * 8
+        size -= size % record_size  # Ignore a record still being appended
+        if not size:
+            return
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        self._values = memoryview(self._map).cast('d')
+        self.rows = size // record_size
+        # Strided views: column i of row r is values[r * width + i]
+        self.columns = [self._values[i::width] for i in range(width)]
+
+    def bounds(self, start, end):
+        """Binary-search the row range with start <= timestamp < end."""
+        timestamps = self.columns[0]
+        return bisect.bisect_left(timestamps, start), bisect.bisect_left(timestamps, end)
+
+    def read(self, first, last):
+        """Copy rows first..last-1 out as one list per column."""
+        return [column[first:last].tolist() for column in self.columns]
+
+    def close(self):
+        """Release the views and unmap the file."""
+        if self._map is None:
+            return
+        for column in self.columns:
+            column.release()
+        self._values.release()
+        self.columns = []
+        self._map.close()
+        self._map = None
+
+class HistoryStore:
+    """
+    Append-only time series of quotes and balances.
+
+    Each series (e.g. quotes/MSTU) is stored as one file per US/Eastern day of
+    fixed-size float64 records, so appends are a single write and reads map
+    the file and binary-search the timestamp column without parsing anything.
+    Only one process writes at a time: the first worker to take the writer
+    lock records snapshots and the others skip them, so running a poller in
+    every gunicorn worker does not duplicate rows.
+    """
+
+    def __init__(self, base_dir, retention_days):
+        self.base_dir = base_dir
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._writer_file = None
+        self._last_recorded = {}  # (kind, name) -> timestamp of the last appended source value
+        self._last_prune_day = None
+        self.rows_written = 0
+
+    def _is_writer(self):
+        """Check whether this process holds (or can take) the writer lock."""
+        if self._writer_file is not None:
+            return True
+        if fcntl is None:
+            return True
+        os.makedirs(self.base_dir, exist_ok=True)
+        lock_file = open(os.path.join(self.base_dir, '.writer.lock'), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # Held until the process exits; another worker takes over after that
+        self._writer_file = lock_file
+        logger.info(f"This process records history to {self.base_dir}")
+        return True
+
+    def _path(self, kind, name, day):
+        return os.path.join(self.base_dir, kind, name, f"{day.isoformat()}.bin")
+
+    def append(self, kind, name, values, timestamp=None):
+        """
+        Append one record to a series.
+
+        Args:
+            kind: 'quotes' or 'balances'
+            name: Series name (symbol or account)
+            values: Values of the non-timestamp fields, in SERIES_FIELDS order
+            timestamp: Epoch seconds (defaults to now)
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        fields = SERIES_FIELDS[kind]
+        record = struct.pack(f'<{len(fields)}d', timestamp, *(float(v or 0) for v in values))
+        day = datetime.fromtimestamp(timestamp, EASTERN).date()
+        path = self._path(kind, name, day)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, record)
+            finally:
+                os.close(fd)
+            self.rows_written += 1
+        if day != self._last_prune_day:
+            self._last_prune_day = day
+            self.prune(day)
+
+    def record_snapshot(self, snapshot):
+        """Poller listener: append the snapshot's fresh quotes and balance."""
+        if not config.HISTORY_ENABLED or not self._is_writer():
+            return
+        try:
+            for symbol, quote in (snapshot.get('quotes') or {}).items():
+                # Skip stale and unchanged quotes so a repeated value is stored once
+                if quote.get('stale') or self._last_recorded.get(('quotes', symbol)) == quote.get('timestamp'):
+                    continue
+                self._last_recorded[('quotes', symbol)] = quote.get('timestamp')
+                self.append('quotes', symbol, (quote.get('bid_price'), quote.get('ask_price'), quote.get('last_price')))
+
+            account = snapshot.get('account')
+            if (account and not account.get('stale')
+                    and self._last_recorded.get(('balances', 'account')) != account.get('timestamp')):
+                self._last_recorded[('balances', 'account')] = account.get('timestamp')
+                self.append('balances', 'account',
+                            (account.get('cash_balance'), account.get('total_equity'), account.get('buying_power')))
+        except Exception as e:
+            logger.error(f"Failed to record history: {str(e)}")
+
+    def _segments(self, kind, name, start, end):
+        """Yield the paths of the daily files overlapping [start, end)."""
+        day = datetime.fromtimestamp(start, EASTERN).date()
+        last_day = datetime.fromtimestamp(end, EASTERN).date()
+        while day <= last_day:
+            path = self._path(kind, name, day)
+            if os.path.exists(path):
+                yield path
+            day += timedelta(days=1)
+
+    def query(self, kind, name, start, end):
+        """
+        Get the records of a series with start <= timestamp < end.
+
+        Returns:
+            list: One tuple per record, in SERIES_FIELDS[kind] order
+        """
+        rows = []
+        for columns in self._read(kind, name, start, end):
+            rows.extend(zip(*columns))
+        return rows
+
+    def bars(self, symbol, start, end, resolution):
+        """
+        Downsample a symbol's quotes into OHLC bars.
+
+        Bars are aligned to multiples of resolution seconds (US/Eastern days for
+        daily bars). Prices are last trades, or the bid/ask midpoint when no
+        trade price is known.
+
+        Returns:
+            list: [{'time', 'open', 'high', 'low', 'close', 'bid', 'ask', 'count'}]
+        """
+        bars = []
+        current = None
+        for timestamps, bids, asks, lasts in self._read('quotes', symbol, start, end):
+            for timestamp, bid, ask, last in zip(timestamps, bids, asks, lasts):
+                price = last or (bid + ask) / 2
+                if not price:
+                    continue
+                bucket = self._bucket_start(timestamp, resolution)
+                if current is None or current['time'] != bucket:
+                    current = {'time': bucket, 'open': price, 'high': price, 'low': price,
+                               'close': price, 'bid': bid, 'ask': ask, 'count': 0}
+                    bars.append(current)
+                elif price > current['high']:
+                    current['high'] = price
+                elif price < current['low']:
+                    current['low'] = price
+                current['close'] = price
+                current['bid'] = bid
+                current['ask'] = ask
+                current['count'] += 1
+        return bars
+
+    def _read(self, kind, name, start, end):
+        """Yield the columns of each daily file's rows within [start, end)."""
+        width = len(SERIES_FIELDS[kind])
+        for path in self._segments(kind, name, start, end):
+            segment = _Segment(path, width)
+            try:
+                first, last = segment.bounds(start, end) if segment.rows else (0, 0)
+                columns = segment.read(first, last) if first < last else None
+            finally:
+                segment.close()
+            if columns:
+                yield columns
+
+    @staticmethod
+    def _bucket_start(timestamp, resolution):
+        """Get the start of the bar a timestamp belongs to."""
+        if resolution >= 86400:
+            moment = datetime.fromtimestamp(timestamp, EASTERN)
+            midnight = EASTERN.localize(datetime(moment.year, moment.month, moment.day))
+            return midnight.timestamp()
+        return timestamp - timestamp % resolution
+
+    def get_series(self):
+        """List the stored series as {kind: [name, ...]}."""
+        series = {}
+        for kind in SERIES_FIELDS:
+            directory = os.path.join(self.base_dir, kind)
+            if os.path.isdir(directory):
+                series[kind] = sorted(os.listdir(directory))
+        return series
+
+    def prune(self, today=None):
+        """Delete daily files older than the retention period."""
+        today = today or datetime.now(EASTERN).date()
+        cutoff = (today - timedelta(days=self.retention_days)).isoformat()
+        for path in glob.glob(os.path.join(self.base_dir, '*', '*', '*.bin')):
+            if os.path.basename(path)[:-len('.bin')] < cutoff:
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+
+# Create a singleton instance
+history = HistoryStore(config.HISTORY_DIR, config.HISTORY_RETENTION_DAYS)
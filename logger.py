@@ -1,48 +1,287 @@
 # /logger.py
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
 import sys
-from datetime import datetime
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; rotation is then only coordinated within one process
+    fcntl = None
 
 import config
 
-# Create logs directory if it doesn't exist
-os.makedirs('logs', exist_ok=True)
+# Attributes every LogRecord has; anything else was passed with extra= and is logged as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including any extra= fields."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'source': f"{record.filename}:{record.lineno}",
+            'pid': record.process,
+            'thread': record.threadName
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only 1 in N INFO and DEBUG records of the configured loggers.
+
+    Records are counted per logger and message (record.msg, which is the
+    rendered text for f-string messages), so a rare message is not crowded
+    out by a frequent one of the same logger. At most max_keys counters are
+    kept, dropping the least recently used, so messages with varying text do
+    not grow memory. Kept records carry a sample_rate field; warnings and
+    errors are never sampled.
+    """
+
+    def __init__(self, rates, max_keys=1000):
+        """
+        Args:
+            rates: Logger name -> N; a logger's children use its rate unless they have their own
+            max_keys: Maximum number of (logger, message) counters kept
+        """
+        super().__init__()
+        self.rates = rates
+        self.max_keys = max_keys
+        self.sampled_out = 0
+        self._lock = threading.Lock()
+        self._counts = OrderedDict()  # (logger name, message) -> records seen, least recently used first
+
+    def _rate(self, name):
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        rate = self._rate(record.name)
+        if rate <= 1:
+            return True
+        key = (record.name, record.msg)
+        # The filter sits on the queue handler, so every thread that logs runs it
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+            self._counts.move_to_end(key)
+            while len(self._counts) > self.max_keys:
+                self._counts.popitem(last=False)
+            if count % rate:
+                self.sampled_out += 1
+                return False
+        record.sample_rate = rate
+        return True
+
+class RotatingLogFile(logging.FileHandler):
+    """
+    Log file rotated by size and/or age, safe with several worker processes.
+
+    Every process checks the file on disk rather than its own stream, renames
+    under a file lock (log -> log.1 -> log.2 ...), and a process whose file was
+    rotated by another one simply reopens it.
+    """
+
+    def __init__(self, filename, max_bytes=0, interval=0, backup_count=5):
+        """
+        Args:
+            filename: Log file path
+            max_bytes: Rotate once the file reaches this size (0 to disable)
+            interval: Rotate every this many seconds, aligned to the epoch (0 to disable)
+            backup_count: Rotated files kept
+        """
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        super().__init__(filename, encoding='utf-8')
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backup_count = backup_count
+        self._inode = os.fstat(self.stream.fileno()).st_ino
+        self._next_rollover = self._rollover_after(time.time())
+
+    def _rollover_after(self, now):
+        return (now // self.interval + 1) * self.interval if self.interval else float('inf')
+
+    def _due(self, stat):
+        if self.max_bytes and stat.st_size >= self.max_bytes:
+            return True
+        return time.time() >= self._next_rollover and stat.st_size > 0
+
+    def emit(self, record):
+        try:
+            try:
+                stat = os.stat(self.baseFilename)
+            except FileNotFoundError:
+                stat = None
+            if stat is None or stat.st_ino != self._inode:
+                self._reopen()
+            elif self._due(stat):
+                self._rotate()
+        except OSError:
+            self.handleError(record)
+        super().emit(record)
+
+    def _reopen(self):
+        if self.stream is not None:
+            self.stream.close()
+        self.stream = self._open()
+        self._inode = os.fstat(self.stream.fileno()).st_ino
+        self._next_rollover = self._rollover_after(time.time())
+
+    def _rotate(self):
+        with open(f"{self.baseFilename}.lock", 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                stat = os.stat(self.baseFilename)
+                # Another process may have rotated the file while we waited for the lock
+                if stat.st_ino == self._inode and self._due(stat):
+                    for index in range(self.backup_count - 1, 0, -1):
+                        source = f"{self.baseFilename}.{index}"
+                        if os.path.exists(source):
+                            os.replace(source, f"{self.baseFilename}.{index + 1}")
+                    if self.backup_count:
+                        os.replace(self.baseFilename, f"{self.baseFilename}.1")
+                    else:
+                        os.remove(self.baseFilename)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        self._reopen()
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hand records to the background writer without blocking.
+
+    Only the message itself is resolved in the calling thread (its arguments
+    may change once the call returns); output formatting and I/O happen in
+    the writer. Records are dropped and counted when the queue is full.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class _Pipeline:
+    """The root logger's queue handler and the listener writing its records."""
+
+    def __init__(self, handlers, queue_size, sample_rates):
+        self.handlers = handlers
+        self.queue_size = queue_size
+        self.queue_handler = _QueueHandler(queue.Queue(queue_size))
+        self.sampler = SamplingFilter(sample_rates)
+        self.queue_handler.addFilter(self.sampler)
+        self.listener = None
+
+    def start(self):
+        self.listener = logging.handlers.QueueListener(
+            self.queue_handler.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        """Write out the queued records and stop the listener."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def restart_in_child(self):
+        """Give a forked process its own queue and listener (the parent's thread does not survive fork)."""
+        self.queue_handler.queue = queue.Queue(self.queue_size)
+        self.start()
+
+    def get_stats(self):
+        return {
+            'queued': self.queue_handler.queue.qsize(),
+            'dropped': self.queue_handler.dropped,
+            'sampled_out': self.sampler.sampled_out
+        }
 
 # Configure logging
 def setup_logger():
     # Get the root logger
     logger = logging.getLogger()
-    
+
     # Set the log level based on configuration
     log_level = getattr(logging, config.LOG_LEVEL.upper(), logging.INFO)
     logger.setLevel(log_level)
-    
+
     # Create formatters
     console_formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
-    
-    file_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
-    )
-    
+
+    if config.LOG_FORMAT == 'json':
+        file_formatter = JsonFormatter()
+    else:
+        file_formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
+        )
+
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
-    
-    # File handler - create a new log file each day
-    log_filename = f"logs/tastytrade_{datetime.now().strftime('%Y-%m-%d')}.log"
-    file_handler = logging.FileHandler(log_filename)
+
+    # File handler, rotated by size and age
+    file_handler = RotatingLogFile(config.LOG_FILE, max_bytes=config.LOG_ROTATE_BYTES,
+                                   interval=config.LOG_ROTATE_INTERVAL, backup_count=config.LOG_BACKUP_COUNT)
     file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
-    
-    return logger
+
+    # Request threads only enqueue records; a background listener formats and writes them
+    pipeline = _Pipeline([console_handler, file_handler], config.LOG_QUEUE_SIZE, config.LOG_SAMPLE_RATES)
+    logger.addHandler(pipeline.queue_handler)
+    pipeline.start()
+    atexit.register(pipeline.stop)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=pipeline.restart_in_child)
+
+    return logger, pipeline
 
 # Create a logger instance
-logger = setup_logger()
+logger, _pipeline = setup_logger()
 
 def get_logger(name):
     """Get a logger with the specified name."""
     return logging.getLogger(name)
+
+def get_log_stats():
+    """Get the logging pipeline's queue depth and dropped/sampled-out record counts."""
+    return _pipeline.get_stats()
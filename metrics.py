@@ -0,0 +1,330 @@
+# /metrics.py
+import functools
+import glob
+import json
+import math
+import os
+import threading
+import time
+
+import config
+from logger import get_log_stats, get_logger
+
+logger = get_logger(__name__)
+
+# Histogram buckets grow by 5% each, so any recorded value is reported
+# within 5% of its true value (HDR-style fixed relative precision)
+BUCKET_GROWTH = 1.05
+BUCKET_MIN_MS = 0.01
+_LOG_GROWTH = math.log(BUCKET_GROWTH)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+def _bucket_index(value):
+    """Get the histogram bucket index for a value in milliseconds."""
+    if value <= BUCKET_MIN_MS:
+        return 0
+    return int(math.log(value / BUCKET_MIN_MS) / _LOG_GROWTH) + 1
+
+def _bucket_upper_bound(index):
+    """Get the upper bound (ms) of a histogram bucket."""
+    return BUCKET_MIN_MS * BUCKET_GROWTH ** index
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram.
+
+    Buckets are sparse and keyed by index, so histograms from several worker
+    processes can be merged exactly by adding their bucket counts.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, value_ms):
+        """Record one latency in milliseconds."""
+        index = _bucket_index(value_ms)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.sum += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def merge(self, other):
+        """Add another histogram's counts into this one."""
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, quantile):
+        """Get the value (ms) at a quantile between 0 and 1."""
+        if not self.count:
+            return 0.0
+        target = quantile * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= target:
+                return min(_bucket_upper_bound(index), self.max)
+        return self.max
+
+    def to_dict(self):
+        """Serialize for the per-worker metrics file."""
+        return {'buckets': self.buckets, 'count': self.count, 'sum': self.sum, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Deserialize from a per-worker metrics file."""
+        histogram = cls()
+        histogram.buckets = {int(k): v for k, v in data['buckets'].items()}
+        histogram.count = data['count']
+        histogram.sum = data['sum']
+        histogram.max = data['max']
+        return histogram
+
+class MetricsRegistry:
+    """
+    Process-local counters, gauges and latency histograms.
+
+    Each gunicorn worker periodically writes its metrics to its own file in
+    config.METRICS_DIR; render_prometheus() merges every live worker's file so
+    a scrape hitting any worker sees totals and percentiles for all of them.
+    """
+
+    def __init__(self, metrics_dir):
+        self.metrics_dir = metrics_dir
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> LatencyHistogram
+        self._collectors = []  # callables returning [(name, labels_dict, value, type)]
+        self._help = {}
+        self._flusher = None
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def describe(self, name, help_text):
+        """Set the HELP text shown for a metric."""
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        """Increment a counter."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value_ms, **labels):
+        """Record a latency (ms) into a histogram."""
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.record(value_ms)
+
+    def register_collector(self, collector):
+        """
+        Register a callable reporting values owned by other components.
+
+        The collector returns a list of (name, labels, value, type) tuples, where
+        type is 'counter' or 'gauge'. Values are summed across workers.
+        """
+        self._collectors.append(collector)
+
+    def _local_state(self):
+        """Get this process's metrics in the serializable file format."""
+        with self._lock:
+            counters = [[name, list(labels), value, 'counter'] for (name, labels), value in self._counters.items()]
+            histograms = [[name, list(labels), histogram.to_dict()]
+                          for (name, labels), histogram in self._histograms.items()]
+        for collector in self._collectors:
+            try:
+                for name, labels, value, metric_type in collector():
+                    counters.append([name, sorted((k, str(v)) for k, v in labels.items()), value, metric_type])
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {str(e)}")
+        return {'pid': os.getpid(), 'time': time.time(), 'counters': counters, 'histograms': histograms}
+
+    def flush(self):
+        """Write this worker's metrics to its file."""
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        path = os.path.join(self.metrics_dir, f"metrics_{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._local_state(), f)
+        os.replace(tmp_path, path)
+
+    def start_flusher(self):
+        """Flush metrics in a background thread every config.METRICS_FLUSH_INTERVAL seconds."""
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+
+        def run():
+            while True:
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.error(f"Failed to flush metrics: {str(e)}")
+                time.sleep(config.METRICS_FLUSH_INTERVAL)
+
+        self._flusher = threading.Thread(target=run, name='metrics-flusher', daemon=True)
+        self._flusher.start()
+
+    def _worker_states(self):
+        """Get this worker's live state plus the flushed state of every other live worker."""
+        states = [self._local_state()]
+        for path in glob.glob(os.path.join(self.metrics_dir, 'metrics_*.json')):
+            try:
+                pid = int(os.path.basename(path)[len('metrics_'):-len('.json')])
+            except ValueError:
+                continue
+            if pid == os.getpid():
+                continue
+            if not _pid_alive(pid):
+                # Worker is gone; its counters reset like any restarted process
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path) as f:
+                    states.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return states
+
+    def collect(self):
+        """
+        Merge metrics from all workers.
+
+        Returns:
+            tuple: ({(name, labels): (value, type)}, {(name, labels): LatencyHistogram}, worker_count)
+        """
+        counters = {}
+        histograms = {}
+        states = self._worker_states()
+        for state in states:
+            for name, labels, value, metric_type in state['counters']:
+                key = (name, tuple(tuple(label) for label in labels))
+                previous = counters.get(key, (0, metric_type))[0]
+                counters[key] = (previous + value, metric_type)
+            for name, labels, data in state['histograms']:
+                key = (name, tuple(tuple(label) for label in labels))
+                histogram = histograms.get(key)
+                if histogram is None:
+                    histogram = histograms[key] = LatencyHistogram()
+                histogram.merge(LatencyHistogram.from_dict(data))
+        return counters, histograms, len(states)
+
+    def render_prometheus(self):
+        """Render all workers' metrics in the Prometheus text exposition format."""
+        counters, histograms, workers = self.collect()
+        lines = []
+        described = set()
+
+        def header(name, metric_type):
+            if name not in described:
+                described.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {metric_type}")
+
+        for (name, labels), (value, metric_type) in sorted(counters.items(), key=lambda item: item[0]):
+            header(name, metric_type)
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), histogram in sorted(histograms.items(), key=lambda item: item[0]):
+            header(name, 'summary')
+            for quantile in QUANTILES:
+                quantile_labels = labels + (('quantile', str(quantile)),)
+                lines.append(f"{name}{_format_labels(quantile_labels)} {_format_value(histogram.percentile(quantile))}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+        header('pricecheck_metrics_workers', 'gauge')
+        lines.append(f"pricecheck_metrics_workers {workers}")
+        return "\n".join(lines) + "\n"
+
+def _pid_alive(pid):
+    """Check whether a process exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _format_labels(labels):
+    """Format label pairs as {a="1",b="2"}."""
+    if not labels:
+        return ''
+    escaped = (f'{k}="{_escape_label(v)}"' for k, v in labels)
+    return '{' + ','.join(escaped) + '}'
+
+def _escape_label(value):
+    """Escape a label value for the text exposition format."""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_value(value):
+    """Format a sample value."""
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, int):
+        return str(value)
+    return repr(round(float(value), 6))
+
+def instrumented(call, failed=lambda result: result is None):
+    """
+    Decorator recording latency and failures of a TastetradeClient call.
+
+    Args:
+        call: Name used as the 'call' label
+        failed: Predicate telling whether a returned result means the call failed
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                metrics.inc('client_call_errors_total', call=call, error=type(e).__name__)
+                raise
+            finally:
+                metrics.observe('client_call_duration_ms', (time.perf_counter() - started) * 1000, call=call)
+            if failed(result):
+                metrics.inc('client_call_errors_total', call=call, error='failed')
+            return result
+        return wrapper
+    return decorator
+
+def _collect_log_metrics():
+    """Report the logging pipeline's queue depth and dropped records."""
+    stats = get_log_stats()
+    return [
+        ('log_queue_depth', {}, stats['queued'], 'gauge'),
+        ('log_records_dropped_total', {}, stats['dropped'], 'counter'),
+        ('log_records_sampled_out_total', {}, stats['sampled_out'], 'counter')
+    ]
+
+# Create a singleton instance
+metrics = MetricsRegistry(config.METRICS_DIR)
+metrics.register_collector(_collect_log_metrics)
+metrics.describe('client_call_duration_ms', 'Latency of TastetradeClient calls in milliseconds')
+metrics.describe('client_call_errors_total', 'Failed TastetradeClient calls by error type')
+metrics.describe('broker_request_duration_ms', 'Latency of HTTP requests to the broker in milliseconds')
+metrics.describe('broker_request_errors_total', 'Failed HTTP requests to the broker by error type')
+metrics.describe('circuit_breaker_open', 'Workers whose circuit breaker for the endpoint class is open')
+metrics.describe('circuit_breaker_rejections_total', 'Requests refused without contacting the broker by an open circuit breaker')
+metrics.describe('circuit_breaker_transitions_total', 'Circuit breaker state changes by new state')
+metrics.describe('log_queue_depth', 'Log records waiting for the background writer')
+metrics.describe('log_records_dropped_total', 'Log records dropped because the log queue was full')
+metrics.describe('log_records_sampled_out_total', 'INFO/DEBUG log records skipped by LOG_SAMPLE_RATES sampling')
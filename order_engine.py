@@ -0,0 +1,189 @@
+# /order_engine.py
+"""
+Order validation and payload building for equity orders.
+
+Orders are plain dicts. A single-leg order may be given flat:
+
+    {"symbol": "MSTU", "action": "Buy", "quantity": 10, "order_type": "Limit", "price": 12.5}
+
+and a multi-leg order as a list of legs:
+
+    {"legs": [{"symbol": "MSTU", "action": "Buy", "quantity": 10},
+              {"symbol": "TQQQ", "action": "Sell", "quantity": 5}],
+     "order_type": "Limit", "price": 40.0, "price_effect": "Debit"}
+
+validate_order() normalizes either form into the legs form used everywhere else.
+"""
+import math
+import re
+import threading
+import time
+
+# Validation rules, compiled once at import
+SYMBOL_PATTERN = re.compile(r'^[A-Z]{1,6}(?:[./][A-Z]{1,2})?$')
+ORDER_TYPES = frozenset(('Market', 'Limit'))
+TIME_IN_FORCE = frozenset(('Day', 'GTC', 'Ext', 'GTC Ext'))
+PRICE_EFFECTS = frozenset(('Debit', 'Credit'))
+# Leg action -> price effect of a leg with that action
+ACTIONS = {
+    'Buy': 'Debit',
+    'Buy to Open': 'Debit',
+    'Buy to Close': 'Debit',
+    'Sell': 'Credit',
+    'Sell to Open': 'Credit',
+    'Sell to Close': 'Credit'
+}
+MAX_LEGS = 4
+
+def _normalize_action(action):
+    """Match an action case-insensitively ('sell to close' -> 'Sell to Close')."""
+    if not isinstance(action, str):
+        return None
+    action = ' '.join(action.split()).lower()
+    for known in ACTIONS:
+        if known.lower() == action:
+            return known
+    return None
+
+def _parse_quantity(value):
+    """Parse a positive whole number of shares (None if invalid)."""
+    try:
+        quantity = float(value)
+    except (TypeError, ValueError):
+        return None
+    # inf and nan would overflow or fail int() below
+    if not math.isfinite(quantity) or quantity <= 0 or quantity != int(quantity):
+        return None
+    return int(quantity)
+
+def validate_order(spec):
+    """
+    Validate an order and normalize it.
+
+    Args:
+        spec: Order dict in the flat single-leg or the multi-leg form
+
+    Returns:
+        tuple: (order, errors) - the normalized order (None if invalid) and a list of messages
+    """
+    if not isinstance(spec, dict):
+        return None, ['Order must be an object']
+
+    errors = []
+    raw_legs = spec.get('legs')
+    if raw_legs is None:
+        raw_legs = [{'symbol': spec.get('symbol'), 'action': spec.get('action', 'Buy'),
+                     'quantity': spec.get('quantity')}]
+    if not isinstance(raw_legs, list) or not raw_legs:
+        return None, ['Order needs at least one leg']
+    if len(raw_legs) > MAX_LEGS:
+        return None, [f'Orders can have at most {MAX_LEGS} legs']
+
+    legs = []
+    for number, leg in enumerate(raw_legs, start=1):
+        prefix = f'Leg {number}: ' if len(raw_legs) > 1 else ''
+        if not isinstance(leg, dict):
+            errors.append(f'{prefix}Leg must be an object')
+            continue
+        symbol = str(leg.get('symbol') or '').strip().upper()
+        action = _normalize_action(leg.get('action'))
+        quantity = _parse_quantity(leg.get('quantity'))
+        if not SYMBOL_PATTERN.match(symbol):
+            errors.append(f'{prefix}Invalid symbol {symbol!r}')
+        if action is None:
+            errors.append(f"{prefix}Invalid action {leg.get('action')!r}. Use one of: {', '.join(ACTIONS)}")
+        if quantity is None:
+            errors.append(f'{prefix}Invalid quantity. Please enter a positive whole number.')
+        legs.append({'symbol': symbol, 'action': action, 'quantity': quantity})
+
+    order_type = spec.get('order_type', 'Market')
+    if order_type not in ORDER_TYPES:
+        errors.append(f"Invalid order type {order_type!r}. Use 'Market' or 'Limit'.")
+
+    time_in_force = spec.get('time_in_force', 'Day')
+    if time_in_force not in TIME_IN_FORCE:
+        errors.append(f'Invalid time in force {time_in_force!r}')
+
+    price = None
+    if order_type == 'Limit':
+        try:
+            price = float(spec.get('price'))
+        except (TypeError, ValueError):
+            price = None
+        if price is None or not math.isfinite(price) or price <= 0:
+            errors.append('Invalid price for limit order. Please enter a positive number.')
+
+    # Buys pay (Debit) and sells receive (Credit); mixed orders must say which
+    price_effect = spec.get('price_effect')
+    if price_effect is not None and price_effect not in PRICE_EFFECTS:
+        errors.append(f"Invalid price effect {price_effect!r}. Use 'Debit' or 'Credit'.")
+    elif price_effect is None and order_type == 'Limit':
+        effects = {ACTIONS[leg['action']] for leg in legs if leg['action']}
+        if len(effects) > 1:
+            errors.append("Orders mixing buys and sells need a price_effect ('Debit' or 'Credit')")
+        elif effects:
+            price_effect = effects.pop()
+
+    if errors:
+        return None, errors
+    return {
+        'legs': legs,
+        'order_type': order_type,
+        'price': price,
+        'price_effect': price_effect if order_type == 'Limit' else None,
+        'time_in_force': time_in_force
+    }, []
+
+def describe_order(order):
+    """Get a short description such as 'Buy 10 MSTU, Sell 5 TQQQ @ 40.00 Limit'."""
+    legs = ', '.join(f"{leg['action']} {leg['quantity']} {leg['symbol']}" for leg in order['legs'])
+    if order['order_type'] == 'Limit':
+        return f"{legs} @ {order['price']:.2f} Limit"
+    return f"{legs} Market"
+
+def build_order_payload(order):
+    """Build the broker's JSON order payload from a validated order."""
+    payload = {
+        'source': 'API',
+        'order-type': order['order_type'],
+        'time-in-force': order['time_in_force'],
+        'legs': [{
+            'instrument-type': 'Equity',
+            'symbol': leg['symbol'],
+            'quantity': leg['quantity'],
+            'action': leg['action']
+        } for leg in order['legs']]
+    }
+    if order['order_type'] == 'Limit':
+        payload['price'] = order['price']
+        payload['price-effect'] = order['price_effect']
+    return payload
+
+class OrderPacer:
+    """
+    Spaces order submissions at most rate per second across threads.
+
+    Orders fanned out by several threads still reach the broker as an even
+    stream instead of a burst that would trip its rate limit.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self._lock = threading.Lock()
+        self._next_slot = 0
+
+    def wait(self):
+        """Block until this caller may submit."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def back_off(self, seconds):
+        """Push every following slot back (e.g. after an HTTP 429)."""
+        with self._lock:
+            self._next_slot = max(self._next_slot, time.monotonic() + seconds)
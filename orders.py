@@ -0,0 +1,319 @@
+# /orders.py
+import functools
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; order updates are then not locked
+    fcntl = None
+
+import config
+from logger import get_logger
+from order_engine import describe_order
+from tastytrade_client import client
+
+logger = get_logger(__name__)
+
+# Order handles are derived from idempotency keys, so the same key always maps
+# to the same order no matter which worker receives the retry
+IDEMPOTENCY_NAMESPACE = uuid.UUID('6f1c2a4e-5b0d-4c8e-9a7f-3d2b1e0c9f84')
+
+# Statuses after which an order never changes again
+TERMINAL_STATUSES = ('Filled', 'Rejected', 'Cancelled', 'Expired', 'Failed')
+
+# Statuses of orders the broker has not answered for yet
+SUBMISSION_STATUSES = ('Queued', 'Submitting')
+
+# Fields of a record that make up the order itself
+ORDER_FIELDS = ('legs', 'order_type', 'price', 'price_effect', 'time_in_force')
+
+# How often old order records are cleaned up (seconds)
+PRUNE_INTERVAL = 3600
+
+class OrderQueue:
+    """
+    Non-blocking order submission with idempotency keys.
+
+    submit() stores the order and returns its handle immediately; a small pool
+    of worker threads sends it to the broker. Records are JSON files in
+    config.ORDERS_DIR, created with an atomic link(), so a retried request with
+    the same idempotency key is de-duplicated even when it reaches another
+    gunicorn worker, and any worker can report an order's status. Updates
+    re-read the record under a per-order file lock, so one worker never
+    overwrites a newer status written by another.
+
+    Orders a stopped worker left behind are picked up by recover() at startup
+    and by get(): queued orders are submitted again (only one worker can move
+    an order from 'Queued' to 'Submitting'), and orders still 'Submitting'
+    after config.ORDER_SUBMIT_TIMEOUT are marked 'Failed', since the broker
+    may have received them.
+    """
+
+    def __init__(self, client, orders_dir, max_workers):
+        self.client = client
+        self.orders_dir = orders_dir
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='order-submit')
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._last_prune = 0
+
+    def add_listener(self, listener):
+        """Register a callable that receives an order every time its status changes."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    @staticmethod
+    def get_order_id(idempotency_key):
+        """Get the order handle for an idempotency key."""
+        return str(uuid.uuid5(IDEMPOTENCY_NAMESPACE, idempotency_key))
+
+    def submit(self, idempotency_key, order):
+        """
+        Queue an order.
+
+        Args:
+            idempotency_key: Client-generated key; resubmitting it returns the original order
+            order: Order normalized by order_engine.validate_order
+
+        Returns:
+            tuple: (order record, True if queued now or False if the key was seen before)
+        """
+        idempotency_key = idempotency_key or uuid.uuid4().hex
+        now = time.time()
+        record = dict(order)
+        record.update({
+            'id': self.get_order_id(idempotency_key),
+            'idempotency_key': idempotency_key,
+            'description': describe_order(order),
+            'status': 'Queued',
+            'message': 'Order queued',
+            'broker_order_id': None,
+            'created_at': now,
+            'updated_at': now
+        })
+
+        self._prune()
+        if not self._create(record):
+            logger.info(f"Duplicate order submission for idempotency key {idempotency_key}")
+            return self.get(record['id'], refresh=False), False
+
+        logger.info(f"Queued order {record['id']}: {record['description']}")
+        self._notify(record)
+        self._executor.submit(self._process, record['id'])
+        return record, True
+
+    def get_many(self, order_ids, refresh=True):
+        """
+        Get several orders at once; open orders are refreshed concurrently.
+
+        Returns:
+            dict: Order (or None if unknown) per handle
+        """
+        order_ids = list(dict.fromkeys(order_ids))
+        if not refresh:
+            return {order_id: self.get(order_id, refresh=False) for order_id in order_ids}
+        results = self.client.fetch_concurrently(
+            {order_id: functools.partial(self.get, order_id) for order_id in order_ids})
+        # An order whose refresh timed out is still reported with its stored status
+        return {order_id: results.get(order_id) or self.get(order_id, refresh=False) for order_id in order_ids}
+
+    def get(self, order_id, refresh=True):
+        """
+        Get an order by its handle.
+
+        Args:
+            order_id: Handle returned by submit()
+            refresh: Ask the broker for the latest status of open orders
+                     (at most every config.ORDER_STATUS_REFRESH seconds)
+
+        Returns:
+            dict or None: The order, or None if it is unknown
+        """
+        order = self._load(order_id)
+        if order is None or not refresh:
+            return order
+
+        if order['status'] in SUBMISSION_STATUSES:
+            return self._recover(order)
+        if (order['status'] in TERMINAL_STATUSES or not order.get('broker_order_id')
+                or time.time() - order.get('checked_at', 0) < config.ORDER_STATUS_REFRESH):
+            return order
+
+        checked_at = time.time()
+        status = self.client.get_order_status(order['broker_order_id'])
+        with self._locked(order['id']):
+            latest = self._load(order['id'])
+            if latest is None or latest['updated_at'] != order['updated_at']:
+                # Another worker changed the order during the lookup; its record is newer
+                return latest
+            latest['checked_at'] = checked_at
+            changed = bool(status) and status != latest['status']
+            if changed:
+                latest.update(status=status, message=f"Order {status.lower()}", updated_at=time.time())
+            self._save(latest)
+        if changed:
+            self._notify(latest)
+        return latest
+
+    def recover(self):
+        """Requeue or fail the orders left open by workers that stopped (call at startup)."""
+        recovered = 0
+        for path in glob.glob(os.path.join(self.orders_dir, '*.json')):
+            order = self._load(os.path.basename(path)[:-len('.json')])
+            if order is not None and order['status'] in SUBMISSION_STATUSES:
+                # Queued orders may sit in a live worker's backlog, which is harmless: only one
+                # worker can claim them. Submitting ones get their full timeout first
+                self._recover(order, requeue_now=True)
+                recovered += 1
+        if recovered:
+            logger.info(f"Checked {recovered} orders left queued or submitting")
+
+    def _recover(self, order, requeue_now=False):
+        """Submit an abandoned queued order again, or fail an abandoned submission."""
+        stuck = time.time() - order['updated_at'] >= config.ORDER_SUBMIT_TIMEOUT
+        if order['status'] == 'Queued':
+            if stuck or requeue_now:
+                self._executor.submit(self._process, order['id'])
+            return order
+        if not stuck:
+            return order
+        logger.warning(f"Order {order['id']} was still submitting after {config.ORDER_SUBMIT_TIMEOUT:g}s; marking it failed")
+        failed = self._update(order['id'], expected={'status': 'Submitting', 'updated_at': order['updated_at']},
+                              status='Failed',
+                              message='Submission was interrupted; check the broker before placing it again')
+        return failed or self._load(order['id'])
+
+    def _process(self, order_id):
+        """Submit a queued order to the broker (runs in the worker pool)."""
+        # Claim the order; another worker may have claimed it already
+        order = self._update(order_id, expected={'status': 'Queued'},
+                             status='Submitting', message='Submitting order to broker')
+        if order is None:
+            return
+
+        try:
+            result = self.client.place_order({field: order[field] for field in ORDER_FIELDS})
+        except Exception as e:
+            result = {'success': False, 'message': f"Exception while placing order: {str(e)}"}
+
+        if result.get('success'):
+            self._update(order_id, status=result.get('status') or 'Received',
+                         broker_order_id=result.get('order_id'), message=result['message'])
+        else:
+            # 'Failed' means the broker may not have seen the order; it is never re-sent automatically
+            self._update(order_id, status=result.get('status') or 'Failed', message=result.get('message'))
+
+    def _update(self, order_id, expected=None, **changes):
+        """
+        Apply changes to an order's latest record, persist it and notify listeners.
+
+        Args:
+            order_id: Handle of the order
+            expected: Fields the record must still have for the changes to apply
+
+        Returns:
+            dict or None: The updated order, or None if it is unknown or no longer as expected
+        """
+        with self._locked(order_id):
+            order = self._load(order_id)
+            if order is None or any(order.get(field) != value for field, value in (expected or {}).items()):
+                return None
+            order.update(changes)
+            order['updated_at'] = time.time()
+            self._save(order)
+        self._notify(order)
+        return order
+
+    @contextmanager
+    def _locked(self, order_id):
+        """Hold an order's file lock while its record is read and replaced."""
+        os.makedirs(self.orders_dir, exist_ok=True)
+        # Every open() is a separate lock owner, so this also excludes threads of one process
+        with open(os.path.join(self.orders_dir, f".{order_id}.lock"), 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _notify(self, order):
+        """Call every listener with a copy of the order."""
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(dict(order))
+            except Exception as e:
+                logger.error(f"Order listener failed: {str(e)}")
+
+    def _path(self, order_id):
+        """Get the record file of an order (None for malformed handles)."""
+        try:
+            order_id = str(uuid.UUID(order_id))
+        except (ValueError, TypeError, AttributeError):
+            return None
+        return os.path.join(self.orders_dir, f"{order_id}.json")
+
+    def _write_tmp(self, order):
+        """Write an order to a temporary file and return its path."""
+        os.makedirs(self.orders_dir, exist_ok=True)
+        tmp_path = os.path.join(self.orders_dir, f".{order['id']}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(order, f)
+        return tmp_path
+
+    def _create(self, order):
+        """Store a new order; returns False if its handle already exists."""
+        tmp_path = self._write_tmp(order)
+        try:
+            os.link(tmp_path, self._path(order['id']))
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+
+    def _save(self, order):
+        """Replace an order's record atomically."""
+        os.replace(self._write_tmp(order), self._path(order['id']))
+
+    def _load(self, order_id):
+        """Read an order's record."""
+        path = self._path(order_id)
+        if path is None:
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Unreadable order record {path}: {str(e)}")
+            return None
+
+    def _prune(self):
+        """Remove records older than config.ORDER_RETENTION."""
+        now = time.time()
+        if now - self._last_prune < PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        for path in glob.glob(os.path.join(self.orders_dir, '*.json')):
+            try:
+                if now - os.path.getmtime(path) > config.ORDER_RETENTION:
+                    os.remove(path)
+                    order_id = os.path.basename(path)[:-len('.json')]
+                    os.remove(os.path.join(self.orders_dir, f".{order_id}.lock"))
+            except OSError:
+                continue
+
+# Create a singleton instance
+order_queue = OrderQueue(client, config.ORDERS_DIR, config.ORDER_WORKERS)
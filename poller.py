@@ -0,0 +1,202 @@
+# /poller.py
+import threading
+import time
+from datetime import datetime, time as dt_time
+
+import pytz
+
+import config
+from logger import get_logger
+from tastytrade_client import client
+
+logger = get_logger(__name__)
+
+EASTERN = pytz.timezone('US/Eastern')
+
+# US equity sessions in Eastern time (exchange holidays are not taken into account)
+PRE_MARKET_OPEN = dt_time(4, 0)
+MARKET_OPEN = dt_time(9, 30)
+MARKET_CLOSE = dt_time(16, 0)
+AFTER_HOURS_CLOSE = dt_time(20, 0)
+
+# How often to re-check the session while polling is switched off
+IDLE_CHECK_INTERVAL = 60
+
+def get_market_session(now=None):
+    """Get the current US equity market session: 'regular', 'extended' or 'closed'."""
+    now = now.astimezone(EASTERN) if now else datetime.now(EASTERN)
+    if now.weekday() >= 5:
+        return 'closed'
+    current = now.time()
+    if MARKET_OPEN <= current < MARKET_CLOSE:
+        return 'regular'
+    if PRE_MARKET_OPEN <= current < AFTER_HOURS_CLOSE:
+        return 'extended'
+    return 'closed'
+
+class MarketDataPoller:
+    """
+    Background thread that keeps an in-memory snapshot of quotes and balances.
+
+    Request handlers read the latest snapshot instead of calling the broker, so a
+    slow Tastytrade response never blocks a request thread. Listeners registered
+    with add_listener are called with each new snapshot.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = 0
+        self._listeners = []
+        self._symbol_sources = []
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._last_balance_poll = 0
+        self._balance_refresh_requested = False
+
+    def start(self, initialize=None):
+        """
+        Start the polling thread.
+
+        Args:
+            initialize: Optional callable run in the thread before the first poll
+                        (e.g. to authenticate the client)
+        """
+        if self.is_running():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(initialize,),
+                                        name='market-data-poller', daemon=True)
+        self._thread.start()
+        logger.info("Market data poller started")
+
+    def stop(self):
+        """Stop the polling thread."""
+        self._stop_event.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def is_running(self):
+        """Check whether the polling thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_listener(self, listener):
+        """Register a callable that receives every new snapshot."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def add_symbol_source(self, source):
+        """Register a callable returning more symbols to poll (e.g. the symbols of open positions)."""
+        with self._lock:
+            self._symbol_sources.append(source)
+    
+    def get_snapshot(self):
+        """Get the latest snapshot, or None if nothing has been polled yet."""
+        return self._snapshot
+
+    def request_balance_refresh(self):
+        """Make the next poll fetch balances from the broker (e.g. after an order is placed)."""
+        self._balance_refresh_requested = True
+        self._last_balance_poll = 0
+
+    def get_symbols(self):
+        """Get the symbols to poll quotes for (MSTU is always included)."""
+        symbols = ['MSTU'] + config.POLLER_SYMBOLS
+        for source in list(self._symbol_sources):
+            try:
+                symbols += source()
+            except Exception as e:
+                logger.error(f"Symbol source failed: {str(e)}")
+        return list(dict.fromkeys(symbols))
+
+    def get_poll_interval(self, session=None):
+        """Get the quote polling interval in seconds for a session (0 means off)."""
+        session = session or get_market_session()
+        if session == 'regular':
+            return config.POLL_INTERVAL_MARKET
+        if session == 'extended':
+            return config.POLL_INTERVAL_EXTENDED
+        return config.POLL_INTERVAL_CLOSED
+
+    def poll_once(self):
+        """Fetch fresh data from the broker and publish a new snapshot."""
+        if not self.client.authenticated:
+            logger.debug("Client not authenticated, skipping poll")
+            return None
+        # Re-authenticate here rather than in a request if the session is getting old
+        if not self.client.ensure_authenticated():
+            return None
+
+        # Every worker runs a poller; going through the shared cache with a TTL of one
+        # interval means only one of them calls the broker per interval
+        interval = self.get_poll_interval() or config.QUOTE_CACHE_TTL
+        calls = {'quotes': lambda: self.client.get_cached_quotes(self.get_symbols(), ttl=interval,
+                                                                 allow_stale=False)}
+        # Balances change far less often than quotes
+        balance_due = time.monotonic() - self._last_balance_poll >= config.POLL_INTERVAL_BALANCE
+        if balance_due:
+            if self._balance_refresh_requested:
+                self._balance_refresh_requested = False
+                self.client.invalidate_account_balance()
+            calls['account'] = lambda: self.client.get_cached_account_balance(
+                ttl=config.POLL_INTERVAL_BALANCE, allow_stale=False)
+
+        results = self.client.fetch_concurrently(calls)
+        # A stale (last known good) balance means the broker did not answer; it was not cached,
+        # so the next poll asks the broker again
+        if balance_due and results.get('account') is not None and not results['account'].get('stale'):
+            self._last_balance_poll = time.monotonic()
+
+        previous = self._snapshot or {}
+        # Keep the last good values for anything that failed this round
+        quotes = dict(previous.get('quotes', {}))
+        quotes.update(results.get('quotes') or {})
+        account = results.get('account') or previous.get('account')
+
+        with self._lock:
+            self._version += 1
+            snapshot = {
+                'version': self._version,
+                'account': account,
+                'quotes': quotes,
+                'mstu': quotes.get('MSTU'),
+                'session': get_market_session(),
+                'updated_at': datetime.now().isoformat()
+            }
+            self._snapshot = snapshot
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error(f"Snapshot listener failed: {str(e)}")
+        return snapshot
+
+    def _run(self, initialize):
+        """Polling loop."""
+        if initialize:
+            try:
+                initialize()
+            except Exception as e:
+                logger.error(f"Poller initialization failed: {str(e)}")
+
+        while not self._stop_event.is_set():
+            interval = self.get_poll_interval()
+            if interval <= 0:
+                # Polling is switched off for this session; check again later
+                self._stop_event.wait(IDLE_CHECK_INTERVAL)
+                continue
+
+            started = time.monotonic()
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.error(f"Market data poll failed: {str(e)}")
+
+            self._stop_event.wait(max(0, interval - (time.monotonic() - started)))
+
+# Create a singleton instance
+poller = MarketDataPoller(client)
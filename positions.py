@@ -0,0 +1,193 @@
+# /positions.py
+import threading
+import time
+
+import config
+from logger import get_logger
+from tastytrade_client import client
+
+logger = get_logger(__name__)
+
+class _Position:
+    """Mark-to-market state of one position."""
+
+    __slots__ = ('symbol', 'quantity', 'multiplier', 'average_open_price', 'close_price',
+                 'mark', 'market_value', 'unrealized', 'day_change', 'marked_at')
+
+    def __init__(self, symbol, quantity, multiplier, average_open_price, close_price):
+        self.symbol = symbol
+        self.quantity = quantity
+        self.multiplier = multiplier
+        self.average_open_price = average_open_price
+        self.close_price = close_price
+        self.marked_at = None
+        # Until a quote arrives the position is valued at its last close (or its open price)
+        self.mark = None
+        self.market_value = self.unrealized = self.day_change = 0.0
+        self.set_mark(close_price or average_open_price)
+
+    def set_mark(self, price):
+        """
+        Revalue the position at a new price.
+
+        Returns:
+            tuple: Change in (market value, unrealized P&L, day P&L)
+        """
+        size = self.quantity * self.multiplier
+        market_value = price * size
+        unrealized = (price - self.average_open_price) * size
+        day_change = (price - self.close_price) * size if self.close_price else 0.0
+        deltas = (market_value - self.market_value, unrealized - self.unrealized,
+                  day_change - self.day_change)
+        self.mark = price
+        self.market_value, self.unrealized, self.day_change = market_value, unrealized, day_change
+        return deltas
+
+    def to_dict(self):
+        cost = self.average_open_price * self.quantity * self.multiplier
+        return {
+            'symbol': self.symbol,
+            'quantity': self.quantity,
+            'multiplier': self.multiplier,
+            'average_open_price': self.average_open_price,
+            'close_price': self.close_price,
+            'mark': self.mark,
+            'market_value': self.market_value,
+            'unrealized_pnl': self.unrealized,
+            'unrealized_pnl_percent': self.unrealized / abs(cost) * 100 if cost else 0.0,
+            'day_pnl': self.day_change,
+            'marked_at': self.marked_at
+        }
+
+class PositionBook:
+    """
+    Open positions with mark-to-market P&L, updated incrementally from quotes.
+
+    Positions are fetched from the broker once (and again after fills or every
+    config.POSITIONS_REFRESH_INTERVAL seconds); after that each new quote only
+    revalues its own position and adjusts the running totals by the difference,
+    so a tick costs the same however many positions are held.
+    """
+
+    def __init__(self, client, account_number=None):
+        """
+        Args:
+            client: Tastytrade client used to fetch the positions
+            account_number: Account whose positions are held (defaults to config.ACCOUNT_NUMBER)
+        """
+        self.client = client
+        self.account_number = account_number
+        self._lock = threading.Lock()
+        self._positions = {}  # symbol -> _Position
+        self._totals = [0.0, 0.0, 0.0]  # market value, unrealized P&L, day P&L
+        self._loaded_at = None
+        self._reload_requested = True
+        self.version = 0  # Increases with every change, for response caching
+
+    def request_reload(self):
+        """Fetch positions again on the next snapshot (e.g. after an order fills)."""
+        self._reload_requested = True
+
+    def load(self):
+        """
+        Fetch the positions from the broker and rebuild the book.
+
+        Returns:
+            bool: Whether the broker answered (the previous book is kept otherwise)
+        """
+        self._reload_requested = False
+        fetched = self.client.get_positions(self.account_number)
+        if fetched is None:
+            # Try again with the next snapshot
+            self._reload_requested = True
+            return False
+
+        with self._lock:
+            previous = self._positions
+            positions = {}
+            for item in fetched:
+                if not item['symbol'] or not item['quantity']:
+                    continue
+                position = _Position(item['symbol'], item['quantity'], item['multiplier'],
+                                     item['average_open_price'], item['close_price'])
+                # Keep the latest mark rather than going back to the close until the next quote
+                old = previous.get(item['symbol'])
+                if old is not None and old.marked_at is not None:
+                    position.set_mark(old.mark)
+                    position.marked_at = old.marked_at
+                positions[item['symbol']] = position
+            self._positions = positions
+            self._totals = [sum(getattr(p, field) for p in positions.values())
+                            for field in ('market_value', 'unrealized', 'day_change')]
+            self._loaded_at = time.time()
+            self.version += 1
+        logger.info("Loaded %d positions for account %s", len(positions),
+                    self.account_number or config.ACCOUNT_NUMBER)
+        return True
+
+    def reload_if_due(self):
+        """Fetch the positions if a reload was requested or the book is older than the refresh interval."""
+        stale_book = (self._loaded_at is not None and config.POSITIONS_REFRESH_INTERVAL > 0 and
+                      time.time() - self._loaded_at >= config.POSITIONS_REFRESH_INTERVAL)
+        if self._reload_requested or stale_book:
+            self.load()
+
+    def mark(self, symbol, price, timestamp=None):
+        """
+        Revalue one position at a new price.
+
+        Returns:
+            bool: Whether anything changed
+        """
+        if not price or price <= 0:
+            return False
+        with self._lock:
+            position = self._positions.get(symbol)
+            if position is None or position.mark == price:
+                return False
+            deltas = position.set_mark(price)
+            position.marked_at = timestamp
+            for index, delta in enumerate(deltas):
+                self._totals[index] += delta
+            self.version += 1
+        return True
+
+    def record_snapshot(self, snapshot):
+        """Poller listener: reload when due, then mark positions to the snapshot's quotes."""
+        try:
+            self.reload_if_due()
+            for symbol, quote in (snapshot.get('quotes') or {}).items():
+                if symbol in self._positions and not quote.get('stale'):
+                    self.mark(symbol, quote.get('last_price') or 0, quote.get('timestamp'))
+        except Exception as e:
+            logger.error(f"Failed to update positions: {str(e)}")
+
+    def get_symbols(self):
+        """Get the symbols of the open positions (polled so they can be marked)."""
+        return list(self._positions)
+
+    def get(self):
+        """
+        Get the positions and totals.
+
+        Returns:
+            dict: {'positions': [...], 'totals': {...}, 'loaded_at': epoch seconds or None}
+        """
+        with self._lock:
+            positions = [position.to_dict() for position in self._positions.values()]
+            market_value, unrealized, day_change = self._totals
+            loaded_at = self._loaded_at
+        cost = market_value - unrealized
+        return {
+            'positions': sorted(positions, key=lambda p: p['symbol']),
+            'totals': {
+                'market_value': market_value,
+                'unrealized_pnl': unrealized,
+                'unrealized_pnl_percent': unrealized / abs(cost) * 100 if cost else 0.0,
+                'day_pnl': day_change
+            },
+            'loaded_at': loaded_at
+        }
+
+# Create a singleton instance
+positions = PositionBook(client)
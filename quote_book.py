@@ -0,0 +1,72 @@
+# /quote_book.py
+import threading
+from datetime import datetime
+
+class QuoteBook:
+    """
+    In-memory last-quote book fed by the streaming quote subsystem.
+
+    Quotes are only served while the feed is live; when the streamer
+    disconnects, the book is marked stale so callers fall back to REST.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._quotes = {}  # symbol -> dict of latest field values
+        self._live = False
+        self.updates = 0
+
+    def set_live(self, live):
+        """Mark the feed as connected (True) or disconnected (False)."""
+        with self._lock:
+            self._live = live
+
+    def is_live(self):
+        """Check whether the feed is currently connected."""
+        return self._live
+
+    def update(self, symbol, **fields):
+        """Merge new field values (bid, ask, last, prev_close, ...) for a symbol."""
+        fields = {k: v for k, v in fields.items() if v is not None}
+        if not fields:
+            return
+        with self._lock:
+            entry = self._quotes.setdefault(symbol, {})
+            entry.update(fields)
+            entry['updated_at'] = datetime.now().isoformat()
+            self.updates += 1
+
+    def get(self, symbol, description=None):
+        """
+        Get a quote for a symbol in the same shape as TastetradeClient quotes.
+
+        Returns:
+            dict or None: None if the feed is down or the symbol has no bid/ask yet
+        """
+        with self._lock:
+            if not self._live:
+                return None
+            entry = self._quotes.get(symbol)
+            if not entry or 'bid' not in entry or 'ask' not in entry:
+                return None
+            entry = dict(entry)
+
+        last = entry.get('last') or (entry['bid'] + entry['ask']) / 2
+        prev_close = entry.get('prev_close')
+        change = last - prev_close if prev_close else 0
+        percent_change = change / prev_close * 100 if prev_close else 0
+        return {
+            'symbol': symbol,
+            'description': description or symbol,
+            'last_price': last,
+            'bid_price': entry['bid'],
+            'ask_price': entry['ask'],
+            'change': round(change, 4),
+            'percent_change': round(percent_change, 4),
+            'timestamp': entry['updated_at']
+        }
+
+    def symbols(self):
+        """Get the symbols that have data in the book."""
+        with self._lock:
+            return list(self._quotes)
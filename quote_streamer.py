@@ -0,0 +1,283 @@
+# /quote_streamer.py
+import json
+import random
+import threading
+import time
+
+from websockets.sync.client import connect
+
+import config
+from logger import get_logger
+from metrics import metrics
+from tastytrade_client import client
+
+logger = get_logger(__name__)
+
+# DXLink channel used for the market data feed
+FEED_CHANNEL = 3
+
+# Fields requested per event type (COMPACT format sends values in this order)
+FEED_FIELDS = {
+    'Quote': ['eventType', 'eventSymbol', 'bidPrice', 'askPrice', 'bidTime'],
+    'Trade': ['eventType', 'eventSymbol', 'price'],
+    'Summary': ['eventType', 'eventSymbol', 'prevDayClosePrice']
+}
+
+def _number(value):
+    """Convert a feed value to float, treating NaN/missing values as None."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if value != value else value
+
+class QuoteStreamer:
+    """
+    Streams quotes from the broker's DXLink websocket into a QuoteBook.
+
+    Runs in a background thread, performs the DXLink SETUP/AUTH/FEED handshake,
+    keeps the connection alive and reconnects with exponential backoff.
+    """
+
+    def __init__(self, quote_book, token_provider, symbols=None):
+        """
+        Args:
+            quote_book: QuoteBook to write quotes into
+            token_provider: Callable returning (token, dxlink_url), or None if unavailable
+            symbols: Initial symbols to subscribe to
+        """
+        self.quote_book = quote_book
+        self.token_provider = token_provider
+        self._symbols = set(symbols or [])
+        self._lock = threading.Lock()
+        self._ws = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self.reconnects = 0
+        self.messages = 0
+        self.last_latency_ms = None
+
+    def start(self):
+        """Start the streaming thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='quote-streamer', daemon=True)
+        self._thread.start()
+        logger.info("Quote streamer started")
+
+    def stop(self):
+        """Stop the streaming thread and close the connection."""
+        self._stop_event.set()
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def add_symbols(self, symbols):
+        """Subscribe to more symbols (takes effect immediately if connected)."""
+        with self._lock:
+            new_symbols = set(symbols) - self._symbols
+            self._symbols |= new_symbols
+            ws = self._ws
+        if new_symbols and ws is not None:
+            try:
+                self._subscribe(ws, new_symbols, reset=False)
+            except Exception as e:
+                logger.warning(f"Could not subscribe to {','.join(new_symbols)}: {str(e)}")
+
+    def record_snapshot(self, snapshot):
+        """Poller listener: subscribe to polled symbols (positions, alert rules) not streamed yet."""
+        self.add_symbols(snapshot.get('quotes', {}).keys())
+
+    def get_stats(self):
+        """Get streamer connection counters."""
+        with self._lock:
+            symbols = sorted(self._symbols)
+        return {
+            'connected': self.quote_book.is_live(),
+            'symbols': symbols,
+            'messages': self.messages,
+            'book_updates': self.quote_book.updates,
+            'reconnects': self.reconnects,
+            'last_latency_ms': self.last_latency_ms
+        }
+
+    def _collect_metrics(self):
+        """Report streamer counters to the metrics registry."""
+        stats = self.get_stats()
+        return [
+            ('streamer_connected', {}, int(stats['connected']), 'gauge'),
+            ('streamer_symbols', {}, len(stats['symbols']), 'gauge'),
+            ('streamer_messages_total', {}, stats['messages'], 'counter'),
+            ('streamer_book_updates_total', {}, stats['book_updates'], 'counter'),
+            ('streamer_reconnects_total', {}, stats['reconnects'], 'counter')
+        ]
+
+    def _run(self):
+        """Connect, stream and reconnect with backoff until stopped."""
+        backoff = 1
+        while not self._stop_event.is_set():
+            connected_at = None
+            try:
+                credentials = self.token_provider()
+                if credentials is None:
+                    raise ConnectionError("No quote streamer token available")
+                token, url = credentials
+                ws = self._connect(token, url)
+                connected_at = time.monotonic()
+                self._stream(ws)
+            except Exception as e:
+                if not self._stop_event.is_set():
+                    logger.warning(f"Quote streamer disconnected: {str(e)}")
+            finally:
+                self.quote_book.set_live(False)
+                self._close()
+
+            if self._stop_event.is_set():
+                break
+
+            # Reset the backoff after a connection that stayed up for a while
+            if connected_at is not None and time.monotonic() - connected_at > config.STREAMER_RECONNECT_MAX:
+                backoff = 1
+            delay = min(backoff, config.STREAMER_RECONNECT_MAX) * random.uniform(0.5, 1.0)
+            self.reconnects += 1
+            logger.info(f"Reconnecting quote streamer in {delay:.1f}s")
+            self._stop_event.wait(delay)
+            backoff *= 2
+
+    def _connect(self, token, url):
+        """Open the websocket and run the DXLink handshake."""
+        logger.info(f"Connecting quote streamer to {url}")
+        ws = connect(url, open_timeout=config.STREAMER_KEEPALIVE)
+        self._ws = ws
+
+        self._send(ws, {
+            'type': 'SETUP',
+            'channel': 0,
+            'version': '0.1',
+            'keepaliveTimeout': config.STREAMER_KEEPALIVE * 2,
+            'acceptKeepaliveTimeout': config.STREAMER_KEEPALIVE * 2
+        })
+        self._send(ws, {'type': 'AUTH', 'channel': 0, 'token': token})
+        self._wait_for(ws, lambda m: m.get('type') == 'AUTH_STATE' and m.get('state') == 'AUTHORIZED')
+
+        self._send(ws, {
+            'type': 'CHANNEL_REQUEST',
+            'channel': FEED_CHANNEL,
+            'service': 'FEED',
+            'parameters': {'contract': 'AUTO'}
+        })
+        self._wait_for(ws, lambda m: m.get('type') == 'CHANNEL_OPENED' and m.get('channel') == FEED_CHANNEL)
+
+        self._send(ws, {
+            'type': 'FEED_SETUP',
+            'channel': FEED_CHANNEL,
+            'acceptAggregationPeriod': 0,
+            'acceptDataFormat': 'COMPACT',
+            'acceptEventFields': FEED_FIELDS
+        })
+        with self._lock:
+            symbols = set(self._symbols)
+        self._subscribe(ws, symbols, reset=True)
+        self.quote_book.set_live(True)
+        logger.info(f"Quote streamer subscribed to {len(symbols)} symbols")
+        return ws
+
+    def _stream(self, ws):
+        """Read feed messages until the connection drops or the streamer stops."""
+        last_keepalive = time.monotonic()
+        while not self._stop_event.is_set():
+            if time.monotonic() - last_keepalive >= config.STREAMER_KEEPALIVE:
+                self._send(ws, {'type': 'KEEPALIVE', 'channel': 0})
+                last_keepalive = time.monotonic()
+            try:
+                raw = ws.recv(timeout=1)
+            except TimeoutError:
+                continue
+            self._handle_message(json.loads(raw))
+
+    def _handle_message(self, message):
+        """Apply one DXLink message to the quote book."""
+        self.messages += 1
+        if message.get('type') != 'FEED_DATA':
+            if message.get('type') == 'ERROR':
+                logger.error(f"Quote streamer error: {message.get('error')} {message.get('message')}")
+            return
+
+        for event in self._iter_events(message.get('data', [])):
+            symbol = event.get('eventSymbol')
+            event_type = event.get('eventType')
+            if not symbol:
+                continue
+            if event_type == 'Quote':
+                self.quote_book.update(symbol, bid=_number(event.get('bidPrice')),
+                                       ask=_number(event.get('askPrice')))
+                bid_time = _number(event.get('bidTime'))
+                if bid_time:
+                    self.last_latency_ms = round(time.time() * 1000 - bid_time, 3)
+            elif event_type == 'Trade':
+                self.quote_book.update(symbol, last=_number(event.get('price')))
+            elif event_type == 'Summary':
+                self.quote_book.update(symbol, prev_close=_number(event.get('prevDayClosePrice')))
+
+    @staticmethod
+    def _iter_events(data):
+        """Yield events as dicts from FULL (list of dicts) or COMPACT (type, flat values) data."""
+        if len(data) == 2 and isinstance(data[0], str) and isinstance(data[1], list):
+            event_type, values = data
+            fields = FEED_FIELDS.get(event_type)
+            if not fields:
+                return
+            width = len(fields)
+            for start in range(0, len(values) - width + 1, width):
+                yield dict(zip(fields, values[start:start + width]))
+        else:
+            for event in data:
+                if isinstance(event, dict):
+                    yield event
+
+    def _subscribe(self, ws, symbols, reset):
+        """Send a FEED_SUBSCRIPTION for every event type of the given symbols."""
+        self._send(ws, {
+            'type': 'FEED_SUBSCRIPTION',
+            'channel': FEED_CHANNEL,
+            'reset': reset,
+            'add': [{'type': event_type, 'symbol': symbol}
+                    for symbol in sorted(symbols) for event_type in FEED_FIELDS]
+        })
+
+    def _wait_for(self, ws, predicate):
+        """Read handshake messages until one matches predicate."""
+        deadline = time.monotonic() + config.STREAMER_KEEPALIVE
+        while time.monotonic() < deadline:
+            message = json.loads(ws.recv(timeout=max(0, deadline - time.monotonic())))
+            if message.get('type') == 'ERROR':
+                raise ConnectionError(f"{message.get('error')}: {message.get('message')}")
+            if predicate(message):
+                return message
+        raise TimeoutError("Timed out waiting for DXLink handshake")
+
+    def _send(self, ws, message):
+        """Send one JSON message."""
+        ws.send(json.dumps(message))
+
+    def _close(self):
+        """Close the current websocket, if any."""
+        ws, self._ws = self._ws, None
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+# Create a singleton instance
+streamer = QuoteStreamer(client.quote_book, client.get_quote_token,
+                         symbols=['MSTU'] + config.POLLER_SYMBOLS)
+if config.STREAMER_ENABLED:
+    metrics.register_collector(streamer._collect_metrics)
@@ -0,0 +1,190 @@
+# /rate_limiter.py
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; buckets are then only shared between threads
+    fcntl = None
+
+import config
+from logger import get_logger
+from metrics import metrics
+
+logger = get_logger(__name__)
+
+# Each bucket is one fixed-size slot in the shared file: name, tokens, last refill time
+SLOT = struct.Struct('<16sdd')
+MAX_SLOTS = 32
+EMPTY_NAME = b'\0' * 16
+
+# Share of the global bucket a priority must leave untouched for higher priorities,
+# so order submissions still get through while quote refreshes are held back
+PRIORITY_RESERVE = {
+    'high': 0.0,
+    'normal': 0.2,
+    'low': 0.5
+}
+
+# Default priority per endpoint class (see transport.get_endpoint_class)
+CLASS_PRIORITY = {
+    'orders': 'high',
+    'session': 'high',
+    'account': 'normal',
+    'default': 'normal',
+    'quotes': 'low'
+}
+
+class RateLimiter:
+    """
+    Token buckets shared by every worker process.
+
+    The buckets live in a small memory-mapped file guarded by an exclusive file
+    lock, so all gunicorn workers draw from the same budget. A request takes a
+    token from the broker-wide 'global' bucket and from its endpoint class's
+    bucket; lower priorities must leave part of the global bucket unused.
+    """
+
+    def __init__(self, path, limits):
+        """
+        Args:
+            path: File holding the shared bucket state
+            limits: {bucket name: (tokens per second, bucket size)}; 'global' applies to every request
+        """
+        self.path = path
+        self.limits = limits
+        self._lock = threading.Lock()  # flock does not exclude threads sharing one file
+        self._fd = None
+        self._map = None
+        self._slots = {}  # bucket name -> slot index
+
+    @contextmanager
+    def _locked(self):
+        """Hold the process and file locks on the mapped bucket file."""
+        with self._lock:
+            if self._map is None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                size = SLOT.size * MAX_SLOTS
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+                self._map = mmap.mmap(fd, size)
+                self._fd = fd
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _slot(self, name):
+        """Find (or claim) the slot of a bucket; call with the lock held."""
+        index = self._slots.get(name)
+        if index is not None:
+            return index
+        encoded = name.encode('utf-8')[:16].ljust(16, b'\0')
+        for index in range(MAX_SLOTS):
+            slot_name = SLOT.unpack_from(self._map, index * SLOT.size)[0]
+            if slot_name == EMPTY_NAME:
+                # New bucket starts full
+                SLOT.pack_into(self._map, index * SLOT.size, encoded, self.limits[name][1], time.time())
+            elif slot_name != encoded:
+                continue
+            self._slots[name] = index
+            return index
+        raise RuntimeError(f"No free rate limiter slot for {name} in {self.path}")
+
+    def _read(self, name, now):
+        """Get a bucket's token count refilled up to now; call with the lock held."""
+        index = self._slot(name)
+        _, tokens, updated = SLOT.unpack_from(self._map, index * SLOT.size)
+        rate, burst = self.limits[name]
+        return min(burst, tokens + max(0.0, now - updated) * rate)
+
+    def _write(self, name, tokens, now):
+        """Store a bucket's token count; call with the lock held."""
+        SLOT.pack_into(self._map, self._slot(name) * SLOT.size, name.encode('utf-8')[:16].ljust(16, b'\0'),
+                       tokens, now)
+
+    def _buckets(self, endpoint_class):
+        """Get the buckets a request of this class draws from."""
+        return [name for name in ('global', endpoint_class) if name in self.limits]
+
+    def try_acquire(self, endpoint_class, priority=None):
+        """
+        Take a token for one request if one is available.
+
+        Returns:
+            float: 0 if the token was taken, otherwise seconds until one should be
+        """
+        priority = priority or CLASS_PRIORITY.get(endpoint_class, 'normal')
+        buckets = self._buckets(endpoint_class)
+        with self._locked():
+            now = time.time()
+            tokens = {name: self._read(name, now) for name in buckets}
+            wait = 0.0
+            for name in buckets:
+                rate, burst = self.limits[name]
+                reserve = burst * PRIORITY_RESERVE[priority] if name == 'global' else 0.0
+                if tokens[name] < reserve + 1:
+                    wait = max(wait, (reserve + 1 - tokens[name]) / rate)
+            for name in buckets:
+                self._write(name, tokens[name] - (0 if wait else 1), now)
+        return wait
+
+    def acquire(self, endpoint_class, priority=None, max_wait=None):
+        """
+        Wait for a token for one request.
+
+        Args:
+            endpoint_class: Endpoint class of the request
+            priority: 'high', 'normal' or 'low' (defaults by endpoint class)
+            max_wait: Give up after this many seconds (defaults to config.RATE_LIMIT_MAX_WAIT)
+
+        Returns:
+            bool: True if a token was taken, False if none became available in time
+        """
+        if max_wait is None:
+            max_wait = config.RATE_LIMIT_MAX_WAIT
+        started = time.monotonic()
+        while True:
+            wait = self.try_acquire(endpoint_class, priority)
+            waited = time.monotonic() - started
+            if not wait:
+                if waited:
+                    metrics.observe('rate_limit_wait_ms', waited * 1000, endpoint_class=endpoint_class)
+                return True
+            if waited + wait > max_wait:
+                metrics.inc('rate_limit_rejections_total', endpoint_class=endpoint_class)
+                logger.warning(f"Rate limit: no {endpoint_class} capacity within {max_wait}s")
+                return False
+            time.sleep(wait)
+
+    def penalize(self, endpoint_class, seconds):
+        """
+        Empty the buckets of a request class for a while (e.g. after an HTTP 429).
+
+        Buckets go negative, so every worker holds off until they have refilled.
+        """
+        with self._locked():
+            now = time.time()
+            for name in self._buckets(endpoint_class):
+                rate = self.limits[name][0]
+                self._write(name, min(self._read(name, now), 0.0) - rate * seconds, now)
+        logger.warning(f"Broker rate limited {endpoint_class} requests; backing off {seconds:.1f}s")
+
+    def get_tokens(self):
+        """Get the current token count of every bucket."""
+        with self._locked():
+            now = time.time()
+            return {name: round(self._read(name, now), 3) for name in self.limits}
+
+# Create a singleton instance (None when rate limiting is switched off)
+rate_limiter = RateLimiter(config.RATE_LIMIT_FILE, config.RATE_LIMITS) if config.RATE_LIMIT_ENABLED else None
+metrics.describe('rate_limit_wait_ms', 'Time requests waited for a rate limit token in milliseconds')
+metrics.describe('rate_limit_rejections_total', 'Requests refused because no rate limit token became available')
@@ -0,0 +1,285 @@
+# /replay.py
+"""
+Record broker HTTP exchanges, and replay them instead of using the network.
+
+With config.RECORD_FILE set, the broker transports write every request they
+send, with its response and latency, to a compact recording (gzip-compressed
+JSON lines, one exchange per line). With config.REPLAY_FILE set they answer
+from such a recording instead, so the whole app (caching, polling, orders,
+the ASGI server) runs offline and deterministically, at the recorded pace or
+faster:
+
+    RECORD_FILE=recordings/session.jsonl.gz python app.py
+    REPLAY_FILE=recordings/session.jsonl.gz REPLAY_SPEED=10 ACCOUNT_NUMBER=<recorded account> python app.py
+
+A request is answered with the latest response recorded for the same method,
+path and query at the current replay time (falling back to any recorded
+query of the path), after its recorded latency divided by REPLAY_SPEED.
+"""
+import atexit
+import bisect
+import gzip
+import json
+import os
+import threading
+import time
+from http.client import responses as HTTP_REASONS
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; appends are then only serialized within one process
+    fcntl = None
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+import config
+from logger import get_logger
+from metrics import metrics
+
+logger = get_logger(__name__)
+
+# Response fields holding credentials; they are recorded as REDACTED
+SECRET_FIELDS = frozenset(('session-token', 'remember-token', 'token'))
+# Response headers kept in the recording
+RECORDED_HEADERS = ('Content-Type', 'Retry-After')
+# Buffered exchanges are compressed and appended after this many records or seconds
+FLUSH_RECORDS = 500
+FLUSH_INTERVAL = 5.0
+
+def normalize_query(query):
+    """Sort a query string's parameters so that equal queries compare equal."""
+    return urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+
+def _redact(value):
+    if isinstance(value, dict):
+        return {key: 'REDACTED' if key in SECRET_FIELDS else _redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact(item) for item in value]
+    return value
+
+def _redact_body(body):
+    """Replace credentials in a JSON response body."""
+    if 'token' not in body:
+        return body
+    try:
+        return json.dumps(_redact(json.loads(body)), separators=(',', ':'))
+    except ValueError:
+        return body
+
+class Recorder:
+    """
+    Appends exchanges to a recording.
+
+    Records are buffered and written as one gzip member per flush under a
+    file lock. Concatenated members read back as a single stream, so several
+    worker processes can record into the same file.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.recorded = 0
+        self._reset()
+        atexit.register(self.flush)
+        if hasattr(os, 'register_at_fork'):
+            # The parent writes out its own buffer
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def record(self, method, url, status, headers, body, elapsed_ms):
+        """
+        Add one exchange.
+
+        Args:
+            method: HTTP method
+            url: Full request URL
+            status: Response status code
+            headers: Response headers
+            body: Response body text
+            elapsed_ms: Time until the response arrived, in milliseconds
+        """
+        parts = urlsplit(url)
+        line = json.dumps({
+            't': round(time.time(), 3),
+            'method': method,
+            'path': parts.path,
+            'query': normalize_query(parts.query),
+            'status': status,
+            'headers': {name: headers[name] for name in RECORDED_HEADERS if name in headers},
+            'body': _redact_body(body),
+            'ms': round(elapsed_ms, 1)
+        }, separators=(',', ':'))
+        with self._lock:
+            self._buffer.append(line)
+            self.recorded += 1
+            due = len(self._buffer) >= FLUSH_RECORDS or time.monotonic() - self._last_flush >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Append the buffered exchanges to the recording."""
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+        if not lines:
+            return
+        data = gzip.compress(('\n'.join(lines) + '\n').encode('utf-8'))
+        with open(self.path, 'ab') as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(data)
+                f.flush()
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+class ReplayStore:
+    """Recorded exchanges indexed by request and served on a replay clock."""
+
+    def __init__(self, path, speed=1.0, loop=True):
+        """
+        Args:
+            path: Recording written by Recorder (plain JSON lines work too)
+            speed: Replay clock speed; 0 serves each request's responses in order without delay
+            loop: Start over when the clock reaches the end of the recording
+        """
+        self.speed = speed
+        self.loop = loop
+        with open(path, 'rb') as f:
+            compressed = f.read(2) == b'\x1f\x8b'
+        with (gzip.open(path, 'rt', encoding='utf-8') if compressed else open(path, encoding='utf-8')) as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        entries.sort(key=lambda entry: entry['t'])
+
+        start = entries[0]['t'] if entries else 0
+        self.duration = entries[-1]['t'] - start if entries else 0
+        self._by_request = {}  # (method, path, query) -> (offsets, entries)
+        self._by_path = {}  # (method, path) -> (offsets, entries), for queries that were not recorded
+        for entry in entries:
+            for index, key in ((self._by_request, (entry['method'], entry['path'], entry['query'])),
+                               (self._by_path, (entry['method'], entry['path']))):
+                offsets, items = index.setdefault(key, ([], []))
+                offsets.append(entry['t'] - start)
+                items.append(entry)
+        self._lock = threading.Lock()
+        self._cursors = {}  # key -> position of the next response, with speed 0
+        self._started = time.monotonic()
+        logger.info("Loaded %d recorded exchanges covering %.0fs from %s", len(entries), self.duration, path)
+
+    def clock(self):
+        """Get the replay position in seconds from the start of the recording."""
+        position = (time.monotonic() - self._started) * self.speed
+        if self.loop and self.duration > 0:
+            return position % self.duration
+        return position
+
+    def lookup(self, method, url):
+        """
+        Get the recorded answer to a request.
+
+        Returns:
+            tuple: (status, headers, body, seconds to wait); a 404 if nothing was recorded for it
+        """
+        parts = urlsplit(url)
+        key = (method, parts.path, normalize_query(parts.query))
+        found = self._by_request.get(key)
+        if found is None:
+            key = (method, parts.path)
+            found = self._by_path.get(key)
+        if found is None:
+            metrics.inc('replay_requests_total', result='missing')
+            if method == 'POST' and parts.path == '/sessions':
+                # Recorded with a stored session, so there is no login to replay
+                return 201, {'Content-Type': 'application/json'}, '{"data":{"session-token":"REDACTED"}}', 0
+            logger.warning("No recorded response for %s %s", method, parts.path)
+            return 404, {'Content-Type': 'application/json'}, json.dumps({'error': {
+                'code': 'not_recorded',
+                'message': f"No recorded response for {method} {parts.path}"
+            }}), 0
+
+        offsets, items = found
+        if self.speed > 0:
+            index = max(0, bisect.bisect_right(offsets, self.clock()) - 1)
+            latency = items[index]['ms'] / 1000 / self.speed
+        else:
+            with self._lock:
+                position = self._cursors.get(key, 0)
+                self._cursors[key] = position + 1
+            index = position % len(items) if self.loop else min(position, len(items) - 1)
+            latency = 0
+        entry = items[index]
+        body = entry['body']
+        if method == 'POST' and parts.path == '/sessions' and entry['status'] < 300:
+            # The recorded expiration has passed; without one the client assumes SESSION_TTL from now
+            try:
+                session = json.loads(body)
+                session.get('data', {}).pop('session-expiration', None)
+                body = json.dumps(session)
+            except (ValueError, AttributeError):
+                pass
+        metrics.inc('replay_requests_total', result='hit')
+        return entry['status'], entry['headers'], body, latency
+
+class RecordingAdapter(HTTPAdapter):
+    """requests adapter that records every exchange it sends."""
+
+    def __init__(self, recorder, **kwargs):
+        self.recorder = recorder
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        started = time.perf_counter()
+        response = super().send(request, **kwargs)
+        self.recorder.record(request.method, request.url, response.status_code, response.headers,
+                             response.text, (time.perf_counter() - started) * 1000)
+        return response
+
+class ReplayAdapter(HTTPAdapter):
+    """requests adapter that answers from a ReplayStore instead of the network."""
+
+    def __init__(self, store, **kwargs):
+        self.store = store
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        status, headers, body, latency = self.store.lookup(request.method, request.url)
+        if latency:
+            time.sleep(latency)
+        response = requests.Response()
+        response.status_code = status
+        response.reason = HTTP_REASONS.get(status, '')
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = body.encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+def create_adapter(**kwargs):
+    """Create the adapter BrokerTransport mounts: replaying, recording or a plain HTTPAdapter."""
+    if replay_store is not None:
+        return ReplayAdapter(replay_store, **kwargs)
+    if recorder is not None:
+        return RecordingAdapter(recorder, **kwargs)
+    return HTTPAdapter(**kwargs)
+
+# Create the singleton instances for the configured mode
+replay_store = ReplayStore(config.REPLAY_FILE, config.REPLAY_SPEED, config.REPLAY_LOOP) if config.REPLAY_FILE else None
+recorder = None
+if config.RECORD_FILE:
+    if replay_store is not None:
+        logger.warning("RECORD_FILE is ignored while replaying REPLAY_FILE")
+    else:
+        recorder = Recorder(config.RECORD_FILE)
+metrics.describe('replay_requests_total', 'Broker requests answered from REPLAY_FILE (hit) or not found in it (missing)')
@@ -0,0 +1,123 @@
+# /response_cache.py
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, request
+
+import config
+from logger import get_logger
+from metrics import metrics
+
+logger = get_logger(__name__)
+
+class _Entry:
+    """One serialized response body, its ETag and (lazily) its gzipped form."""
+
+    __slots__ = ('version', 'body', 'etag', 'build_ms', '_gzipped')
+
+    def __init__(self, version, body, build_ms):
+        self.version = version
+        self.body = body
+        self.etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        self.build_ms = build_ms
+        self._gzipped = None
+
+    def gzipped(self):
+        """Get the gzip-compressed body, compressing it on first use."""
+        if self._gzipped is None:
+            # mtime=0 keeps the output identical for identical bodies
+            self._gzipped = gzip.compress(self.body, compresslevel=config.RESPONSE_GZIP_LEVEL, mtime=0)
+        return self._gzipped
+
+class ResponseCache:
+    """
+    Serialized JSON responses, rebuilt only when the data behind them changes.
+
+    Each response is stored under a key (the endpoint and its parameters)
+    together with the version of the data it was built from. While the version
+    is unchanged, polls are answered with the stored bytes without formatting
+    or serializing anything. Responses carry a content-hash ETag, so a client
+    that already has the body gets a 304 Not Modified, and bodies are gzipped
+    (once per version) for clients that accept it.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> _Entry, least recently used first
+
+    def _get_entry(self, key, version, build):
+        """Get the stored entry for key if it was built from version, otherwise build it."""
+        if version is not None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.version == version:
+                    self._entries.move_to_end(key)
+                    metrics.inc('response_cache_lookups_total', result='hit')
+                    # Formatting and serializing would have cost about as long as it did last time
+                    metrics.inc('response_cache_cpu_saved_ms_total', entry.build_ms)
+                    return entry
+
+        started = time.perf_counter()
+        body = json.dumps(build(), separators=(',', ':')).encode('utf-8')
+        entry = _Entry(version, body, (time.perf_counter() - started) * 1000)
+        metrics.inc('response_cache_lookups_total', result='miss')
+        metrics.observe('response_cache_build_ms', entry.build_ms)
+        if version is not None:
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def respond(self, key, version, build):
+        """
+        Answer the current request from the cache.
+
+        Args:
+            key: Hashable cache key (endpoint and parameters)
+            version: Hashable version of the data behind the response; None disables caching
+            build: Callable returning the JSON-serializable payload
+
+        Returns:
+            Response: 304 if the client's If-None-Match matches, otherwise the (gzipped) JSON body
+        """
+        entry = self._get_entry(key, version, build)
+        headers = {
+            'ETag': f'"{entry.etag}"',
+            'Vary': 'Accept-Encoding',
+            # Let browsers keep the body but revalidate it on every poll
+            'Cache-Control': 'no-cache'
+        }
+
+        # Weak comparison, as for GET requests in RFC 9110
+        if request.if_none_match.contains_weak(entry.etag):
+            metrics.inc('response_cache_not_modified_total')
+            metrics.inc('response_cache_bytes_saved_total', len(entry.body))
+            return Response(status=304, headers=headers)
+
+        body = entry.body
+        if (config.RESPONSE_GZIP_ENABLED and len(body) >= config.RESPONSE_GZIP_MIN_SIZE
+                and 'gzip' in request.accept_encodings):
+            body = entry.gzipped()
+            headers['Content-Encoding'] = 'gzip'
+            metrics.inc('response_cache_bytes_saved_total', len(entry.body) - len(body))
+        return Response(body, mimetype='application/json', headers=headers)
+
+    def get_stats(self):
+        """Get the number of stored responses."""
+        with self._lock:
+            return {'entries': len(self._entries)}
+
+# Create a singleton instance
+response_cache = ResponseCache(config.RESPONSE_CACHE_SIZE)
+metrics.describe('response_cache_lookups_total', 'Cached JSON responses served (hit) or rebuilt (miss)')
+metrics.describe('response_cache_build_ms', 'Time spent formatting and serializing uncached responses in milliseconds')
+metrics.describe('response_cache_cpu_saved_ms_total', 'Estimated formatting and serialization time saved by cache hits in milliseconds')
+metrics.describe('response_cache_not_modified_total', 'Polls answered with 304 Not Modified')
+metrics.describe('response_cache_bytes_saved_total', 'Response bytes not sent thanks to 304s and gzip')
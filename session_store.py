@@ -0,0 +1,74 @@
+# /session_store.py
+import time
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+SESSION_KEY = 'session'
+
+class SessionStore:
+    """
+    Shared store for the broker session token.
+
+    Every gunicorn worker (and, with a file or Redis backend, the next deploy)
+    reads the same session from the shared state, so a valid session is reused
+    instead of logging in again. lock() is an exclusive cross-process lock
+    used to make sure only one process logs in at a time.
+    """
+
+    def __init__(self, state, identity):
+        """
+        Args:
+            state: Shared state backend (see shared_state.py)
+            identity: String identifying the login/API the session belongs to
+        """
+        self.state = state
+        self.identity = identity
+
+    def lock(self):
+        """Hold an exclusive cross-process lock for the duration of the block."""
+        return self.state.lock('session-login')
+
+    def load(self, min_remaining=0):
+        """
+        Get the stored session if it belongs to this identity and is still valid.
+
+        Args:
+            min_remaining: Seconds of validity the session must still have
+
+        Returns:
+            dict or None: {'session_token', 'expires_at', 'created_at'}
+        """
+        try:
+            session = self.state.get(SESSION_KEY)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable stored session: {str(e)}")
+            return None
+        if not isinstance(session, dict):
+            return None
+
+        if session.get('identity') != self.identity or not session.get('session_token'):
+            return None
+        if session.get('expires_at', 0) - time.time() <= min_remaining:
+            return None
+        return session
+
+    def save(self, session_token, expires_at):
+        """Store a session until it expires."""
+        session = {
+            'identity': self.identity,
+            'session_token': session_token,
+            'expires_at': expires_at,
+            'created_at': time.time()
+        }
+        self.state.set(SESSION_KEY, session, ttl=max(1, expires_at - time.time()))
+        return session
+
+    def clear(self, session_token=None):
+        """Remove the stored session (only if it still holds session_token, when given)."""
+        if session_token is not None:
+            stored = self.load()
+            if stored is not None and stored['session_token'] != session_token:
+                return
+        self.state.delete(SESSION_KEY)
@@ -0,0 +1,399 @@
+# /shared_state.py
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import quote, urlsplit
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; file state is then only shared between threads
+    fcntl = None
+
+import config
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Longest file name FileState builds from a key before hashing it instead
+MAX_FILE_NAME = 200
+# Seconds between FileState sweeps of expired keys
+SWEEP_INTERVAL = 60
+
+class MemoryState:
+    """
+    Process-local state: nothing is shared between gunicorn workers.
+
+    Suits single-process deployments and development, and is the fastest
+    backend. Every backend stores JSON-serializable values and offers the
+    same operations: get/set/delete with optional TTLs, incr, capped lists
+    (append/items) and a named lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}  # key -> (value, expires_at or None)
+        self._lists = {}  # key -> deque
+        self._locks = {}  # name -> threading.Lock
+
+    def get(self, key):
+        """Get a value (None if missing or expired)."""
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] <= time.time():
+                del self._values[key]
+                return None
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        """Store a value, expiring after ttl seconds when given."""
+        with self._lock:
+            self._values[key] = (value, time.time() + ttl if ttl else None)
+
+    def delete(self, key):
+        """Remove a value or list."""
+        with self._lock:
+            self._values.pop(key, None)
+            self._lists.pop(key, None)
+
+    def incr(self, key):
+        """Increment an integer counter and return its new value."""
+        with self._lock:
+            value = (self._values.get(key) or (0, None))[0] + 1
+            self._values[key] = (value, None)
+            return value
+
+    def append(self, key, item, max_len):
+        """Append to a list, dropping the oldest items beyond max_len."""
+        with self._lock:
+            items = self._lists.get(key)
+            if items is None or items.maxlen != max_len:
+                items = self._lists[key] = deque(items or (), maxlen=max_len)
+            items.append(item)
+
+    def items(self, key):
+        """Get a list's items, oldest first."""
+        with self._lock:
+            return list(self._lists.get(key, ()))
+
+    @contextmanager
+    def lock(self, name):
+        """Hold an exclusive lock on name for the duration of the block."""
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            yield
+
+class FileState:
+    """
+    State shared by every process on the host through files in one directory.
+
+    Each key is one small JSON file replaced atomically, and locks are file
+    locks, so gunicorn workers see the same values. Pointing the directory
+    at a tmpfs such as /dev/shm keeps everything in shared memory. Files of
+    expired keys are deleted by a sweep at most every sweep_interval seconds.
+    """
+
+    def __init__(self, directory, sweep_interval=SWEEP_INTERVAL):
+        self.directory = directory
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, suffix='.json'):
+        name = quote(key, safe='')
+        if len(name) > MAX_FILE_NAME:
+            name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name + suffix)
+
+    def _read(self, key):
+        """Get a key's stored record, or None."""
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable state file for {key}: {str(e)}")
+            return None
+
+    def _write(self, key, record):
+        """Replace a key's record atomically with owner-only permissions."""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(record, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def get(self, key):
+        record = self._read(key)
+        if record is None:
+            return None
+        if record.get('expires_at') is not None and record['expires_at'] <= time.time():
+            return None
+        return record.get('value')
+
+    def set(self, key, value, ttl=None):
+        self._write(key, {'value': value, 'expires_at': time.time() + ttl if ttl else None})
+        if ttl and time.monotonic() >= self._next_sweep:
+            self._next_sweep = time.monotonic() + self.sweep_interval
+            self.sweep()
+
+    def sweep(self):
+        """
+        Delete the files of expired keys.
+
+        Returns:
+            int: Number of files deleted
+        """
+        removed = 0
+        now = time.time()
+        try:
+            names = os.listdir(self.directory)
+        except OSError as e:
+            logger.warning(f"Could not list the state directory: {str(e)}")
+            return 0
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                inode = os.stat(path).st_ino
+                with open(path) as f:
+                    expires_at = json.load(f).get('expires_at')
+                # Skip files another process replaced since they were read
+                if expires_at is not None and expires_at <= now and os.stat(path).st_ino == inode:
+                    os.remove(path)
+                    removed += 1
+            except (OSError, ValueError, AttributeError):
+                continue
+        if removed:
+            logger.debug(f"Removed {removed} expired state files")
+        return removed
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def incr(self, key):
+        with self.lock(f"{key}.incr"):
+            value = (self.get(key) or 0) + 1
+            self.set(key, value)
+        return value
+
+    def append(self, key, item, max_len):
+        with self.lock(f"{key}.append"):
+            items = self.get(key) or []
+            items.append(item)
+            self.set(key, items[-max_len:])
+
+    def items(self, key):
+        return self.get(key) or []
+
+    @contextmanager
+    def lock(self, name):
+        # Every open() is a separate lock owner, so this also excludes threads of one process
+        with open(self._path(name, '.lock'), 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+class RedisError(Exception):
+    """Raised for error replies and protocol problems talking to Redis."""
+
+# Commands that can be resent after a dropped connection (SET only without NX)
+IDEMPOTENT_COMMANDS = {'GET', 'SET', 'DEL', 'LTRIM', 'LRANGE', 'PING', 'AUTH', 'SELECT', 'UNWATCH'}
+
+class RedisState:
+    """
+    State shared by every process and host through a Redis server.
+
+    Speaks the Redis protocol (RESP) directly over one socket per thread, using
+    only GET/SET/DEL/INCR/RPUSH/LTRIM/LRANGE and WATCH/MULTI/EXEC, so it also
+    works against fake_redis.py. Locks are SET NX keys with an expiry, so a
+    crashed holder cannot block the others for longer than lock_timeout, and
+    are released with a WATCHed transaction, so an expired lock taken over by
+    another holder is never deleted.
+
+    A batch whose connection drops is only resent after reconnecting if every
+    command in it is idempotent; Redis may have run the first attempt, and
+    running INCR, RPUSH or SET NX twice would change the result.
+    """
+
+    def __init__(self, url, prefix='', lock_timeout=30, socket_timeout=5):
+        """
+        Args:
+            url: redis://[:password@]host[:port][/db]
+            prefix: Prepended to every key
+            lock_timeout: Seconds after which an abandoned lock expires
+            socket_timeout: Seconds to wait for a reply
+        """
+        parts = urlsplit(url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 6379
+        self.password = parts.password
+        self.db = int(parts.path.strip('/') or 0)
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+        self.socket_timeout = socket_timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.socket_timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile('rb')
+        if self.password:
+            self._call_once(['AUTH', self.password])
+        if self.db:
+            self._call_once(['SELECT', self.db])
+
+    def _disconnect(self):
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    @staticmethod
+    def _encode(*commands):
+        """Encode commands as RESP arrays of bulk strings."""
+        out = []
+        for command in commands:
+            out.append(f"*{len(command)}\r\n".encode('ascii'))
+            for arg in command:
+                data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+                out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b''.join(out)
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("Redis closed the connection")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode('utf-8')
+        if kind == b'-':
+            raise RedisError(payload.decode('utf-8'))
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._local.reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(payload)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise RedisError(f"Unexpected reply {line!r}")
+
+    def _call_once(self, *commands):
+        self._local.sock.sendall(self._encode(*commands))
+        return [self._read_reply() for _ in commands]
+
+    @staticmethod
+    def _idempotent(command):
+        """Check whether running a command twice has the same effect as running it once."""
+        name = str(command[0]).upper()
+        if name == 'SET':
+            return not any(str(arg).upper() == 'NX' for arg in command[3:])
+        return name in IDEMPOTENT_COMMANDS
+
+    def _call(self, *commands):
+        """
+        Send commands in one round trip and return their replies.
+
+        A dropped connection is reopened; the commands are resent once if
+        they are all idempotent, otherwise the error is raised.
+        """
+        retry = all(self._idempotent(command) for command in commands)
+        for attempt in range(2):
+            if getattr(self._local, 'sock', None) is None:
+                self._connect()
+            try:
+                return self._call_once(*commands)
+            except (OSError, ConnectionError):
+                self._disconnect()
+                if attempt or not retry:
+                    raise
+
+    def _key(self, key):
+        return f"{self.prefix}{key}"
+
+    def get(self, key):
+        data = self._call(['GET', self._key(key)])[0]
+        return json.loads(data) if data is not None else None
+
+    def set(self, key, value, ttl=None):
+        command = ['SET', self._key(key), json.dumps(value, separators=(',', ':'))]
+        if ttl:
+            command += ['PX', max(1, int(ttl * 1000))]
+        self._call(command)
+
+    def delete(self, key):
+        self._call(['DEL', self._key(key)])
+
+    def incr(self, key):
+        return self._call(['INCR', self._key(key)])[0]
+
+    def append(self, key, item, max_len):
+        key = self._key(key)
+        self._call(['RPUSH', key, json.dumps(item, separators=(',', ':'))], ['LTRIM', key, -max_len, -1])
+
+    def items(self, key):
+        return [json.loads(data) for data in self._call(['LRANGE', self._key(key), 0, -1])[0] or []]
+
+    @contextmanager
+    def lock(self, name):
+        key = self._key(f"lock:{name}")
+        token = uuid.uuid4().hex
+        while self._call(['SET', key, token, 'NX', 'PX', int(self.lock_timeout * 1000)])[0] is None:
+            time.sleep(0.05)
+        try:
+            yield
+        finally:
+            self._release(key, token)
+
+    def _release(self, key, token):
+        """Delete a lock key if it still holds token; EXEC does nothing if the key changed after WATCH."""
+        # WATCH and MULTI are never resent, so a dropped connection cannot turn this into a plain DEL
+        if self._call(['WATCH', key], ['GET', key])[1] == token.encode('ascii'):
+            self._call(['MULTI'], ['DEL', key], ['EXEC'])
+        else:
+            self._call(['UNWATCH'])
+
+def create_state(backend=None):
+    """
+    Create the configured shared state backend.
+
+    Args:
+        backend: 'memory', 'file' or 'redis' (defaults to config.SHARED_STATE_BACKEND)
+    """
+    backend = (backend or config.SHARED_STATE_BACKEND).lower()
+    if backend == 'memory':
+        return MemoryState()
+    if backend == 'redis':
+        return RedisState(config.REDIS_URL, prefix=config.REDIS_KEY_PREFIX)
+    if backend != 'file':
+        logger.warning(f"Unknown SHARED_STATE_BACKEND {backend!r}; using 'file'")
+    return FileState(config.SHARED_STATE_DIR)
+
+# Create a singleton instance
+state = create_state()
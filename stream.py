@@ -0,0 +1,241 @@
+# /stream.py
+import asyncio
+import json
+import queue
+from collections import deque
+import threading
+import time
+
+import config
+from logger import get_logger
+from positions import positions
+from tastytrade_client import client
+from utils import format_account_data, format_positions_data, format_quote_data
+
+logger = get_logger(__name__)
+
+# Sentinel queued for a subscriber that fell behind and needs a full snapshot
+RESYNC = object()
+
+class AsyncSubscriber:
+    """
+    Subscriber queue fed from the poller thread and read by an asyncio task.
+
+    It has the same put_nowait/get_nowait interface (and queue.Full/queue.Empty
+    errors) as the queue.Queue used by threaded streams, so the broadcaster
+    treats both alike; waking the reader is handed to its event loop.
+    """
+
+    def __init__(self, loop, maxsize):
+        self._loop = loop
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+        self._messages = deque()
+        self._ready = asyncio.Event()
+
+    def put_nowait(self, message):
+        with self._lock:
+            if len(self._messages) >= self._maxsize:
+                raise queue.Full
+            self._messages.append(message)
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            pass  # The loop has closed; the stream is gone
+
+    def get_nowait(self):
+        with self._lock:
+            if not self._messages:
+                raise queue.Empty
+            return self._messages.popleft()
+
+    async def get(self, timeout):
+        """Wait up to timeout seconds for a message (raises asyncio.TimeoutError)."""
+        while True:
+            try:
+                return self.get_nowait()
+            except queue.Empty:
+                pass
+            self._ready.clear()
+            # A message queued before the clear would not set the event again
+            with self._lock:
+                if self._messages:
+                    continue
+            await asyncio.wait_for(self._ready.wait(), timeout)
+
+def _without_timestamp(data):
+    """Strip the fetch timestamp so unchanged values compare equal between polls."""
+    if data is None:
+        return None
+    return {k: v for k, v in data.items() if k != 'timestamp'}
+
+class StreamBroadcaster:
+    """
+    Fan-out of dashboard updates to Server-Sent Events clients.
+
+    The poller publishes each snapshot once; only the sections that changed
+    (quote, balance, positions, new API-call entries) are serialized once and queued to
+    every connected client.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._event_id = 0
+        self._raw = {}  # section -> last published raw values (without timestamp)
+        self._sections = {}  # section -> last published formatted data
+        self._last_api_call_seq = 0
+
+    def publish_snapshot(self, snapshot):
+        """Poller listener: push the parts of a snapshot that changed."""
+        changes = {}
+        if snapshot.get('mstu') is not None:
+            self._collect_change(changes, 'mstu', snapshot['mstu'], format_quote_data)
+        if snapshot.get('account') is not None:
+            self._collect_change(changes, 'account', snapshot['account'], format_account_data)
+        if config.POSITIONS_ENABLED:
+            self._collect_change(changes, 'positions', positions.get(), format_positions_data)
+
+        new_calls = self._new_api_calls()
+        if new_calls:
+            changes['api_calls_new'] = new_calls
+
+        if changes:
+            self.publish('update', changes)
+
+    def _collect_change(self, changes, section, raw, formatter):
+        """Add a formatted section to changes if its values differ from the last push."""
+        stripped = _without_timestamp(raw)
+        if self._raw.get(section) != stripped:
+            self._raw[section] = stripped
+            self._sections[section] = changes[section] = formatter(raw)
+
+    def _new_api_calls(self):
+        """Get API-call history entries recorded since the last publish (newest first)."""
+        new_calls = client.get_api_calls_history(since=self._last_api_call_seq)
+        if new_calls:
+            self._last_api_call_seq = new_calls[0]['seq']
+        return new_calls
+
+    def publish(self, event, data):
+        """Serialize an event once and queue it for every subscriber."""
+        with self._lock:
+            self._event_id += 1
+            message = self._format_event(event, data, self._event_id)
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # Slow client: drop its backlog and send it a fresh snapshot instead
+                self._drain(subscriber)
+                subscriber.put_nowait(RESYNC)
+
+    def get_full_state(self):
+        """Get the full dashboard state sent to a client when it (re)connects."""
+        return {
+            'account': self._sections.get('account'),
+            'mstu': self._sections.get('mstu'),
+            'positions': self._sections.get('positions'),
+            'api_calls': client.get_api_calls_history()
+        }
+
+    def get_subscriber_count(self):
+        """Get the number of connected stream clients."""
+        with self._lock:
+            return len(self._subscribers)
+
+    def stream(self):
+        """
+        Generate the SSE byte stream for one client.
+
+        The stream starts with a full snapshot, then sends updates and periodic
+        heartbeats. It ends after config.STREAM_MAX_DURATION seconds so the
+        browser reconnects and server threads get recycled.
+        """
+        subscriber = queue.Queue(maxsize=config.STREAM_QUEUE_SIZE)
+        self._subscribe(subscriber)
+
+        try:
+            yield f"retry: {config.STREAM_RETRY_MS}\n\n"
+            yield self._format_event('snapshot', self.get_full_state())
+
+            deadline = time.monotonic() + config.STREAM_MAX_DURATION
+            while time.monotonic() < deadline:
+                try:
+                    message = subscriber.get(timeout=config.STREAM_HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    yield self._format_event('heartbeat', {'time': time.time()})
+                    continue
+
+                if message is RESYNC:
+                    yield self._format_event('snapshot', self.get_full_state())
+                else:
+                    yield message
+        finally:
+            self._unsubscribe(subscriber)
+
+    async def astream(self):
+        """
+        Generate the SSE stream for one client on an asyncio event loop.
+
+        Same events as stream(), but waiting for updates does not hold a
+        thread, so one process can serve many more open streams.
+        """
+        subscriber = AsyncSubscriber(asyncio.get_running_loop(), config.STREAM_QUEUE_SIZE)
+        self._subscribe(subscriber)
+
+        try:
+            yield f"retry: {config.STREAM_RETRY_MS}\n\n"
+            yield self._format_event('snapshot', self.get_full_state())
+
+            deadline = time.monotonic() + config.STREAM_MAX_DURATION
+            while time.monotonic() < deadline:
+                try:
+                    message = await subscriber.get(config.STREAM_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield self._format_event('heartbeat', {'time': time.time()})
+                    continue
+
+                if message is RESYNC:
+                    yield self._format_event('snapshot', self.get_full_state())
+                else:
+                    yield message
+        finally:
+            self._unsubscribe(subscriber)
+
+    def _subscribe(self, subscriber):
+        """Start queueing events for a subscriber."""
+        with self._lock:
+            self._subscribers.add(subscriber)
+            count = len(self._subscribers)
+        logger.info("Stream client connected (%d connected)", count)
+
+    def _unsubscribe(self, subscriber):
+        """Stop queueing events for a subscriber."""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+        logger.info("Stream client disconnected")
+
+    @staticmethod
+    def _drain(subscriber):
+        """Remove every queued message for a subscriber."""
+        try:
+            while True:
+                subscriber.get_nowait()
+        except queue.Empty:
+            pass
+
+    @staticmethod
+    def _format_event(event, data, event_id=None):
+        """Format one SSE event."""
+        lines = []
+        if event_id is not None:
+            lines.append(f"id: {event_id}")
+        lines.append(f"event: {event}")
+        lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+        return "\n".join(lines) + "\n\n"
+
+# Create a singleton instance
+broadcaster = StreamBroadcaster()
@@ -1,29 +1,95 @@
 # /tastytrade_client.py
+import asyncio
 import time
-import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
-import pytz
-
-from tastytrade_sdk import Tastytrade
-from tastytrade_sdk.exceptions import TastytradeSdkException
 
 import config
+from cache import BoundedDict, TTLCache
+from circuit_breaker import CircuitBreaker
+from call_history import ApiCallHistory
 from logger import get_logger
+from metrics import metrics, instrumented
+from order_engine import OrderPacer, build_order_payload, describe_order, validate_order
+from quote_book import QuoteBook
+from rate_limiter import rate_limiter
+from session_store import SessionStore
+from shared_state import MemoryState, state
+from transport import ENDPOINT_CLASS_NAMES, BrokerApiError, BrokerTransport
 
 logger = get_logger(__name__)
 
+# Broker statuses meaning a submitted order was not accepted
+ORDER_REJECTED_STATUSES = ('Rejected', 'Cancelled', 'Expired')
+
+# Descriptions used when the instrument response does not include one
+DEFAULT_DESCRIPTIONS = {
+    'MSTU': 'Microstrategy Inc'
+}
+
+def _field(item, name):
+    """Get a field from an API item by its kebab-case name, accepting snake_case too."""
+    value = item.get(name)
+    return value if value is not None else item.get(name.replace('-', '_'))
+
 class TastetradeClient:
     """Client for interacting with the Tastytrade API."""
     
     def __init__(self):
-        self.tasty = None
+        # One circuit breaker per endpoint class, so a failing quotes endpoint does not block orders
+        self.circuit_breakers = {
+            name: CircuitBreaker(name, config.CIRCUIT_FAILURE_THRESHOLD, config.CIRCUIT_RESET_TIMEOUT,
+                                 on_transition=self._on_circuit_transition)
+            for name in ENDPOINT_CLASS_NAMES
+        }
+        # Pooled HTTP transport, kept across re-authentication
+        self.api = BrokerTransport(rate_limiter=rate_limiter, circuit_breakers=self.circuit_breakers)
+        self.api.on_unauthorized = self.handle_unauthorized
+        # Asyncio transport sharing self.api's session and limits; set up by asgi.py when serving ASGI
+        self.aapi = None
         self.authenticated = False
         self.last_auth_time = None
-        self.api_calls = []  # Track recent API calls
-        self.MAX_API_CALLS_HISTORY = 50  # Maximum number of API calls to store in history
+        self.session_token = None
+        self.session_expires_at = 0
+        self.session_refresher = None
+        # Session shared by all workers and restarts using the same login and API
+        # (a replay gets its own, so its placeholder token is never used against the real API)
+        self.session_store = SessionStore(state, f"{config.TASTYTRADE_LOGIN}@" + (
+            f"replay:{config.REPLAY_FILE}" if config.REPLAY_FILE else config.API_BASE_URL))
+        # Track recent API calls, published to the other workers unless the state is process-local
+        self.api_calls = ApiCallHistory(config.API_CALLS_HISTORY_SIZE,
+                                        None if isinstance(state, MemoryState) else state,
+                                        config.API_CALLS_PUBLISH_INTERVAL)
+        # Shared across requests and tabs, and across workers unless the state is process-local anyway
+        self.cache = TTLCache(stale_ttl=config.CACHE_STALE_TTL,
+                              shared=None if isinstance(state, MemoryState) else state,
+                              max_entries=config.CACHE_MAX_ENTRIES)
+        self.quote_book = QuoteBook()  # Fed by the quote streamer when it is running
+        # Instrument descriptions seen so far
+        self.descriptions = BoundedDict(config.CACHE_MAX_ENTRIES, DEFAULT_DESCRIPTIONS)
+        # Latest successful result per key, served when the broker fails
+        self.last_known_good = BoundedDict(config.CACHE_MAX_ENTRIES)
+        self.quote_token = None
+        self.quote_token_expires = 0
+        self.order_pacer = OrderPacer(config.ORDER_SUBMIT_RATE)  # Spaces order submissions
+        self.executor = ThreadPoolExecutor(max_workers=config.FETCH_MAX_WORKERS,
+                                           thread_name_prefix='broker-fetch')
+        metrics.register_collector(self._collect_metrics)
+        
+    @instrumented('authenticate', failed=lambda result: not result)
+    def authenticate(self, force=False):
+        """
+        Authenticate with the Tastytrade API.
+        
+        A valid session persisted by another worker (or a previous run) is reused
+        instead of logging in. Logins are serialized across processes with a file
+        lock, so N workers starting together perform a single login.
         
-    def authenticate(self):
-        """Authenticate with the Tastytrade API."""
+        Args:
+            force: Ignore the current session token and obtain a newer one. A
+                   session stored by another worker since then is still reused.
+        """
         # Check if in development mode
         if config.DEV_MODE:
             logger.info("Running in DEV_MODE - skipping actual authentication")
@@ -39,27 +105,37 @@ class TastetradeClient:
             return False
             
         try:
-            # Make sure there's no trailing slash that could cause URL issues
-            api_base_url = config.API_BASE_URL.rstrip('/')
-            logger.info(f"Authenticating with Tastytrade API using base URL: {api_base_url}")
-            
-            # Initialize the Tastytrade client with the clean URL
-            self.tasty = Tastytrade(api_base_url=api_base_url)
-            
-            # Attempt to login
-            try:
-                self.tasty.login(config.TASTYTRADE_LOGIN, config.TASTYTRADE_PASSWORD)
-                self.authenticated = True
-                self.last_auth_time = datetime.now()
-                self._track_api_call("Authentication", "SUCCESS")
-                logger.info("Authentication successful")
-                return True
-            except Exception as login_error:
-                error_msg = f"Login failed: {str(login_error)}"
-                self._track_api_call("Authentication", f"FAILED: {error_msg}")
-                logger.error(error_msg)
-                self.authenticated = False
-                return False
+            with self.session_store.lock():
+                # Another worker may already hold a session we can use
+                stale_token = self.session_token if force else None
+                stored = None
+                if config.SESSION_PERSIST:
+                    stored = self.session_store.load(min_remaining=config.SESSION_REFRESH_MARGIN)
+                if stored is not None and stored['session_token'] != stale_token:
+                    self._use_session(stored['session_token'], stored['expires_at'])
+                    self._track_api_call("Authentication", "SUCCESS (Reused stored session)")
+                    logger.info("Reusing stored Tastytrade session")
+                    return True
+                
+                logger.info(f"Authenticating with Tastytrade API using base URL: {self.api.base_url}")
+                
+                # Attempt to login (the transport keeps its warm connections across logins)
+                started = time.perf_counter()
+                try:
+                    session = self.api.login(config.TASTYTRADE_LOGIN, config.TASTYTRADE_PASSWORD)
+                    expires_at = self._parse_session_expiration(session.get('session-expiration'))
+                    self._use_session(session['session-token'], expires_at)
+                    if config.SESSION_PERSIST:
+                        self.session_store.save(session['session-token'], expires_at)
+                    self._track_api_call("Authentication", "SUCCESS", latency_ms=self._elapsed_ms(started))
+                    logger.info("Authentication successful")
+                    return True
+                except Exception as login_error:
+                    error_msg = f"Login failed: {str(login_error)}"
+                    self._track_api_call("Authentication", f"FAILED: {error_msg}", latency_ms=self._elapsed_ms(started))
+                    logger.error(error_msg)
+                    self.authenticated = False
+                    return False
                 
         except Exception as e:
             self.authenticated = False
@@ -68,38 +144,109 @@ class TastetradeClient:
             logger.error(error_msg)
             return False
     
+    def _use_session(self, session_token, expires_at):
+        """Switch the transport to a session and schedule its proactive refresh."""
+        self.api.set_session_token(session_token)
+        self.session_token = session_token
+        self.session_expires_at = expires_at
+        self.authenticated = True
+        self.last_auth_time = datetime.now()
+        self._start_session_refresher()
+    
+    @staticmethod
+    def _parse_session_expiration(value):
+        """Convert the API's session-expiration to epoch seconds (falls back to SESSION_TTL)."""
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except (TypeError, ValueError):
+            return time.time() + config.SESSION_TTL
+    
+    def _start_session_refresher(self):
+        """Start the background thread that refreshes the session before it expires."""
+        if self.session_refresher is not None and self.session_refresher.is_alive():
+            return
+        self.session_refresher = threading.Thread(target=self._refresh_session_loop,
+                                                  name='session-refresher', daemon=True)
+        self.session_refresher.start()
+    
+    def _refresh_session_loop(self):
+        """Sleep until shortly before the session expires, then refresh it."""
+        while self.authenticated:
+            remaining = self.session_expires_at - time.time() - config.SESSION_REFRESH_MARGIN
+            if remaining > 0:
+                time.sleep(min(remaining, 60))
+                continue
+            logger.info("Session expiring soon, refreshing proactively")
+            if not self.authenticate(force=True):
+                # Try again shortly rather than waiting for the next expiry window
+                time.sleep(30)
+    
+    def handle_unauthorized(self, rejected_token):
+        """
+        Recover from a 401 by switching to a newer session.
+        
+        Returns:
+            bool: True if a different, valid session is now in use
+        """
+        if self.session_token != rejected_token:
+            return True  # Another thread already switched sessions
+        logger.warning("Session rejected by the API, re-authenticating")
+        if config.SESSION_PERSIST:
+            self.session_store.clear(rejected_token)
+        return self.authenticate(force=True)
+    
+    def logout(self):
+        """End the broker session."""
+        self.api.logout()
+        self.authenticated = False
+        if config.SESSION_PERSIST:
+            self.session_store.clear(self.session_token)
+        self.session_token = None
+    
     def ensure_authenticated(self):
         """Ensure the client is authenticated, re-authenticate if necessary."""
-        if not self.authenticated or not self.tasty:
+        if not self.authenticated:
             return self.authenticate()
         
-        # Re-authenticate every 6 hours to be safe
-        if self.last_auth_time and (datetime.now() - self.last_auth_time).total_seconds() > 21600:
+        # Refresh if the background refresher has not done so in time
+        if time.time() > self.session_expires_at - config.SESSION_REFRESH_MARGIN:
             logger.info("Session may be expired, re-authenticating")
-            return self.authenticate()
+            return self.authenticate(force=True)
         
         return True
     
-    def get_account_balance(self):
-        """Get the account balance."""
-        if not self.authenticated or not self.tasty:
+    @instrumented('get_account_balance', failed=lambda result: result is None or result.get('stale'))
+    def get_account_balance(self, account_number=None):
+        """
+        Get the account balance.
+        
+        If the broker cannot be reached, the last balance retrieved is returned
+        instead, marked with 'stale': True.
+        
+        Args:
+            account_number: Account to query (defaults to config.ACCOUNT_NUMBER)
+        """
+        if not self.authenticated:
             logger.warning("Not authenticated, returning empty account balance")
             return None
         
+        account_number = account_number or config.ACCOUNT_NUMBER
+        fallback_key = f'account_balance:{account_number}'
         try:
-            logger.info(f"Fetching account balance for account {config.ACCOUNT_NUMBER}")
-            response = self.tasty.api.get(f'/accounts/{config.ACCOUNT_NUMBER}/balances')
+            started = time.perf_counter()
+            logger.debug("Fetching account balance for account %s", account_number)
+            response = self.api.get(f'/accounts/{account_number}/balances')
             
             if not response or 'data' not in response:
-                self._track_api_call("Get Account Balance", "FAILED: No data in response")
+                self._track_api_call("Get Account Balance", "FAILED: No data in response", latency_ms=self._elapsed_ms(started))
                 logger.error("Failed to get account balance: No data in response")
-                return None
+                return self._get_last_known_good(fallback_key)
             
-            # Extract the cash balance
+            # Extract the cash balance (the API reports equity as net liquidating value)
             balances = response['data']
-            cash_balance = balances.get('cash_balance', 0)
-            total_equity = balances.get('equity', 0)
-            buying_power = balances.get('buying_power', 0)
+            cash_balance = float(_field(balances, 'cash-balance') or 0)
+            total_equity = float(_field(balances, 'net-liquidating-value') or _field(balances, 'equity') or 0)
+            buying_power = float(_field(balances, 'equity-buying-power') or _field(balances, 'buying-power') or 0)
             
             result = {
                 'cash_balance': cash_balance,
@@ -108,78 +255,276 @@ class TastetradeClient:
                 'timestamp': datetime.now().isoformat()
             }
             
-            self._track_api_call("Get Account Balance", "SUCCESS")
-            logger.info(f"Account balance retrieved successfully: {json.dumps(result)}")
+            self._track_api_call("Get Account Balance", "SUCCESS", latency_ms=self._elapsed_ms(started))
+            logger.debug("Account balance retrieved successfully: %s", result)
+            self.last_known_good[fallback_key] = result
             return result
         except Exception as e:
-            self._track_api_call("Get Account Balance", f"FAILED: {str(e)}")
+            self._track_api_call("Get Account Balance", f"FAILED: {str(e)}", latency_ms=self._elapsed_ms(started))
             logger.error(f"Failed to get account balance: {str(e)}")
-            return None
+            return self._get_last_known_good(fallback_key)
     
-    def get_mstu_price(self):
-        """Get the current MSTU price."""
-        if not self.authenticated or not self.tasty:
-            logger.warning("Not authenticated, returning empty MSTU price")
-            return None
+    @instrumented('get_quotes', failed=lambda result: not result)
+    def get_quotes(self, symbols):
+        """
+        Get quotes for several equity symbols using batched requests.
+        
+        All symbols go into a single /instruments/equities request (chunked by
+        config.QUOTE_BATCH_SIZE); symbols whose instrument carries no quotes are
+        looked up with one batched /quotes/equities request.
+        
+        Args:
+            symbols: Iterable of equity symbols
+        
+        Returns:
+            dict: Quote per symbol; symbols that could not be priced are omitted
+        """
+        if not self.authenticated:
+            logger.warning("Not authenticated, returning empty quotes")
+            return {}
         
+        # Normalize and de-duplicate while keeping the caller's order
+        symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+        if not symbols:
+            return {}
+        
+        results, symbols = self._split_streamed_quotes(symbols)
+        for start in range(0, len(symbols), config.QUOTE_BATCH_SIZE):
+            batch = symbols[start:start + config.QUOTE_BATCH_SIZE]
+            results.update(self._get_quotes_batch(batch))
+        
+        self._fill_from_last_known_good(symbols, results)
+        return results
+    
+    async def aget_quotes(self, symbols):
+        """
+        Asyncio variant of get_quotes for the ASGI server (batches are fetched concurrently).
+        
+        Requires self.aapi, which asgi.py sets up.
+        """
+        if not self.authenticated:
+            logger.warning("Not authenticated, returning empty quotes")
+            return {}
+        
+        symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+        if not symbols:
+            return {}
+        
+        results, symbols = self._split_streamed_quotes(symbols)
+        batches = await asyncio.gather(*(
+            self._aget_quotes_batch(symbols[start:start + config.QUOTE_BATCH_SIZE])
+            for start in range(0, len(symbols), config.QUOTE_BATCH_SIZE)
+        ))
+        for batch in batches:
+            results.update(batch)
+        
+        self._fill_from_last_known_good(symbols, results)
+        return results
+    
+    def _split_streamed_quotes(self, symbols):
+        """
+        Serve what we can from the streaming quote book; only the rest goes over REST.
+        
+        Returns:
+            tuple: (quotes from the book, symbols still to fetch)
+        """
+        results = {}
+        for symbol in symbols:
+            quote = self.quote_book.get(symbol, self.descriptions.get(symbol))
+            if quote is not None:
+                results[symbol] = quote
+        return results, [symbol for symbol in symbols if symbol not in results]
+    
+    def _fill_from_last_known_good(self, symbols, results):
+        """Remember fetched quotes; symbols the broker could not price right now keep their last known quote."""
+        for symbol in symbols:
+            if symbol in results:
+                self.last_known_good[f'quote:{symbol}'] = results[symbol]
+            else:
+                stale_quote = self._get_last_known_good(f'quote:{symbol}')
+                if stale_quote is not None:
+                    results[symbol] = stale_quote
+    
+    def _get_quotes_batch(self, symbols):
+        """Fetch quotes for one batch of symbols."""
         try:
-            logger.info("Fetching MSTU price")
-            response = self.tasty.api.get(
+            started = time.perf_counter()
+            logger.debug("Fetching quotes for %d symbols: %s", len(symbols), symbols)
+            response = self.api.get(
                 '/instruments/equities',
-                params=[('symbol[]', 'MSTU')]
+                params=[('symbol[]', symbol) for symbol in symbols]
             )
             
-            if not response or 'data' not in response or 'items' not in response['data']:
-                self._track_api_call("Get MSTU Price", "FAILED: No data in response")
-                logger.error("Failed to get MSTU price: No data in response")
-                return None
+            instruments = self._parse_instruments(response, started)
+            if instruments is None:
+                return {}
             
-            items = response['data']['items']
-            if not items:
-                self._track_api_call("Get MSTU Price", "FAILED: MSTU symbol not found")
-                logger.error("Failed to get MSTU price: Symbol not found")
-                return None
-                
-            # Get the first item (should be MSTU)
-            mstu_data = items[0]
+            # Symbols whose instrument has no quotes need a separate, batched quote lookup
+            missing_quotes = [s for s in symbols if s in instruments and 'quotes' not in instruments[s]]
+            fallback_quotes = self._get_equity_quotes(missing_quotes) if missing_quotes else {}
+            return self._collect_quotes(symbols, instruments, fallback_quotes, started)
+        except Exception as e:
+            self._track_api_call("Get Quotes", f"FAILED: {str(e)}", latency_ms=self._elapsed_ms(started))
+            logger.error(f"Failed to get quotes: {str(e)}")
+            return {}
+    
+    async def _aget_quotes_batch(self, symbols):
+        """Fetch quotes for one batch of symbols without blocking the event loop."""
+        try:
+            started = time.perf_counter()
+            logger.debug("Fetching quotes for %d symbols: %s", len(symbols), symbols)
+            response = await self.aapi.get(
+                '/instruments/equities',
+                params=[('symbol[]', symbol) for symbol in symbols]
+            )
             
-            # Check if we have quotes
-            if 'quotes' not in mstu_data:
-                # If no quotes, we need to get quotes separately
-                try:
-                    quotes_response = self.tasty.api.get(f"/quotes/equities/MSTU")
-                    if quotes_response and 'data' in quotes_response:
-                        quotes = quotes_response['data']
-                    else:
-                        self._track_api_call("Get MSTU Quote", "FAILED: No quote data")
-                        logger.error("Failed to get MSTU quote data")
-                        return None
-                except Exception as e:
-                    self._track_api_call("Get MSTU Quote", f"FAILED: {str(e)}")
-                    logger.error(f"Error fetching MSTU quote: {str(e)}")
-                    return None
-            else:
-                quotes = mstu_data['quotes']
+            instruments = self._parse_instruments(response, started)
+            if instruments is None:
+                return {}
             
-            result = {
-                'symbol': 'MSTU',
-                'description': mstu_data.get('description', 'Microstrategy Inc'),
-                'last_price': quotes.get('last', 0),
-                'bid_price': quotes.get('bid', 0),
-                'ask_price': quotes.get('ask', 0),
-                'change': quotes.get('change', 0),
-                'percent_change': quotes.get('change-percent', 0),
-                'timestamp': datetime.now().isoformat()
-            }
+            missing_quotes = [s for s in symbols if s in instruments and 'quotes' not in instruments[s]]
+            fallback_quotes = await self._aget_equity_quotes(missing_quotes) if missing_quotes else {}
+            return self._collect_quotes(symbols, instruments, fallback_quotes, started)
+        except Exception as e:
+            self._track_api_call("Get Quotes", f"FAILED: {str(e)}", latency_ms=self._elapsed_ms(started))
+            logger.error(f"Failed to get quotes: {str(e)}")
+            return {}
+    
+    def _parse_instruments(self, response, started):
+        """Get the instruments of an /instruments/equities response by symbol (None if it has no data)."""
+        if not response or 'data' not in response or 'items' not in response['data']:
+            self._track_api_call("Get Quotes", "FAILED: No data in response", latency_ms=self._elapsed_ms(started))
+            logger.error("Failed to get quotes: No data in response")
+            return None
+        return {item.get('symbol', '').upper(): item for item in response['data']['items']}
+    
+    def _collect_quotes(self, symbols, instruments, fallback_quotes, started):
+        """Build the quotes of a batch from its instruments and fallback quote data."""
+        results = {}
+        for symbol in symbols:
+            instrument = instruments.get(symbol)
+            if instrument is None:
+                continue
+            quotes = instrument.get('quotes') or fallback_quotes.get(symbol)
+            if quotes is None:
+                continue
+            results[symbol] = self._build_quote(symbol, instrument, quotes)
+        
+        not_found = [s for s in symbols if s not in results]
+        if not_found:
+            self._track_api_call("Get Quotes", f"PARTIAL: No quotes for {','.join(not_found)}", latency_ms=self._elapsed_ms(started))
+            logger.warning(f"No quotes returned for: {','.join(not_found)}")
+        else:
+            self._track_api_call("Get Quotes", "SUCCESS", latency_ms=self._elapsed_ms(started))
+        logger.debug("Quotes retrieved for %d of %d symbols", len(results), len(symbols))
+        return results
+    
+    def _get_equity_quotes(self, symbols):
+        """Fetch raw quote data for symbols whose instrument response had none."""
+        started = time.perf_counter()
+        try:
+            quotes_response = self.api.get(
+                '/quotes/equities',
+                params=[('symbol[]', symbol) for symbol in symbols]
+            )
+            return self._parse_equity_quotes(quotes_response, started)
+        except Exception as e:
+            self._track_api_call("Get Equity Quotes", f"FAILED: {str(e)}", latency_ms=self._elapsed_ms(started))
+            logger.error(f"Error fetching equity quotes: {str(e)}")
+            return {}
+    
+    async def _aget_equity_quotes(self, symbols):
+        """Asyncio variant of _get_equity_quotes."""
+        started = time.perf_counter()
+        try:
+            quotes_response = await self.aapi.get(
+                '/quotes/equities',
+                params=[('symbol[]', symbol) for symbol in symbols]
+            )
+            return self._parse_equity_quotes(quotes_response, started)
+        except Exception as e:
+            self._track_api_call("Get Equity Quotes", f"FAILED: {str(e)}", latency_ms=self._elapsed_ms(started))
+            logger.error(f"Error fetching equity quotes: {str(e)}")
+            return {}
+    
+    def _parse_equity_quotes(self, quotes_response, started):
+        """Get the raw quote data of a /quotes/equities response by symbol."""
+        if not quotes_response or 'data' not in quotes_response:
+            self._track_api_call("Get Equity Quotes", "FAILED: No quote data", latency_ms=self._elapsed_ms(started))
+            logger.error("Failed to get equity quote data")
+            return {}
+        
+        data = quotes_response['data']
+        # Batched responses come back as a list of items; a single quote as one object
+        items = data.get('items', [data]) if isinstance(data, dict) else data
+        return {item.get('symbol', '').upper(): item for item in items if item}
+    
+    def _build_quote(self, symbol, instrument, quotes):
+        """Build the quote dict returned to callers from raw instrument/quote data."""
+        if instrument.get('description'):
+            self.descriptions[symbol] = instrument['description']
+        return {
+            'symbol': symbol,
+            'description': self.descriptions.get(symbol, symbol),
+            'last_price': quotes.get('last', 0),
+            'bid_price': quotes.get('bid', 0),
+            'ask_price': quotes.get('ask', 0),
+            'change': quotes.get('change', 0),
+            'percent_change': quotes.get('change-percent', 0),
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    @instrumented('get_quote_token')
+    def get_quote_token(self):
+        """
+        Get a streaming market data token using the authenticated session.
+        
+        Returns:
+            tuple: (token, dxlink_url), or None if not authenticated or the request failed
+        """
+        if not self.authenticated:
+            return None
+        
+        if self.quote_token and time.time() < self.quote_token_expires:
+            return self.quote_token
+        
+        started = time.perf_counter()
+        try:
+            response = self.api.get('/quote-streamer-tokens')
+            if not response or 'data' not in response:
+                self._track_api_call("Get Quote Token", "FAILED: No data in response", latency_ms=self._elapsed_ms(started))
+                logger.error("Failed to get quote streamer token: No data in response")
+                return None
             
-            self._track_api_call("Get MSTU Price", "SUCCESS")
-            logger.info(f"MSTU price retrieved successfully: {json.dumps(result)}")
-            return result
+            data = response['data']
+            url = config.STREAMER_URL or data.get('dxlink-url')
+            self.quote_token = (data.get('token'), url)
+            self.quote_token_expires = time.time() + config.STREAMER_TOKEN_TTL
+            self._track_api_call("Get Quote Token", "SUCCESS", latency_ms=self._elapsed_ms(started))
+            return self.quote_token
         except Exception as e:
-            self._track_api_call("Get MSTU Price", f"FAILED: {str(e)}")
-            logger.error(f"Failed to get MSTU price: {str(e)}")
+            self._track_api_call("Get Quote Token", f"FAILED: {str(e)}", latency_ms=self._elapsed_ms(started))
+            logger.error(f"Failed to get quote streamer token: {str(e)}")
             return None
     
+    @instrumented('get_mstu_price')
+    def get_mstu_price(self):
+        """Get the current MSTU price."""
+        if not self.authenticated:
+            logger.warning("Not authenticated, returning empty MSTU price")
+            return None
+        
+        started = time.perf_counter()
+        quote = self.get_quotes(['MSTU']).get('MSTU')
+        if quote is None:
+            self._track_api_call("Get MSTU Price", "FAILED: No MSTU quote", latency_ms=self._elapsed_ms(started))
+            logger.error("Failed to get MSTU price")
+            return None
+        
+        self._track_api_call("Get MSTU Price", "SUCCESS", latency_ms=self._elapsed_ms(started))
+        return quote
+    
+    @instrumented('buy_mstu', failed=lambda result: not result.get('success'))
     def buy_mstu(self, quantity, order_type='Limit', price=None, time_in_force='Day'):
         """
         Buy MSTU stock.
@@ -193,105 +538,368 @@ class TastetradeClient:
         Returns:
             dict: Information about the order status
         """
-        if not self.authenticated or not self.tasty:
-            message = "Not authenticated, cannot place orders"
+        order, errors = validate_order({
+            'symbol': 'MSTU',
+            'action': 'Buy',
+            'quantity': quantity,
+            'order_type': order_type,
+            'price': price,
+            'time_in_force': time_in_force
+        })
+        if errors:
+            message = '; '.join(errors)
             self._track_api_call("Buy MSTU", f"FAILED: {message}")
             logger.error(message)
             return {"success": False, "message": message}
+        return self.place_order(order, label="Buy MSTU")
+    
+    @instrumented('place_order', failed=lambda result: not result.get('success'))
+    def place_order(self, order, label="Place Order"):
+        """
+        Place an equity order (any symbols, buy or sell, one or more legs).
         
-        if order_type == 'Limit' and price is None:
-            message = "Limit orders require a price"
-            self._track_api_call("Buy MSTU", f"FAILED: {message}")
+        Submissions are paced to config.ORDER_SUBMIT_RATE per second, and an
+        order refused with HTTP 429 is re-sent after a backoff (the broker did
+        not accept it, so this cannot duplicate it).
+        
+        Args:
+            order: Order normalized by order_engine.validate_order
+            label: Name used in the API call history
+        
+        Returns:
+            dict: Information about the order status
+        """
+        if not self.authenticated:
+            message = "Not authenticated, cannot place orders"
+            self._track_api_call(label, f"FAILED: {message}")
             logger.error(message)
             return {"success": False, "message": message}
         
+        payload = build_order_payload(order)
+        description = describe_order(order)
+        for attempt in range(config.ORDER_RATE_LIMIT_RETRIES + 1):
+            self.order_pacer.wait()
+            result = self._submit_order(payload, description, label)
+            if result.get('error_code') != 429 or attempt == config.ORDER_RATE_LIMIT_RETRIES:
+                return result
+            backoff = config.HTTP_RETRY_BACKOFF * 2 ** attempt
+            logger.warning(f"Order rate limited, retrying in {backoff:.2f}s: {description}")
+            self.order_pacer.back_off(backoff)
+        return result
+    
+    def _submit_order(self, payload, description, label):
+        """Send one order payload to the broker."""
+        started = time.perf_counter()
         try:
-            # Prepare the order payload
-            order_payload = {
-                "account-id": config.ACCOUNT_NUMBER,
-                "source": "API",
-                "order-type": order_type,
-                "time-in-force": time_in_force,
-                "legs": [{
-                    "instrument-type": "Equity",
-                    "symbol": "MSTU",
-                    "quantity": quantity,
-                    "action": "Buy"
-                }]
-            }
-            
-            # Add price for limit orders
-            if order_type == 'Limit' and price is not None:
-                order_payload["price"] = price
-                
-            logger.info(f"Placing order to buy {quantity} shares of MSTU")
-            logger.debug(f"Order payload: {json.dumps(order_payload)}")
+            logger.info("Placing order: %s", description)
+            logger.debug("Order payload: %s", payload)
             
             # Place the order
-            response = self.tasty.api.post('/orders', data=order_payload)
+            response = self.api.post(f'/accounts/{config.ACCOUNT_NUMBER}/orders', data=payload)
             
             if not response or 'data' not in response:
                 message = "No data in order response"
-                self._track_api_call("Buy MSTU", f"FAILED: {message}")
-                logger.error(f"Failed to place MSTU order: {message}")
+                self._track_api_call(label, f"FAILED: {message}", latency_ms=self._elapsed_ms(started))
+                logger.error(f"Failed to place order: {message}")
                 return {"success": False, "message": message}
             
             order_data = response['data']
+            # The placed order is nested under 'order'; its status is usually 'Received'
+            order = order_data.get('order', {})
             
             # Check if order was accepted
-            if 'order' in order_data and order_data.get('status') == 'Received':
-                order_id = order_data.get('order-id')
+            if order.get('id') is not None and order.get('status') not in ORDER_REJECTED_STATUSES:
+                order_id = order['id']
                 message = f"Order successfully placed. Order ID: {order_id}"
-                self._track_api_call("Buy MSTU", f"SUCCESS: {message}")
+                self._track_api_call(label, f"SUCCESS: {message}", latency_ms=self._elapsed_ms(started))
                 logger.info(message)
                 
                 return {
                     "success": True,
                     "message": message,
                     "order_id": order_id,
-                    "status": order_data.get('status'),
+                    "status": order.get('status'),
                     "timestamp": datetime.now().isoformat()
                 }
             else:
                 error_code = order_data.get('error-code', 'Unknown error')
                 error_message = order_data.get('error-message', 'No details provided')
                 message = f"Order failed. Code: {error_code}, Message: {error_message}"
-                self._track_api_call("Buy MSTU", f"FAILED: {message}")
+                self._track_api_call(label, f"FAILED: {message}", latency_ms=self._elapsed_ms(started))
                 logger.error(message)
                 
                 return {
                     "success": False,
                     "message": message,
+                    "status": order.get('status'),
                     "error_code": error_code,
                     "error_message": error_message,
                     "timestamp": datetime.now().isoformat()
                 }
                 
         except Exception as e:
-            message = f"Exception while placing MSTU order: {str(e)}"
-            self._track_api_call("Buy MSTU", f"FAILED: {message}")
+            # A 4xx answer means the broker looked at the order and refused it
+            if not (isinstance(e, BrokerApiError) and 400 <= e.status_code < 500):
+                message = f"Exception while placing order: {str(e)}"
+                self._track_api_call(label, f"FAILED: {message}", latency_ms=self._elapsed_ms(started))
+                logger.error(message)
+                return {"success": False, "message": message}
+            
+            message = f"Order rejected: {str(e)}"
+            self._track_api_call(label, f"FAILED: {message}", latency_ms=self._elapsed_ms(started))
             logger.error(message)
-            return {"success": False, "message": message}
+            return {
+                "success": False,
+                "message": message,
+                # A rate-limited order was never looked at, so it is not rejected
+                "status": "Rejected" if e.status_code != 429 else None,
+                "error_code": e.status_code,
+                "error_message": str(e),
+                "timestamp": datetime.now().isoformat()
+            }
     
-    def get_api_calls_history(self):
-        """Get the history of recent API calls."""
-        return self.api_calls
+    @instrumented('get_order_status')
+    def get_order_status(self, order_id):
+        """
+        Get the broker's current status of a placed order.
+        
+        Args:
+            order_id: Order ID returned when the order was placed
+        
+        Returns:
+            str or None: Order status such as 'Received', 'Live', 'Filled' or 'Rejected'
+        """
+        if not self.authenticated:
+            return None
+        
+        started = time.perf_counter()
+        try:
+            response = self.api.get(f'/accounts/{config.ACCOUNT_NUMBER}/orders/{order_id}')
+            if not response or 'data' not in response:
+                self._track_api_call("Get Order Status", "FAILED: No data in response", latency_ms=self._elapsed_ms(started))
+                logger.error(f"Failed to get status of order {order_id}: No data in response")
+                return None
+            
+            status = response['data'].get('status')
+            self._track_api_call("Get Order Status", f"SUCCESS: {order_id} {status}", latency_ms=self._elapsed_ms(started))
+            return status
+        except Exception as e:
+            self._track_api_call("Get Order Status", f"FAILED: {str(e)}", latency_ms=self._elapsed_ms(started))
+            logger.error(f"Failed to get status of order {order_id}: {str(e)}")
+            return None
     
-    def _track_api_call(self, endpoint, status):
-        """Track an API call in the history."""
+    @instrumented('get_positions')
+    def get_positions(self, account_number=None):
+        """
+        Get an account's open positions.
+        
+        Args:
+            account_number: Account to query (defaults to config.ACCOUNT_NUMBER)
+        
+        Returns:
+            list or None: One dict per position with symbol, quantity (negative when
+            short), multiplier, average_open_price and close_price; None on failure
+        """
+        if not self.authenticated:
+            logger.warning("Not authenticated, returning no positions")
+            return None
+        
+        started = time.perf_counter()
         try:
-            eastern = pytz.timezone('US/Eastern')
-            timestamp = datetime.now(eastern).strftime("%Y-%m-%d %H:%M:%S %Z")
+            response = self.api.get(f'/accounts/{account_number or config.ACCOUNT_NUMBER}/positions')
+            if not response or 'data' not in response:
+                self._track_api_call("Get Positions", "FAILED: No data in response", latency_ms=self._elapsed_ms(started))
+                logger.error("Failed to get positions: No data in response")
+                return None
             
-            self.api_calls.insert(0, {
-                "endpoint": endpoint,
-                "status": status,
-                "timestamp": timestamp
-            })
+            positions = []
+            for item in response['data'].get('items', []):
+                quantity = float(_field(item, 'quantity') or 0)
+                if _field(item, 'quantity-direction') == 'Short':
+                    quantity = -quantity
+                positions.append({
+                    'symbol': item.get('symbol'),
+                    'instrument_type': _field(item, 'instrument-type'),
+                    'quantity': quantity,
+                    'multiplier': float(_field(item, 'multiplier') or 1),
+                    'average_open_price': float(_field(item, 'average-open-price') or 0),
+                    'close_price': float(_field(item, 'close-price') or 0)
+                })
             
-            # Trim the history if it gets too long
-            if len(self.api_calls) > self.MAX_API_CALLS_HISTORY:
-                self.api_calls = self.api_calls[:self.MAX_API_CALLS_HISTORY]
+            self._track_api_call("Get Positions", f"SUCCESS: {len(positions)} positions", latency_ms=self._elapsed_ms(started))
+            return positions
+        except Exception as e:
+            self._track_api_call("Get Positions", f"FAILED: {str(e)}", latency_ms=self._elapsed_ms(started))
+            logger.error(f"Failed to get positions: {str(e)}")
+            return None
+    
+    def get_cached_account_balance(self, account_number=None, ttl=None, allow_stale=True):
+        """
+        Get an account's balance (defaults to config.ACCOUNT_NUMBER), served from the shared cache when fresh.
+        
+        Args:
+            account_number: Account to get the balance of
+            ttl: Seconds a fetched balance stays fresh (defaults to config.BALANCE_CACHE_TTL)
+            allow_stale: Serve an expired balance while it is refreshed in the background
+        
+        Returns:
+            dict or None: The balance; the last known good one marked stale if the
+            broker did not answer and nothing servable is cached
+        """
+        account_number = account_number or config.ACCOUNT_NUMBER
+        key = f'account_balance:{account_number}'
+        
+        def fetch():
+            balance = self.get_account_balance(account_number)
+            # A last known good balance means the broker did not answer; it must not be cached as fresh
+            return None if balance is None or balance.get('stale') else balance
+        
+        balance = self.cache.get_or_fetch(key, fetch, config.BALANCE_CACHE_TTL if ttl is None else ttl,
+                                          allow_stale=allow_stale)
+        return balance if balance is not None else self._get_last_known_good(key)
+    
+    def invalidate_account_balance(self, account_number=None):
+        """Drop an account's cached balance (e.g. after an order), in this worker and the shared cache."""
+        self.cache.invalidate(f'account_balance:{account_number or config.ACCOUNT_NUMBER}')
+    
+    def get_cached_mstu_price(self):
+        """Get the MSTU price, served from the shared cache when fresh."""
+        return self.cache.get_or_fetch('quote:MSTU', self.get_mstu_price, config.QUOTE_CACHE_TTL)
+    
+    def fetch_concurrently(self, calls, timeout=None):
+        """
+        Run independent broker calls in parallel.
+        
+        Args:
+            calls: dict mapping a result name to a zero-argument callable
+            timeout: Seconds to wait for each call (defaults to config.FETCH_TIMEOUT)
+        
+        Returns:
+            dict: Result per name; calls that raised or timed out map to None
+        """
+        if timeout is None:
+            timeout = config.FETCH_TIMEOUT
+        
+        futures = {name: self.executor.submit(fn) for name, fn in calls.items()}
+        
+        # All calls start together, so a shared deadline gives each its own timeout
+        deadline = time.monotonic() + timeout
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result(timeout=max(0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                self._track_api_call(name, f"FAILED: Timed out after {timeout}s")
+                logger.error(f"Concurrent fetch of {name} timed out after {timeout}s")
+                results[name] = None
+            except Exception as e:
+                self._track_api_call(name, f"FAILED: {str(e)}")
+                logger.error(f"Concurrent fetch of {name} failed: {str(e)}")
+                results[name] = None
+        return results
+    
+    def get_dashboard_data(self):
+        """Fetch the account balance and MSTU price in parallel (partial results allowed)."""
+        return self.fetch_concurrently({
+            'account': self.get_cached_account_balance,
+            'mstu': self.get_cached_mstu_price
+        })
+    
+    def get_cached_quotes(self, symbols, ttl=None, allow_stale=True):
+        """
+        Get quotes for several symbols, served from the shared cache when fresh.
+        
+        Args:
+            symbols: Symbols to quote
+            ttl: Seconds fetched quotes stay fresh (defaults to config.QUOTE_CACHE_TTL)
+            allow_stale: Serve expired quotes while they are refreshed in the background
+        """
+        symbols = sorted(set(s.strip().upper() for s in symbols if s and s.strip()))
+        key = 'quotes:' + ','.join(symbols)
+        # An empty dict means nothing could be priced, which should not be cached
+        return self.cache.get_or_fetch(key, lambda: self.get_quotes(symbols) or None,
+                                       config.QUOTE_CACHE_TTL if ttl is None else ttl,
+                                       allow_stale=allow_stale) or {}
+    
+    async def aget_cached_quotes(self, symbols):
+        """Asyncio variant of get_cached_quotes; shares the cache (and in-flight fetches) with it."""
+        symbols = sorted(set(s.strip().upper() for s in symbols if s and s.strip()))
+        key = 'quotes:' + ','.join(symbols)
+        
+        async def fetch():
+            return await self.aget_quotes(symbols) or None
+        
+        return await self.cache.aget_or_fetch(key, fetch, config.QUOTE_CACHE_TTL) or {}
+    
+    def get_cache_stats(self):
+        """Get the cache hit/miss counters."""
+        return self.cache.get_stats()
+    
+    def get_transport_stats(self):
+        """Get the HTTP connection pool reuse counters."""
+        return self.api.get_pool_stats()
+    
+    def _collect_metrics(self):
+        """Report cache and transport counters to the metrics registry."""
+        cache_stats = self.get_cache_stats()
+        transport_stats = self.get_transport_stats()
+        samples = [
+            ('cache_lookups_total', {'result': result}, cache_stats[result], 'counter')
+            for result in ('hits', 'stale_hits', 'misses', 'coalesced')
+        ]
+        samples += [
+            ('cache_refreshes_total', {}, cache_stats['refreshes'], 'counter'),
+            ('cache_fetch_failures_total', {}, cache_stats['fetch_failures'], 'counter'),
+            ('cache_shared_hits_total', {}, cache_stats['shared_hits'], 'counter'),
+            ('cache_evictions_total', {}, cache_stats['evictions'], 'counter'),
+            ('cache_entries', {}, cache_stats['entries'], 'gauge'),
+            ('broker_retries_total', {}, transport_stats['retries'], 'counter'),
+            ('broker_connections_opened_total', {}, transport_stats['connections_opened'], 'counter'),
+            ('broker_connections_reused_total', {}, transport_stats['connections_reused'], 'counter'),
+            ('broker_authenticated', {}, int(self.authenticated), 'gauge')
+        ]
+        # Summed across workers: the number of workers whose breaker is open
+        for name, breaker in self.circuit_breakers.items():
+            samples.append(('circuit_breaker_open', {'endpoint_class': name}, int(breaker.state == 'open'), 'gauge'))
+            samples.append(('circuit_breaker_rejections_total', {'endpoint_class': name}, breaker.rejections, 'counter'))
+        return samples
+    
+    def get_circuit_breaker_stats(self):
+        """Get the state of the circuit breaker of every endpoint class."""
+        return {name: breaker.get_stats() for name, breaker in self.circuit_breakers.items()}
+    
+    def _on_circuit_transition(self, name, old_state, new_state, reason):
+        """Record a circuit breaker state change in the API call history and metrics."""
+        metrics.inc('circuit_breaker_transitions_total', endpoint_class=name, state=new_state)
+        self._track_api_call(f"Circuit Breaker ({name})", f"{new_state.upper().replace('_', '-')}: {reason}")
+    
+    def _get_last_known_good(self, key):
+        """Get a copy of the last successful result for key marked as stale (None if there is none)."""
+        value = self.last_known_good.get(key)
+        if value is None:
+            return None
+        stale = dict(value)
+        stale['stale'] = True
+        return stale
+    
+    def get_api_calls_history(self, since=None):
+        """
+        Get the history of recent API calls, newest first.
+        
+        Args:
+            since: Only return calls with a sequence number greater than this
+        """
+        return self.api_calls.get(since)
+    
+    @staticmethod
+    def _elapsed_ms(started):
+        """Milliseconds elapsed since a time.perf_counter() reading."""
+        return (time.perf_counter() - started) * 1000
+    
+    def _track_api_call(self, endpoint, status, latency_ms=None):
+        """Track an API call in the history."""
+        try:
+            self.api_calls.record(endpoint, status, latency_ms)
         except Exception as e:
             logger.error(f"Error tracking API call: {str(e)}")
 
@@ -0,0 +1,15 @@
+# /tests/conftest.py
+import os
+import sys
+import tempfile
+
+# Keep every file the modules write at import time out of the working tree
+_scratch = tempfile.mkdtemp(prefix='pricecheck-tests-')
+for name, path in (('SHARED_STATE_DIR', 'state'), ('RATE_LIMIT_FILE', 'rate_limits.bin'),
+                   ('ORDERS_DIR', 'orders'), ('HISTORY_DIR', 'history'),
+                   ('METRICS_DIR', 'metrics'), ('LOG_FILE', 'logs/tastytrade.log')):
+    os.environ.setdefault(name, os.path.join(_scratch, path))
+os.environ.setdefault('SHARED_STATE_BACKEND', 'memory')
+os.environ.setdefault('SESSION_PERSIST', 'False')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
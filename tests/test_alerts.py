@@ -0,0 +1,44 @@
+# /tests/test_alerts.py
+import pytest
+
+from alerts import ThresholdBand
+
+def _band(direction, *thresholds):
+    band = ThresholdBand(direction)
+    for threshold in thresholds:
+        band.add(threshold, f'rule-{threshold:g}')
+    return band
+
+@pytest.mark.parametrize('previous, value, expected', [
+    (9.99, 10, ['rule-10']),  # Reaching the threshold counts
+    (10, 10.01, []),  # Already at the threshold before the move
+    (10, 10, []),
+    (5, 25, ['rule-10', 'rule-20']),
+    (10, 20, ['rule-20']),
+    (25, 5, []),  # Moving down never crosses an 'above' rule
+    (20.01, 30, []),
+])
+def test_above_boundaries(previous, value, expected):
+    assert _band('above', 20, 10).crossed(previous, value) == expected
+
+@pytest.mark.parametrize('previous, value, expected', [
+    (10.01, 10, ['rule-10']),  # Reaching the threshold counts
+    (10, 9.99, []),  # Already at the threshold before the move
+    (10, 10, []),
+    (25, 5, ['rule-10', 'rule-20']),
+    (20, 10, ['rule-10']),
+    (5, 25, []),  # Moving up never crosses a 'below' rule
+    (9.99, 1, []),
+])
+def test_below_boundaries(previous, value, expected):
+    assert _band('below', 10, 20).crossed(previous, value) == expected
+
+def test_rules_sharing_a_threshold_all_fire():
+    band = ThresholdBand('above')
+    band.add(10, 'first')
+    band.add(10, 'second')
+    assert band.crossed(9, 10) == ['first', 'second']
+
+def test_empty_band_crosses_nothing():
+    assert ThresholdBand('above').crossed(1, 100) == []
+    assert ThresholdBand('below').crossed(100, 1) == []
@@ -0,0 +1,182 @@
+# /tests/test_cache.py
+import asyncio
+import threading
+import time
+
+from cache import BoundedDict, TTLCache
+
+def _counting(values):
+    """Fetch function returning values in turn and counting its calls."""
+    calls = []
+
+    def fetch():
+        calls.append(time.monotonic())
+        return values[min(len(calls), len(values)) - 1]
+    return fetch, calls
+
+def test_fresh_entry_is_served_without_fetching():
+    cache = TTLCache()
+    fetch, calls = _counting(['a'])
+    assert cache.get_or_fetch('k', fetch, 10) == 'a'
+    assert cache.get_or_fetch('k', fetch, 10) == 'a'
+    assert len(calls) == 1
+    assert cache.get_stats()['hits'] == 1
+
+def test_concurrent_misses_share_one_fetch():
+    cache = TTLCache()
+    calls = []
+    started = threading.Event()
+
+    def slow_fetch():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch('k', slow_fetch, 10)))
+               for _ in range(10)]
+    threads[0].start()
+    started.wait(1)
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ['value'] * 10
+    assert cache.get_stats()['coalesced'] == 9
+
+def test_async_waiters_share_a_fetch_with_tasks():
+    cache = TTLCache()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return 'value'
+
+    async def main():
+        return await asyncio.gather(*(cache.aget_or_fetch('k', fetch, 10) for _ in range(5)))
+
+    assert asyncio.run(main()) == ['value'] * 5
+    assert calls == [1]
+
+def test_async_waiters_share_a_fetch_with_threads():
+    cache = TTLCache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append('thread')
+        started.set()
+        release.wait(2)
+        return 'value'
+
+    async def afetch():
+        calls.append('task')
+        return 'other'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch('k', fetch, 10)))
+               for _ in range(3)]
+    threads[0].start()
+    assert started.wait(2)
+    for thread in threads[1:]:
+        thread.start()
+
+    async def main():
+        waiters = asyncio.gather(*(cache.aget_or_fetch('k', afetch, 10) for _ in range(5)))
+        # The loop keeps running while the thread's fetch is in flight
+        await asyncio.sleep(0.05)
+        assert not waiters.done()
+        release.set()
+        return await waiters
+
+    assert asyncio.run(main()) == ['value'] * 5
+    for thread in threads:
+        thread.join(2)
+    assert results == ['value'] * 3
+    assert calls == ['thread']
+
+def test_expired_entry_is_served_stale_while_refreshing():
+    cache = TTLCache(stale_ttl=10)
+    fetch, calls = _counting(['old', 'new'])
+    cache.get_or_fetch('k', fetch, 0.05)
+    time.sleep(0.1)
+
+    started = time.monotonic()
+    assert cache.get_or_fetch('k', fetch, 0.05) == 'old'
+    assert time.monotonic() - started < 0.05
+    # A second lookup during the refresh does not start another one
+    cache.get_or_fetch('k', fetch, 0.05)
+
+    deadline = time.monotonic() + 2
+    while cache.get_or_fetch('k', fetch, 10) != 'new' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(calls) == 2
+    assert cache.get_stats()['refreshes'] == 1
+
+def test_allow_stale_false_waits_for_fresh_value():
+    cache = TTLCache(stale_ttl=10)
+    fetch, calls = _counting(['old', 'new'])
+    cache.get_or_fetch('k', fetch, 0.05)
+    time.sleep(0.1)
+    assert cache.get_or_fetch('k', fetch, 0.05, allow_stale=False) == 'new'
+    assert len(calls) == 2
+
+def test_entry_past_stale_window_is_fetched_again():
+    cache = TTLCache(stale_ttl=0.05)
+    fetch, calls = _counting(['old', 'new'])
+    cache.get_or_fetch('k', fetch, 0.05)
+    time.sleep(0.15)
+    assert cache.get_or_fetch('k', fetch, 0.05) == 'new'
+    assert len(calls) == 2
+
+def test_failed_refresh_keeps_serving_the_stale_value():
+    cache = TTLCache(stale_ttl=10)
+    fetch, calls = _counting(['old', None])
+    cache.get_or_fetch('k', fetch, 0.05)
+    time.sleep(0.1)
+    assert cache.get_or_fetch('k', fetch, 0.05) == 'old'
+    deadline = time.monotonic() + 2
+    while cache.get_stats()['fetch_failures'] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get_or_fetch('k', fetch, 0.05) == 'old'
+    assert len(calls) >= 2
+
+def test_failed_fetch_is_not_cached_and_not_served_stale_to_fresh_only_callers():
+    cache = TTLCache(stale_ttl=10)
+    fetch, calls = _counting(['old', None, None])
+    cache.get_or_fetch('k', fetch, 0.05)
+    time.sleep(0.1)
+    assert cache.get_or_fetch('k', fetch, 0.05, allow_stale=False) is None
+    assert cache.get_or_fetch('k', fetch, 0.05, allow_stale=False) is None
+    assert len(calls) == 3
+    assert cache.get_stats()['fetch_failures'] == 2
+
+def test_fetch_exception_returns_none_on_miss():
+    cache = TTLCache()
+
+    def failing():
+        raise RuntimeError('broker down')
+
+    assert cache.get_or_fetch('k', failing, 10) is None
+    assert cache.get_stats()['entries'] == 0
+
+def test_least_recently_used_entries_are_evicted():
+    cache = TTLCache(max_entries=2)
+    cache.get_or_fetch('a', lambda: 1, 10)
+    cache.get_or_fetch('b', lambda: 2, 10)
+    cache.get_or_fetch('a', lambda: 0, 10)  # 'a' is now the most recently used
+    cache.get_or_fetch('c', lambda: 3, 10)
+
+    assert cache.get_or_fetch('a', lambda: 0, 10) == 1
+    assert cache.get_or_fetch('b', lambda: 'refetched', 10) == 'refetched'
+    assert cache.get_stats()['evictions'] == 2
+
+def test_bounded_dict_drops_least_recently_stored_keys():
+    values = BoundedDict(2, {'a': 1, 'b': 2})
+    values['a'] = 3
+    values['c'] = 4
+    assert dict(values) == {'a': 3, 'c': 4}
@@ -0,0 +1,65 @@
+# /tests/test_call_history.py
+import os
+
+from call_history import HISTORY_KEY, ApiCallHistory
+from shared_state import MemoryState
+
+class FailingState(MemoryState):
+    """Shared state whose writes fail until told otherwise."""
+
+    def __init__(self):
+        super().__init__()
+        self.failing = True
+
+    def set(self, key, value, ttl=None):
+        if self.failing:
+            raise OSError('disk full')
+        super().set(key, value, ttl)
+
+def _worker(history, name):
+    history._worker_id = (os.getpid(), name)
+    return history
+
+def test_older_peer_records_change_the_version():
+    state = MemoryState()
+    local = _worker(ApiCallHistory(10, state, 60), 'local')
+    peer = _worker(ApiCallHistory(10, state, 60), 'peer')
+    peer.record('Get Quotes', 'SUCCESS')  # Older than the local record below
+    local.record('Get Account Balance', 'SUCCESS')
+    local.publish()
+    last_seq, version = local.last_seq, local.version
+
+    peer.publish()
+    local.publish()
+
+    assert local.last_seq == last_seq
+    assert local.version != version
+    assert [r['endpoint'] for r in local.get()] == ['Get Account Balance', 'Get Quotes']
+
+def test_unchanged_peers_keep_the_version():
+    state = MemoryState()
+    local = _worker(ApiCallHistory(10, state, 60), 'local')
+    local.record('Get Quotes', 'SUCCESS')
+    local.publish()
+    version = local.version
+    local.publish()
+    assert local.version == version
+
+def test_failed_publish_keeps_the_records_pending():
+    state = FailingState()
+    history = _worker(ApiCallHistory(3, state, 60), 'local')
+    for endpoint in ('a', 'b'):
+        history.record(endpoint, 'SUCCESS')
+    history.publish()
+    history.record('c', 'SUCCESS')
+
+    state.failing = False
+    history.publish()
+    assert [r['endpoint'] for r in state.get(HISTORY_KEY)] == ['a', 'b', 'c']
+
+def test_process_local_history_needs_no_state():
+    history = ApiCallHistory(2)
+    for endpoint in ('a', 'b', 'c'):
+        history.record(endpoint, 'SUCCESS')
+    assert [r['endpoint'] for r in history.get()] == ['c', 'b']
+    assert history.get(since=history.last_seq) == []
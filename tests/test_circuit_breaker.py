@@ -0,0 +1,87 @@
+# /tests/test_circuit_breaker.py
+import time
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+def _breaker(failure_threshold=3, reset_timeout=0.05):
+    transitions = []
+    breaker = CircuitBreaker('quotes', failure_threshold, reset_timeout,
+                             on_transition=lambda *transition: transitions.append(transition[1:3]))
+    return breaker, transitions
+
+def _open(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure('HTTP 503')
+
+def test_stays_closed_below_threshold():
+    breaker, transitions = _breaker()
+    breaker.record_failure('HTTP 503')
+    breaker.record_failure('HTTP 503')
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+    assert transitions == []
+
+def test_success_resets_consecutive_failures():
+    breaker, _ = _breaker()
+    breaker.record_failure('HTTP 503')
+    breaker.record_failure('HTTP 503')
+    breaker.record_success()
+    breaker.record_failure('HTTP 503')
+    assert breaker.state == CLOSED
+    assert breaker.get_stats()['consecutive_failures'] == 1
+
+def test_opens_after_threshold_and_rejects():
+    breaker, transitions = _breaker(reset_timeout=10)
+    _open(breaker)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert not breaker.allow()
+    assert breaker.get_stats()['rejections'] == 2
+    assert breaker.get_stats()['retry_in'] > 0
+    assert transitions == [(CLOSED, OPEN)]
+
+def test_half_open_lets_one_probe_through():
+    breaker, transitions = _breaker()
+    _open(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    assert transitions == [(CLOSED, OPEN), (OPEN, HALF_OPEN)]
+
+def test_successful_probe_closes():
+    breaker, transitions = _breaker()
+    _open(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+    assert transitions[-1] == (HALF_OPEN, CLOSED)
+
+def test_failed_probe_reopens():
+    breaker, transitions = _breaker()
+    _open(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure('timeout')
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert transitions[-1] == (HALF_OPEN, OPEN)
+
+def test_released_probe_can_be_claimed_again():
+    breaker, _ = _breaker()
+    _open(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+def test_transition_callback_errors_do_not_propagate():
+    def failing(*transition):
+        raise RuntimeError('listener failed')
+
+    breaker = CircuitBreaker('orders', 1, 10, on_transition=failing)
+    breaker.record_failure('HTTP 500')
+    assert breaker.state == OPEN
@@ -0,0 +1,59 @@
+# /tests/test_dashboard.py
+import pytest
+from flask import Flask
+
+from dashboard import dashboard
+
+@pytest.fixture
+def http():
+    app = Flask(__name__)
+    app.register_blueprint(dashboard)
+    return app.test_client()
+
+@pytest.mark.parametrize('query', ['from=nan&to=100', 'from=0&to=nan', 'from=-inf&to=100', 'from=1e300&to=1e301'])
+def test_history_rejects_non_finite_ranges(http, query):
+    response = http.get(f'/api/history?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Bad Request'
+
+@pytest.mark.parametrize('query', ['from=nan&to=5', 'from=0&to=inf', 'window=nan', 'window=inf', 'from=0&to=5&window=nan'])
+def test_analytics_rejects_non_finite_parameters(http, query):
+    response = http.get(f'/api/analytics?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Bad Request'
+
+@pytest.fixture
+def submitted(monkeypatch):
+    """Authenticate the client and capture orders instead of queueing them."""
+    from orders import order_queue
+    from tastytrade_client import client
+    orders = []
+
+    def submit(idempotency_key, order):
+        orders.append((idempotency_key, order))
+        return {'id': order_queue.get_order_id(idempotency_key or 'generated'), **order}, True
+
+    monkeypatch.setattr(client, 'authenticated', True)
+    monkeypatch.setattr(order_queue, 'submit', submit)
+    return orders
+
+@pytest.mark.parametrize('body', [[1], [{'symbol': 'MSTU', 'quantity': 1}], 'orders', 5, {'orders': {}}, {}])
+def test_batch_orders_reject_malformed_bodies(http, submitted, body):
+    response = http.post('/api/orders/batch', json=body)
+    assert response.status_code == 400
+    assert submitted == []
+
+@pytest.mark.parametrize('key', [7, '', '  ', ['a'], {'a': 1}, True])
+def test_batch_orders_reject_non_string_idempotency_keys(http, submitted, key):
+    order = {'symbol': 'MSTU', 'quantity': 1, 'idempotency_key': key}
+    response = http.post('/api/orders/batch', json={'orders': [order]})
+    assert response.status_code == 400
+    assert 'idempotency_key' in response.get_json()['results'][0]['errors'][-1]
+    assert submitted == []
+
+def test_batch_orders_queue_valid_orders(http, submitted):
+    orders = [{'symbol': 'MSTU', 'quantity': 1, 'idempotency_key': 'k-1'}, 'not an order']
+    response = http.post('/api/orders/batch', json={'orders': orders}, headers={'Idempotency-Key': 'batch'})
+    assert response.status_code == 202
+    assert [key for key, _ in submitted] == ['k-1']
+    assert response.get_json()['results'][1]['success'] is False
@@ -0,0 +1,37 @@
+# /tests/test_logger.py
+import logging
+import threading
+
+from logger import SamplingFilter
+
+def _record(msg, name='poller', level=logging.INFO):
+    return logging.LogRecord(name, level, __file__, 1, msg, None, None)
+
+def test_keeps_one_in_n_per_message():
+    sampler = SamplingFilter({'poller': 3})
+    kept = [sampler.filter(_record('tick')) for _ in range(6)]
+    assert kept == [True, False, False, True, False, False]
+    assert sampler.filter(_record('other'))
+    assert sampler.filter(_record('tick', level=logging.WARNING))
+    assert sampler.sampled_out == 4
+
+def test_counters_are_capped():
+    sampler = SamplingFilter({'poller': 2}, max_keys=10)
+    for i in range(100):
+        sampler.filter(_record(f"Fetched {i} quotes"))
+    assert len(sampler._counts) == 10
+
+def test_counts_every_thread():
+    sampler = SamplingFilter({'poller': 4})
+
+    def log():
+        for _ in range(1000):
+            sampler.filter(_record('tick'))
+
+    threads = [threading.Thread(target=log) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sampler._counts[('poller', 'tick')] == 8000
+    assert sampler.sampled_out == 6000
@@ -0,0 +1,51 @@
+# /tests/test_order_engine.py
+import pytest
+
+from order_engine import validate_order
+
+@pytest.mark.parametrize('quantity', ['nan', 'inf', '-inf', float('nan'), float('inf'), '1e400',
+                                      0, -1, 2.5, 'abc', None, ''])
+def test_invalid_quantities_are_rejected(quantity):
+    order, errors = validate_order({'symbol': 'MSTU', 'quantity': quantity})
+    assert order is None
+    assert any('quantity' in error for error in errors)
+
+@pytest.mark.parametrize('quantity, expected', [('3', 3), (3, 3), (3.0, 3), ('1e3', 1000)])
+def test_whole_quantities_are_accepted(quantity, expected):
+    order, errors = validate_order({'symbol': 'mstu', 'quantity': quantity})
+    assert errors == []
+    assert order['legs'] == [{'symbol': 'MSTU', 'action': 'Buy', 'quantity': expected}]
+
+@pytest.mark.parametrize('price', ['nan', 'inf', float('nan'), float('-inf'), '1e400', 0, -5, None, 'abc'])
+def test_invalid_limit_prices_are_rejected(price):
+    order, errors = validate_order({'symbol': 'MSTU', 'quantity': 1, 'order_type': 'Limit', 'price': price})
+    assert order is None
+    assert any('price' in error for error in errors)
+
+def test_limit_order_is_normalized():
+    order, errors = validate_order({'symbol': 'MSTU', 'quantity': '2', 'order_type': 'Limit', 'price': '5.25'})
+    assert errors == []
+    assert order['price'] == 5.25
+    assert order['price_effect'] == 'Debit'
+
+def test_market_order_ignores_price():
+    order, errors = validate_order({'symbol': 'MSTU', 'quantity': 1, 'price': 'nan'})
+    assert errors == []
+    assert order['price'] is None
+
+@pytest.mark.parametrize('symbol', ['', 'TOOLONGSYM', '../ETC', 'MS TU', None])
+def test_invalid_symbols_are_rejected(symbol):
+    order, errors = validate_order({'symbol': symbol, 'quantity': 1})
+    assert order is None
+    assert any('symbol' in error for error in errors)
+
+def test_mixed_limit_order_needs_price_effect():
+    spec = {'legs': [{'symbol': 'MSTU', 'action': 'Buy', 'quantity': 1},
+                     {'symbol': 'TQQQ', 'action': 'Sell', 'quantity': 1}],
+            'order_type': 'Limit', 'price': 1}
+    order, errors = validate_order(spec)
+    assert order is None
+    assert any('price_effect' in error for error in errors)
+
+def test_non_object_order_is_rejected():
+    assert validate_order(['MSTU']) == (None, ['Order must be an object'])
@@ -0,0 +1,132 @@
+# /tests/test_orders.py
+import threading
+
+import pytest
+
+from order_engine import validate_order
+from orders import OrderQueue
+
+class FakeClient:
+    """Stands in for the Tastytrade client and counts the orders placed."""
+
+    def __init__(self):
+        self.placed = []
+        self._lock = threading.Lock()
+
+    def place_order(self, order):
+        with self._lock:
+            self.placed.append(order)
+            broker_id = len(self.placed)
+        return {'success': True, 'order_id': broker_id, 'status': 'Received', 'message': 'Order received'}
+
+@pytest.fixture
+def queue(tmp_path):
+    client = FakeClient()
+    order_queue = OrderQueue(client, str(tmp_path / 'orders'), max_workers=2)
+    yield order_queue
+    order_queue._executor.shutdown(wait=True)
+
+def _order(quantity=1):
+    order, errors = validate_order({'symbol': 'MSTU', 'quantity': quantity})
+    assert errors == []
+    return order
+
+def test_resubmitting_a_key_returns_the_original_order(queue):
+    first, created = queue.submit('key-1', _order(1))
+    again, created_again = queue.submit('key-1', _order(5))
+    queue._executor.shutdown(wait=True)
+
+    assert created and not created_again
+    assert again['id'] == first['id']
+    assert again['legs'][0]['quantity'] == 1
+    assert len(queue.client.placed) == 1
+    assert queue.get(first['id'], refresh=False)['status'] == 'Received'
+
+def test_concurrent_submissions_of_one_key_place_one_order(queue):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(queue.submit('key-2', _order())))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    queue._executor.shutdown(wait=True)
+
+    assert sum(created for _, created in results) == 1
+    assert len({record['id'] for record, _ in results}) == 1
+    assert len(queue.client.placed) == 1
+
+def test_a_second_queue_sees_the_first_ones_orders(queue):
+    record, _ = queue.submit('key-3', _order())
+    other_worker = OrderQueue(FakeClient(), queue.orders_dir, max_workers=1)
+    again, created = other_worker.submit('key-3', _order())
+    other_worker._executor.shutdown(wait=True)
+
+    assert not created
+    assert again['id'] == record['id']
+    assert other_worker.client.placed == []
+
+def test_different_keys_are_different_orders(queue):
+    first, _ = queue.submit('key-4', _order())
+    second, _ = queue.submit('key-5', _order())
+    queue._executor.shutdown(wait=True)
+
+    assert first['id'] != second['id']
+    assert len(queue.client.placed) == 2
+
+def test_order_id_is_derived_from_the_key():
+    assert OrderQueue.get_order_id('key-6') == OrderQueue.get_order_id('key-6')
+    assert OrderQueue.get_order_id('key-6') != OrderQueue.get_order_id('key-7')
+
+def _stored(queue, status, age):
+    """Store an order as a stopped worker would have left it."""
+    record, _ = queue.submit(f'stored-{status}-{age}', _order())
+    queue._executor.shutdown(wait=True)
+    queue._executor = type(queue._executor)(max_workers=1)
+    record = queue.get(record['id'], refresh=False)
+    record.update(status=status, updated_at=record['updated_at'] - age)
+    queue._save(record)
+    queue.client.placed.clear()
+    return record
+
+def test_recover_submits_abandoned_queued_orders(queue):
+    record = _stored(queue, 'Queued', 0)
+    queue.recover()
+    queue._executor.shutdown(wait=True)
+    assert queue.get(record['id'], refresh=False)['status'] == 'Received'
+    assert len(queue.client.placed) == 1
+
+def test_recovered_order_is_submitted_once(queue):
+    record = _stored(queue, 'Queued', 0)
+    other_worker = OrderQueue(FakeClient(), queue.orders_dir, max_workers=2)
+    for _ in range(3):
+        queue.recover()
+        other_worker.recover()
+    queue._executor.shutdown(wait=True)
+    other_worker._executor.shutdown(wait=True)
+    assert len(queue.client.placed) + len(other_worker.client.placed) == 1
+    assert queue.get(record['id'], refresh=False)['status'] == 'Received'
+
+def test_stuck_submission_is_failed_without_resubmitting(queue, monkeypatch):
+    monkeypatch.setattr('config.ORDER_SUBMIT_TIMEOUT', 60)
+    fresh = _stored(queue, 'Submitting', 0)
+    stuck = _stored(queue, 'Submitting', 120)
+    queue.recover()
+    queue._executor.shutdown(wait=True)
+
+    assert queue.get(fresh['id'])['status'] == 'Submitting'
+    assert queue.get(stuck['id'])['status'] == 'Failed'
+    assert queue.client.placed == []
+
+def test_status_refresh_does_not_overwrite_a_newer_record(queue):
+    record, _ = queue.submit('refresh-race', _order())
+    queue._executor.shutdown(wait=True)
+
+    def get_order_status(broker_order_id):
+        # Another worker records the fill while this one asks the broker
+        queue._update(record['id'], status='Filled', message='Order filled')
+        return 'Live'
+
+    queue.client.get_order_status = get_order_status
+    assert queue.get(record['id'])['status'] == 'Filled'
+    assert queue.get(record['id'], refresh=False)['status'] == 'Filled'
@@ -0,0 +1,28 @@
+# /tests/test_quote_streamer.py
+import json
+
+from quote_book import QuoteBook
+from quote_streamer import QuoteStreamer
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(json.loads(message))
+
+def test_snapshot_symbols_are_subscribed_once():
+    streamer = QuoteStreamer(QuoteBook(), lambda: None, symbols=['MSTU'])
+    streamer._ws = FakeSocket()
+    streamer.record_snapshot({'quotes': {'MSTU': {}, 'AAPL': {}}})
+    streamer.record_snapshot({'quotes': {'MSTU': {}, 'AAPL': {}}})
+
+    assert [m['type'] for m in streamer._ws.sent] == ['FEED_SUBSCRIPTION']
+    assert {entry['symbol'] for entry in streamer._ws.sent[0]['add']} == {'AAPL'}
+    assert streamer.get_stats()['symbols'] == ['AAPL', 'MSTU']
+
+def test_symbols_added_while_disconnected_wait_for_the_next_connection():
+    streamer = QuoteStreamer(QuoteBook(), lambda: None)
+    streamer.record_snapshot({'quotes': {'TSLA': {}}})
+    assert streamer.get_stats()['symbols'] == ['TSLA']
+    assert streamer._collect_metrics()[1] == ('streamer_symbols', {}, 1, 'gauge')
@@ -0,0 +1,68 @@
+# /tests/test_shared_state.py
+import time
+
+import pytest
+
+from fake_redis import FakeRedisServer
+from shared_state import RedisState
+
+@pytest.fixture(scope='module')
+def redis_url():
+    server = FakeRedisServer().start()
+    yield server.url
+    server.shutdown()
+    server.server_close()
+
+def _drop_first_call(state):
+    """Make the next round trip fail as if the connection dropped, and count round trips."""
+    calls = []
+    call_once = state._call_once
+
+    def flaky(*commands):
+        calls.append(commands)
+        if len(calls) == 1:
+            raise ConnectionError("Redis closed the connection")
+        return call_once(*commands)
+    state._call_once = flaky
+    return calls
+
+def test_idempotent_commands_are_resent(redis_url):
+    state = RedisState(redis_url, prefix='resend:')
+    state.set('k', 1)
+    calls = _drop_first_call(state)
+    assert state.get('k') == 1
+    assert len(calls) == 2
+
+@pytest.mark.parametrize('call', [
+    lambda state: state.incr('n'),
+    lambda state: state.append('list', 1, 10),
+])
+def test_non_idempotent_commands_are_not_resent(redis_url, call):
+    state = RedisState(redis_url, prefix='once:')
+    calls = _drop_first_call(state)
+    with pytest.raises(ConnectionError):
+        call(state)
+    assert len(calls) == 1
+    assert state.get('n') is None and state.items('list') == []
+
+def test_expired_lock_taken_over_is_not_released(redis_url):
+    first = RedisState(redis_url, prefix='lock:', lock_timeout=0.1)
+    second = RedisState(redis_url, prefix='lock:', lock_timeout=10)
+    key = first._key('lock:job')
+    expired = first.lock('job')
+    expired.__enter__()
+    time.sleep(0.2)
+    with second.lock('job'):
+        token = second._call(['GET', key])[0]
+        expired.__exit__(None, None, None)
+        assert second._call(['GET', key])[0] == token
+    assert second._call(['GET', key])[0] is None
+
+def test_transaction_is_skipped_when_a_watched_key_changes(redis_url):
+    state = RedisState(redis_url, prefix='watch:')
+    other = RedisState(redis_url, prefix='watch:')
+    state.set('k', 1)
+    state._call(['WATCH', state._key('k')])
+    other.set('k', 2)
+    assert state._call(['MULTI'], ['DEL', state._key('k')], ['EXEC'])[2] is None
+    assert state.get('k') == 2
@@ -0,0 +1,47 @@
+# /tests/test_tastytrade_client.py
+import pytest
+
+from tastytrade_client import client
+
+@pytest.fixture
+def balances(monkeypatch):
+    """Answer balance fetches from a list, and count them."""
+    answers = []
+    calls = []
+
+    def get_account_balance(account_number=None):
+        calls.append(account_number)
+        answer = answers.pop(0) if answers else None
+        if answer is not None and not answer.get('stale'):
+            client.last_known_good[f'account_balance:{account_number}'] = answer
+        return answer
+
+    monkeypatch.setattr(client, 'get_account_balance', get_account_balance)
+    client.cache.invalidate()
+    yield answers, calls
+    client.cache.invalidate()
+
+def test_stale_balance_is_not_cached(balances):
+    answers, calls = balances
+    # The broker fails once, answered with the last known good balance, then recovers
+    client.last_known_good['account_balance:ACCT'] = {'cash_balance': 1.0}
+    answers += [{'cash_balance': 1.0, 'stale': True}, {'cash_balance': 2.0}]
+    first = client.get_cached_account_balance('ACCT', ttl=60, allow_stale=False)
+    second = client.get_cached_account_balance('ACCT', ttl=60, allow_stale=False)
+    third = client.get_cached_account_balance('ACCT', ttl=60, allow_stale=False)
+
+    assert first['stale'] is True
+    assert second == {'cash_balance': 2.0}
+    assert third == second
+    assert len(calls) == 2
+
+def test_failed_fetch_falls_back_to_last_known_good(balances):
+    answers, calls = balances
+    answers += [{'cash_balance': 3.0}]
+    client.get_cached_account_balance('ACCT2', ttl=60)
+    client.invalidate_account_balance('ACCT2')
+
+    fallback = client.get_cached_account_balance('ACCT2', ttl=60, allow_stale=False)
+    assert fallback == {'cash_balance': 3.0, 'stale': True}
+    assert client.get_cached_account_balance('ACCT2', ttl=60, allow_stale=False)['stale'] is True
+    assert len(calls) == 3
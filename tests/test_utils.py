@@ -0,0 +1,14 @@
+# /tests/test_utils.py
+import pytest
+
+from utils import parse_timestamp
+
+@pytest.mark.parametrize('value', ['nan', 'NaN', 'inf', '-inf', '1e400', '1e300', 'tomorrow', '', None])
+def test_invalid_timestamps_are_rejected(value):
+    assert parse_timestamp(value) is None
+
+def test_epoch_seconds_are_parsed():
+    assert parse_timestamp('1700000000.5') == 1700000000.5
+
+def test_naive_iso_datetimes_are_eastern():
+    assert parse_timestamp('2024-01-02T09:30:00') == parse_timestamp('2024-01-02T09:30:00-05:00')
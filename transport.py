@@ -0,0 +1,277 @@
+# /transport.py
+import threading
+import time
+
+import requests
+from urllib3.util.retry import Retry
+
+import config
+from logger import get_logger
+from metrics import metrics
+from replay import create_adapter
+
+logger = get_logger(__name__)
+
+USER_AGENT = 'pricecheck/tastytrade-client'
+
+# Endpoint classes keyed by path prefix (first match wins); order paths such as
+# /accounts/{id}/orders are matched anywhere in the path
+ENDPOINT_CLASSES = (
+    ('/sessions', 'session'),
+    ('/instruments', 'quotes'),
+    ('/quotes', 'quotes'),
+    ('/market-data', 'quotes'),
+    ('/quote-streamer-tokens', 'quotes'),
+    ('/accounts', 'account'),
+)
+
+# Answers worth retrying for idempotent GETs. A 429 is not retried: it penalizes
+# the shared rate limiter, so every worker backs off, and fails fast
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Every class get_endpoint_class can return
+ENDPOINT_CLASS_NAMES = ('session', 'orders', 'quotes', 'account', 'default')
+
+def get_endpoint_class(path):
+    """Classify an API path as 'session', 'orders', 'quotes', 'account' or 'default'."""
+    if '/orders' in path:
+        return 'orders'
+    for prefix, endpoint_class in ENDPOINT_CLASSES:
+        if path.startswith(prefix):
+            return endpoint_class
+    return 'default'
+
+class BrokerApiError(Exception):
+    """Raised when the broker answers with a non-success HTTP status."""
+
+    def __init__(self, status_code, message):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+
+class CircuitOpenError(BrokerApiError):
+    """Raised without contacting the broker while an endpoint class's circuit breaker is open."""
+
+    def __init__(self, endpoint_class, retry_in):
+        super().__init__(503, f"Circuit breaker for {endpoint_class} requests is open; retrying in {retry_in:g}s")
+        self.endpoint_class = endpoint_class
+
+class _CountingRetry(Retry):
+    """urllib3 Retry that counts how many retries were performed."""
+
+    retries_performed = 0
+    _counter_lock = threading.Lock()
+
+    def increment(self, *args, **kwargs):
+        with _CountingRetry._counter_lock:
+            _CountingRetry.retries_performed += 1
+        return super().increment(*args, **kwargs)
+
+class BrokerTransport:
+    """
+    Pooled, keep-alive HTTP transport for the Tastytrade REST API.
+
+    One instance (and one connection pool) is shared by every thread in a
+    worker process and survives re-authentication, so connections stay warm.
+    GETs are retried with backoff on connection errors and 5xx answers;
+    POSTs are never retried because they are not idempotent. A 429 is not
+    retried but backs off the shared rate limiter for its Retry-After.
+    """
+
+    def __init__(self, base_url=None, rate_limiter=None, circuit_breakers=None):
+        base_url = (base_url or config.API_BASE_URL).rstrip('/')
+        if '://' not in base_url:
+            base_url = f"https://{base_url}"
+        self.base_url = base_url
+        # Called with the rejected token on a 401; returns True if a new session is in use
+        self.on_unauthorized = None
+        # Shared token buckets every request draws from (None disables client-side limiting)
+        self.rate_limiter = rate_limiter
+        # Circuit breaker per endpoint class; requests of an open class fail immediately
+        self.circuit_breakers = circuit_breakers or {}
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept': 'application/json'
+        })
+
+        retry = _CountingRetry(
+            total=config.HTTP_RETRIES,
+            backoff_factor=config.HTTP_RETRY_BACKOFF,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET']),
+            # Sleeping for a server-chosen time would hold the request thread; back off exponentially
+            respect_retry_after_header=False,
+            raise_on_status=False
+        )
+        # Records or replays broker exchanges when RECORD_FILE or REPLAY_FILE is set
+        self.adapter = create_adapter(pool_connections=4, pool_maxsize=config.HTTP_POOL_SIZE,
+                                      max_retries=retry)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+
+        self.timeouts = {
+            'session': (config.HTTP_CONNECT_TIMEOUT, config.HTTP_SESSION_TIMEOUT),
+            'orders': (config.HTTP_CONNECT_TIMEOUT, config.HTTP_ORDER_TIMEOUT),
+            'quotes': (config.HTTP_CONNECT_TIMEOUT, config.HTTP_QUOTE_TIMEOUT),
+            'account': (config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT),
+            'default': (config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT)
+        }
+
+    def login(self, login, password):
+        """
+        Create a session and use its token for every following request.
+
+        Returns:
+            dict: The session data returned by the API (session-token, session-expiration, ...)
+        """
+        response = self.request('POST', '/sessions', data={
+            'login': login,
+            'password': password,
+            'remember-me': True
+        })
+        if not response or 'data' not in response or 'session-token' not in response['data']:
+            raise BrokerApiError(200, "No session token in login response")
+        session = response['data']
+        self.set_session_token(session['session-token'])
+        return session
+
+    def logout(self):
+        """End the current session."""
+        try:
+            self.request('DELETE', '/sessions')
+        finally:
+            self.set_session_token(None)
+
+    def set_session_token(self, token):
+        """Use token for authorization (None removes it)."""
+        if token:
+            self.session.headers['Authorization'] = token
+        else:
+            self.session.headers.pop('Authorization', None)
+
+    def request(self, method, path, params=None, data=None, priority=None):
+        """
+        Send a request to the broker API.
+
+        Args:
+            method: HTTP method
+            path: API path, e.g. '/accounts/123/balances'
+            params: Query parameters as a dict or a list of (key, value) tuples
+            data: JSON body
+            priority: Rate limit priority ('high', 'normal' or 'low'; defaults by endpoint class)
+
+        Returns:
+            dict or None: Parsed JSON response (None for empty bodies)
+        """
+        endpoint_class = get_endpoint_class(path)
+        timeout = self.timeouts[endpoint_class]
+        breaker = self.circuit_breakers.get(endpoint_class)
+        if breaker and not breaker.allow():
+            metrics.inc('broker_request_errors_total', endpoint_class=endpoint_class,
+                        method=method, error='circuit_open')
+            raise CircuitOpenError(endpoint_class, breaker.get_stats()['retry_in'])
+        if self.rate_limiter and not self.rate_limiter.acquire(endpoint_class, priority):
+            if breaker:
+                breaker.release()
+            metrics.inc('broker_request_errors_total', endpoint_class=endpoint_class,
+                        method=method, error='rate_limited')
+            raise BrokerApiError(429, f"Client-side rate limit for {endpoint_class} requests exceeded")
+        token = self.session.headers.get('Authorization')
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", params=params,
+                                            json=data, timeout=timeout)
+            
+            # Retry once with a fresh session if the token was rejected
+            if (response.status_code == 401 and token and path != '/sessions'
+                    and self.on_unauthorized and self.on_unauthorized(token)):
+                response = self.session.request(method, f"{self.base_url}{path}", params=params,
+                                                json=data, timeout=timeout)
+        except requests.RequestException as e:
+            # Timeouts and connection errors mean the broker is unreachable
+            if breaker:
+                breaker.record_failure(type(e).__name__)
+            metrics.inc('broker_request_errors_total', endpoint_class=endpoint_class,
+                        method=method, error=type(e).__name__)
+            raise
+        except Exception:
+            if breaker:
+                breaker.release()
+            raise
+        finally:
+            metrics.observe('broker_request_duration_ms', (time.perf_counter() - started) * 1000,
+                            endpoint_class=endpoint_class, method=method)
+        
+        if breaker:
+            # 5xx answers count against the broker; anything else shows it is up
+            if response.status_code >= 500:
+                breaker.record_failure(f"HTTP {response.status_code}")
+            else:
+                breaker.record_success()
+        
+        if not 200 <= response.status_code < 400:
+            metrics.inc('broker_request_errors_total', endpoint_class=endpoint_class,
+                        method=method, error=f"http_{response.status_code}")
+            if response.status_code == 429 and self.rate_limiter:
+                # Make every worker back off, not just this request
+                self.rate_limiter.penalize(endpoint_class, self._retry_after(response))
+            raise BrokerApiError(response.status_code, self._error_message(response))
+        if not response.content:
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            return None
+
+    def get(self, path, params=None, priority=None):
+        """Send a GET request."""
+        return self.request('GET', path, params=params, priority=priority)
+
+    def post(self, path, params=None, data=None):
+        """Send a POST request."""
+        return self.request('POST', path, params=params, data=data)
+
+    def put(self, path, params=None, data=None):
+        """Send a PUT request."""
+        return self.request('PUT', path, params=params, data=data)
+
+    def delete(self, path, params=None):
+        """Send a DELETE request."""
+        return self.request('DELETE', path, params=params)
+
+    def get_pool_stats(self):
+        """Get connection pool reuse counters for this process."""
+        pools = self.adapter.poolmanager.pools
+        requests_sent = 0
+        connections_opened = 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_sent += pool.num_requests
+            connections_opened += pool.num_connections
+        return {
+            'requests': requests_sent,
+            'connections_opened': connections_opened,
+            'connections_reused': max(0, requests_sent - connections_opened),
+            'reuse_ratio': round(1 - connections_opened / requests_sent, 4) if requests_sent else 0.0,
+            'retries': _CountingRetry.retries_performed,
+            'pool_size': config.HTTP_POOL_SIZE
+        }
+
+    @staticmethod
+    def _retry_after(response):
+        """Get the seconds to back off from a 429's Retry-After header (1 if absent)."""
+        try:
+            return max(0.0, float(response.headers.get('Retry-After', 1)))
+        except ValueError:
+            return 1.0
+
+    @staticmethod
+    def _error_message(response):
+        """Extract the broker's error message from a failed response."""
+        try:
+            error = response.json().get('error', {})
+            return error.get('message') or error.get('code') or response.reason
+        except (ValueError, AttributeError):
+            return response.reason
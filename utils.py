@@ -1,5 +1,7 @@
 # /utils.py
+import functools
 import json
+import math
 from datetime import datetime
 import pytz
 
@@ -7,6 +9,8 @@ from logger import get_logger
 
 logger = get_logger(__name__)
 
+EASTERN = pytz.timezone('US/Eastern')
+
 def format_currency(value):
     """Format a value as US currency."""
     try:
@@ -23,17 +27,97 @@ def format_percentage(value):
         logger.warning(f"Could not format percentage value: {value}")
         return f"0.00%"
 
+@functools.lru_cache(maxsize=256)
 def format_datetime(iso_datetime_str):
-    """Format an ISO datetime string to a readable format."""
+    """Format an ISO datetime string to a readable format (cached; the same timestamps repeat across polls)."""
     try:
         dt = datetime.fromisoformat(iso_datetime_str)
-        eastern = pytz.timezone('US/Eastern')
-        dt = dt.astimezone(eastern)
+        dt = dt.astimezone(EASTERN)
         return dt.strftime("%Y-%m-%d %H:%M:%S %Z")
     except (ValueError, TypeError):
         logger.warning(f"Could not format datetime: {iso_datetime_str}")
         return "Unknown time"
 
+def parse_timestamp(value):
+    """
+    Parse epoch seconds or an ISO datetime into epoch seconds.
+    
+    ISO datetimes without a timezone are taken as US/Eastern. Returns None for
+    values that cannot be parsed or are not a representable time (nan, inf,
+    years beyond 9999).
+    """
+    try:
+        timestamp = float(value)
+    except (ValueError, TypeError):
+        pass
+    else:
+        if not math.isfinite(timestamp):
+            return None
+        try:
+            datetime.fromtimestamp(timestamp)
+        except (OverflowError, OSError, ValueError):
+            return None
+        return timestamp
+    try:
+        dt = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        return None
+    if dt.tzinfo is None:
+        dt = EASTERN.localize(dt)
+    return dt.timestamp()
+
+def format_account_data(account_balance):
+    """Format an account balance dict for display."""
+    return {
+        'cash_balance': format_currency(account_balance['cash_balance']),
+        'total_equity': format_currency(account_balance['total_equity']),
+        'buying_power': format_currency(account_balance['buying_power']),
+        'raw_cash_balance': account_balance['cash_balance'],
+        'timestamp': account_balance['timestamp'],
+        'formatted_timestamp': format_datetime(account_balance['timestamp']) if account_balance['timestamp'] else 'Unknown',
+        'stale': account_balance.get('stale', False)
+    }
+
+def format_quote_data(quote):
+    """Format a quote dict for display."""
+    return {
+        'symbol': quote['symbol'],
+        'description': quote['description'],
+        'last_price': format_currency(quote['last_price']),
+        'bid_price': format_currency(quote['bid_price']),
+        'ask_price': format_currency(quote['ask_price']),
+        'change': format_currency(quote['change']),
+        'percent_change': format_percentage(quote['percent_change']),
+        'raw_last_price': quote['last_price'],
+        'timestamp': quote['timestamp'],
+        'formatted_timestamp': format_datetime(quote['timestamp']) if quote['timestamp'] else 'Unknown',
+        'stale': quote.get('stale', False)
+    }
+
+def format_positions_data(book):
+    """Format PositionBook.get() output for display."""
+    def format_pnl(values):
+        return {
+            'market_value': format_currency(values['market_value']),
+            'unrealized_pnl': format_currency(values['unrealized_pnl']),
+            'unrealized_pnl_percent': format_percentage(values['unrealized_pnl_percent']),
+            'day_pnl': format_currency(values['day_pnl']),
+            'raw_unrealized_pnl': values['unrealized_pnl'],
+            'raw_day_pnl': values['day_pnl']
+        }
+    
+    return {
+        'positions': [dict(format_pnl(position),
+                           symbol=position['symbol'],
+                           quantity=position['quantity'],
+                           average_open_price=format_currency(position['average_open_price']),
+                           mark=format_currency(position['mark']),
+                           formatted_timestamp=format_datetime(position['marked_at']) if position['marked_at'] else 'Not marked yet')
+                      for position in book['positions']],
+        'totals': format_pnl(book['totals']),
+        'loaded_at': book['loaded_at']
+    }
+
 def safe_json_dumps(obj):
     """Safely convert an object to a JSON string."""
     try:
@@ -0,0 +1,113 @@
+# /webhook_receiver.py
+"""
+Local receiver for alert webhooks.
+
+Accepts JSON POSTs on any path, prints each one and keeps the latest in
+memory; GET /events returns them (newest first) and DELETE /events clears
+them, so ALERT_WEBHOOK_URL can be tried and tested without an external
+service. --status makes it answer with an error to exercise retries.
+
+Run a receiver:  python webhook_receiver.py --port 9000
+Point the app:   ALERT_WEBHOOK_URL=http://127.0.0.1:9000/alerts python app.py
+"""
+import argparse
+import json
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    """Records POSTed events and serves them back."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        try:
+            event = json.loads(body or b'null')
+        except ValueError:
+            self._send(400, {'error': 'Body is not JSON'})
+            return
+        self.server.record(self.path, event)
+        if self.server.verbose:
+            print(f"{self.path}: {json.dumps(event)}", flush=True)
+        self._send(self.server.status, {'received': True})
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/events':
+            self._send(404, {'error': 'Not Found'})
+            return
+        self._send(200, {'events': self.server.get_events(), 'received': self.server.received})
+
+    def do_DELETE(self):
+        self.server.clear()
+        self._send(200, {'cleared': True})
+
+    def _send(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Events are printed instead
+
+class WebhookReceiverServer(ThreadingHTTPServer):
+    """Threaded webhook receiver."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, status=200, capacity=1000, verbose=False):
+        """
+        Args:
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free one)
+            status: HTTP status every POST is answered with
+            capacity: Events kept
+            verbose: Print every event received
+        """
+        self.status = status
+        self.verbose = verbose
+        self.received = 0
+        self._events = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        super().__init__((host, port), _WebhookHandler)
+
+    @property
+    def url(self):
+        """Get the URL to use as ALERT_WEBHOOK_URL."""
+        host, port = self.server_address
+        return f"http://{host}:{port}/alerts"
+
+    def record(self, path, event):
+        with self._lock:
+            self.received += 1
+            self._events.append({'path': path, 'event': event})
+
+    def get_events(self):
+        """Get the events received, newest first."""
+        with self._lock:
+            return list(reversed(self._events))
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+
+    def start(self):
+        """Serve in a background thread."""
+        threading.Thread(target=self.serve_forever, name='webhook-receiver', daemon=True).start()
+        return self
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--status', type=int, default=200, help='HTTP status to answer every POST with')
+    args = parser.parse_args()
+
+    server = WebhookReceiverServer(args.host, args.port, status=args.status, verbose=True)
+    print(f"Webhook receiver listening on {server.url}")
+    server.serve_forever()